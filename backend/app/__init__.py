@@ -4,6 +4,12 @@ import os
 from flask import Flask
 from flask_cors import CORS
 from .routes import api_bp
+from .admissao import registrar_admissao
+from .comandos import registrar_comandos
+from .db import registrar_unidade_trabalho
+from .metricas import registrar_metricas_http
+from .notificacoes import ouvinte_reservas
+from .serializacao import configurar_serializacao
 
 def create_app():
     """
@@ -16,6 +22,9 @@ def create_app():
     # --- CONFIGURAÇÕES DA APLICAÇÃO ---
     # Para corrigir a acentuação no JSON
     app.config['JSON_AS_ASCII'] = False
+
+    # JSON com orjson (se instalado) e respostas grandes comprimidas (gzip/brotli)
+    configurar_serializacao(app)
     
     # Para o JWT funcionar (lendo do arquivo .env)
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
@@ -23,7 +32,24 @@ def create_app():
     # Configura o CORS 
     CORS(app)
 
+    # Mede o tempo de resposta de cada rota (exportado em /api/metrics)
+    registrar_metricas_http(app)
+
+    # Escuta os avisos de mudança em Reservas (um LISTEN por processo, iniciado
+    # na primeira requisição para já estar no processo do worker do gunicorn)
+    app.before_request(ouvinte_reservas.iniciar)
+
+    # Vagas do controle de admissão, devolvidas só depois do COMMIT da requisição
+    registrar_admissao(app)
+
+    # Uma conexão e uma transação por requisição, confirmada no fim dela.
+    # Fica depois dos outros after_request para rodar antes deles.
+    registrar_unidade_trabalho(app)
+
     # Registra o Blueprint na aplicação principal.
     app.register_blueprint(api_bp)
 
+    # Comandos de linha de comando (flask --app run importar/exportar ...)
+    registrar_comandos(app)
+
     return app
\ No newline at end of file
@@ -0,0 +1,272 @@
+# backend/app/admissao.py
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, jsonify, make_response, request
+
+from .metricas import registro
+
+# Controle de admissão das rotas caras (login e criação de reservas). Antes
+# de a rota tocar no banco, cada requisição passa por:
+# 1. um balde de fichas (token bucket) por cliente (IP);
+# 2. um balde por usuário (o e-mail no login, o usuário do token nas reservas);
+# 3. um limite de requisições simultâneas da classe de rotas, que vale até o
+#    fim da requisição (inclusive o COMMIT da unidade de trabalho).
+# Quem estoura um balde recebe 429 e quem encontra a classe lotada recebe 503,
+# ambos com Retry-After, em vez de esperar na fila do pool de conexões.
+# Tudo fica na memória do processo: cada worker do gunicorn tem os seus limites.
+
+# Desliga o controle de admissão (ex: testes de carga)
+ADMISSAO_ATIVA = os.getenv('ADMISSAO_ATIVA', '1') != '0'
+
+# Quantos proxies reversos confiáveis ficam na frente da API. Com 0, o cliente
+# é o endereço da conexão; com N, o N-ésimo endereço do X-Forwarded-For a
+# partir do fim (o que o proxy mais externo recebeu).
+PROXIES_CONFIAVEIS = int(os.getenv('ADMISSAO_PROXIES_CONFIAVEIS', '0'))
+
+# Chaves guardadas por balde; as usadas há mais tempo saem primeiro (e voltam cheias)
+MAX_CHAVES_BALDE = int(os.getenv('ADMISSAO_MAX_CHAVES', '10000'))
+
+
+def _balde_env(nome, padrao):
+    """Lê 'capacidade/fichas_por_segundo' de uma variável de ambiente (ex: '10/0.5')."""
+    capacidade, taxa = os.getenv(nome, padrao).split('/')
+    return int(capacidade), float(taxa)
+
+
+class BaldeFichas:
+    """
+    Baldes de fichas por chave. Cada balde começa cheio com `capacidade`
+    fichas e recebe `taxa` fichas por segundo; cada requisição gasta uma.
+    A capacidade é a rajada permitida e a taxa, o ritmo sustentado.
+    """
+
+    def __init__(self, capacidade, taxa, max_chaves=MAX_CHAVES_BALDE):
+        self.capacidade = capacidade
+        self.taxa = taxa
+        self.max_chaves = max_chaves
+        self._baldes = OrderedDict()  # chave -> [fichas, instante da última atualização]
+        self._lock = threading.Lock()
+
+    def _balde(self, chave):
+        """O balde da chave, já reabastecido até agora (chame com o lock)."""
+        agora = time.monotonic()
+        balde = self._baldes.get(chave)
+        if balde is None:
+            balde = self._baldes[chave] = [float(self.capacidade), agora]
+            if len(self._baldes) > self.max_chaves:
+                self._baldes.popitem(last=False)
+        else:
+            self._baldes.move_to_end(chave)
+            balde[0] = min(self.capacidade, balde[0] + (agora - balde[1]) * self.taxa)
+            balde[1] = agora
+        return balde
+
+    def retirar(self, chave):
+        """Gasta uma ficha da chave. Retorna 0 se havia ficha, ou os segundos até a próxima."""
+        with self._lock:
+            balde = self._balde(chave)
+            if balde[0] >= 1:
+                balde[0] -= 1
+                return 0
+            return (1 - balde[0]) / self.taxa
+
+    def devolver(self, chave):
+        """Devolve a ficha de uma retirada que acabou não contando (sem passar da capacidade)."""
+        with self._lock:
+            balde = self._balde(chave)
+            balde[0] = min(self.capacidade, balde[0] + 1)
+
+    def total_chaves(self):
+        with self._lock:
+            return len(self._baldes)
+
+
+class ClientesConhecidos:
+    """
+    Pares (usuário, cliente) que já passaram pela rota com sucesso, por
+    `validade` segundos. Eles não usam o balde por usuário: quem esgota o
+    balde de um e-mail, de outro endereço, não bloqueia o dono da conta nos
+    endereços em que ele já entrou.
+    """
+
+    def __init__(self, validade, max_chaves=MAX_CHAVES_BALDE):
+        self.validade = validade
+        self.max_chaves = max_chaves
+        self._pares = OrderedDict()  # (usuário, cliente) -> instante em que expira
+        self._lock = threading.Lock()
+
+    def lembrar(self, usuario, cliente):
+        with self._lock:
+            self._pares[(usuario, cliente)] = time.monotonic() + self.validade
+            self._pares.move_to_end((usuario, cliente))
+            if len(self._pares) > self.max_chaves:
+                self._pares.popitem(last=False)
+
+    def conhece(self, usuario, cliente):
+        with self._lock:
+            expira = self._pares.get((usuario, cliente))
+            if expira is None:
+                return False
+            if expira <= time.monotonic():
+                del self._pares[(usuario, cliente)]
+                return False
+            return True
+
+    def total(self):
+        with self._lock:
+            return len(self._pares)
+
+
+# Por quanto tempo um cliente que acertou o login fica isento do balde por usuário
+VALIDADE_CLIENTE_CONHECIDO = float(os.getenv('ADMISSAO_CLIENTE_CONHECIDO_HORAS', '24')) * 3600
+
+
+class ClasseAdmissao:
+    """Baldes por cliente e por usuário e limite de simultâneas de um grupo de rotas."""
+
+    def __init__(self, nome, max_simultaneas, por_cliente, por_usuario):
+        self.nome = nome
+        self.max_simultaneas = max_simultaneas
+        self.por_cliente = BaldeFichas(*por_cliente)
+        self.por_usuario = BaldeFichas(*por_usuario)
+        self.conhecidos = ClientesConhecidos(VALIDADE_CLIENTE_CONHECIDO)
+        self.em_andamento = 0
+        self._lock = threading.Lock()
+
+    def ocupar(self):
+        """Reserva uma vaga entre as simultâneas, sem esperar. False se a classe está lotada."""
+        with self._lock:
+            if self.em_andamento >= self.max_simultaneas:
+                return False
+            self.em_andamento += 1
+            return True
+
+    def liberar(self):
+        with self._lock:
+            self.em_andamento -= 1
+
+
+CLASSES_ADMISSAO = {
+    'login': ClasseAdmissao(
+        'login',
+        max_simultaneas=int(os.getenv('ADMISSAO_LOGIN_SIMULTANEAS', '4')),
+        por_cliente=_balde_env('ADMISSAO_LOGIN_POR_CLIENTE', '10/0.5'),
+        por_usuario=_balde_env('ADMISSAO_LOGIN_POR_USUARIO', '5/0.1'),
+    ),
+    'reservas_escrita': ClasseAdmissao(
+        'reservas_escrita',
+        max_simultaneas=int(os.getenv('ADMISSAO_RESERVAS_SIMULTANEAS', '8')),
+        por_cliente=_balde_env('ADMISSAO_RESERVAS_POR_CLIENTE', '30/5'),
+        por_usuario=_balde_env('ADMISSAO_RESERVAS_POR_USUARIO', '10/1'),
+    ),
+}
+
+decisoes_admissao = registro.contador(
+    'admissao_decisoes_total',
+    'Requisições das rotas com controle de admissão, por classe e resultado '
+    '(admitida, limite_cliente, limite_usuario, saturada).',
+    ('classe', 'resultado'),
+)
+
+
+@registro.coletor
+def _coletar_metricas_admissao():
+    for classe in CLASSES_ADMISSAO.values():
+        yield (f'admissao_{classe.nome}_em_andamento', 'gauge',
+               f'Requisições de {classe.nome} sendo atendidas agora.', classe.em_andamento)
+        yield (f'admissao_{classe.nome}_chaves', 'gauge',
+               f'Clientes e usuários com balde de fichas em {classe.nome}.',
+               classe.por_cliente.total_chaves() + classe.por_usuario.total_chaves() + classe.conhecidos.total())
+
+
+def endereco_cliente():
+    """Endereço do cliente, considerando os PROXIES_CONFIAVEIS na frente da API."""
+    if PROXIES_CONFIAVEIS > 0:
+        encaminhados = request.access_route
+        if len(encaminhados) > PROXIES_CONFIAVEIS:
+            return encaminhados[-PROXIES_CONFIAVEIS - 1]
+    return request.remote_addr or 'desconhecido'
+
+
+def _recusar(classe, resultado, status, espera, mensagem):
+    decisoes_admissao.incrementar((classe.nome, resultado))
+    resposta = jsonify({"erro": mensagem, "motivo": resultado})
+    resposta.status_code = status
+    resposta.headers['Retry-After'] = str(max(1, math.ceil(espera)))
+    return resposta
+
+
+def controle_admissao(nome_classe, usuario=None, so_falhas=False):
+    """
+    Decorator que aplica o controle de admissão da classe `nome_classe` a
+    uma rota. `usuario` recebe os mesmos argumentos da rota e devolve a
+    chave do balde por usuário (ou None para pular esse balde). Com
+    `so_falhas`, esse balde só conta as respostas 401 (ex: senha errada no
+    login): a ficha é retirada antes da rota, para que pedidos simultâneos
+    não passem todos pela mesma ficha, e devolvida se a resposta não for
+    401. Os clientes que já tiveram uma resposta 2xx para a mesma chave
+    ficam isentos desse balde (ver ClientesConhecidos). Use abaixo do
+    token_required, para que a rota já receba o current_user.
+
+    A vaga entre as simultâneas só é devolvida no teardown da requisição
+    (ver registrar_admissao), depois do COMMIT feito no after_request.
+    """
+    classe = CLASSES_ADMISSAO[nome_classe]
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not ADMISSAO_ATIVA:
+                return f(*args, **kwargs)
+
+            cliente = endereco_cliente()
+            espera = classe.por_cliente.retirar(cliente)
+            if espera:
+                return _recusar(classe, 'limite_cliente', 429, espera,
+                                "Muitas requisições deste endereço. Tente novamente em instantes.")
+
+            chave = usuario(*args, **kwargs) if usuario is not None else None
+            conhecido = so_falhas and chave is not None and classe.conhecidos.conhece(chave, cliente)
+            cobrado = chave is not None and not conhecido
+            if cobrado:
+                espera = classe.por_usuario.retirar(chave)
+                if espera:
+                    return _recusar(classe, 'limite_usuario', 429, espera,
+                                    "Muitas tentativas para este usuário. Tente novamente em instantes.")
+
+            if not classe.ocupar():
+                if cobrado and so_falhas:
+                    classe.por_usuario.devolver(chave)
+                return _recusar(classe, 'saturada', 503, 1,
+                                "Servidor ocupado. Tente novamente em instantes.")
+
+            g.setdefault('admissao_vagas', []).append(classe)
+            decisoes_admissao.incrementar((classe.nome, 'admitida'))
+            if not (so_falhas and chave is not None):
+                return f(*args, **kwargs)
+
+            resposta = make_response(f(*args, **kwargs))
+            if cobrado and resposta.status_code != 401:
+                classe.por_usuario.devolver(chave)
+            if 200 <= resposta.status_code < 300:
+                classe.conhecidos.lembrar(chave, cliente)
+            return resposta
+
+        return decorated
+
+    return decorator
+
+
+def registrar_admissao(app):
+    """Devolve, no fim de cada requisição, as vagas ocupadas pelo controle_admissao."""
+
+    @app.teardown_request
+    def liberar_vagas(exc):
+        for classe in g.pop('admissao_vagas', ()):
+            classe.liberar()
@@ -1,8 +1,132 @@
 # backend/app/auth.py
 
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
 import jwt
 from flask import request, jsonify, current_app
+from .metricas import registro
+
+
+class CacheTokens:
+    """
+    Cache LRU de tokens JWT já verificados, para não refazer o jwt.decode
+    (verificação HS256) a cada requisição com o mesmo token.
+
+    A chave é o SHA-256 do token (o token em si não fica guardado) junto com
+    a SECRET_KEY usada na verificação. Cada entrada vale até o 'exp' do token.
+    """
+
+    def __init__(self, tamanho_maximo=1024):
+        self.tamanho_maximo = tamanho_maximo
+        self._dados = OrderedDict()  # chave -> (exp, payload)
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    @staticmethod
+    def chave(token, segredo):
+        return segredo, hashlib.sha256(token.encode()).digest()
+
+    def get(self, chave):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is not None:
+                exp, payload = item
+                if exp > time.time():
+                    self._dados.move_to_end(chave)
+                    self.acertos += 1
+                    return payload
+                del self._dados[chave]
+            self.falhas += 1
+            return None
+
+    def set(self, chave, payload):
+        exp = payload.get('exp')
+        if not isinstance(exp, (int, float)) or self.tamanho_maximo <= 0:
+            return
+        with self._lock:
+            self._dados[chave] = (exp, payload)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_maximo:
+                self._dados.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+    def metricas(self):
+        with self._lock:
+            return {'entradas': len(self._dados), 'acertos': self.acertos, 'falhas': self.falhas}
+
+
+token_cache = CacheTokens(tamanho_maximo=int(os.getenv('TOKEN_CACHE_TAMANHO', '1024')))
+
+
+@registro.coletor
+def _coletar_metricas_tokens():
+    metricas = token_cache.metricas()
+    yield 'auth_cache_tokens_entradas', 'gauge', 'Tokens verificados guardados no cache.', metricas['entradas']
+    yield 'auth_cache_tokens_acertos_total', 'counter', 'Requisições autenticadas sem refazer o jwt.decode.', metricas['acertos']
+    yield 'auth_cache_tokens_falhas_total', 'counter', 'Requisições que precisaram do jwt.decode.', metricas['falhas']
+
+
+def verificar_token(token, segredo=None):
+    """
+    Retorna o payload do token se ele for válido e não tiver expirado,
+    senão None. Tokens já verificados são atendidos pelo token_cache.
+    Fora de uma requisição do Flask (rotas ASGI), passe a SECRET_KEY em `segredo`.
+    """
+    if segredo is None:
+        segredo = current_app.config['SECRET_KEY']
+    chave = CacheTokens.chave(token, segredo)
+
+    payload = token_cache.get(chave)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, segredo, algorithms=["HS256"])
+        except Exception:
+            return None
+        token_cache.set(chave, payload)
+
+    # Cada requisição recebe a sua cópia, para que uma rota não altere o payload guardado
+    return dict(payload)
+
+
+# Tickets de GET /api/reservas/stream. O EventSource do navegador não manda
+# cabeçalhos, então a credencial vai na URL e acaba nos logs de acesso. Em vez
+# do token de login, que vale um dia, vai um ticket que vale poucos segundos e
+# só abre o stream: pelo 'aud', verificar_token o recusa nas outras rotas.
+AUDIENCIA_TICKET_STREAM = 'reservas-stream'
+VALIDADE_TICKET_STREAM = int(os.getenv('SSE_VALIDADE_TICKET', '30'))
+
+
+def gerar_ticket_stream(current_user):
+    """Ticket de curta duração para abrir /api/reservas/stream em nome de `current_user`."""
+    agora = int(time.time())
+    payload = {
+        'iat': agora,
+        'exp': agora + VALIDADE_TICKET_STREAM,
+        'aud': AUDIENCIA_TICKET_STREAM,
+        'sub': current_user['sub'],
+        'tipo': current_user['tipo'],
+    }
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+
+def verificar_ticket_stream(ticket):
+    """Retorna o payload do ticket se ele for válido e não tiver expirado, senão None."""
+    try:
+        return jwt.decode(
+            ticket, current_app.config['SECRET_KEY'],
+            algorithms=["HS256"], audience=AUDIENCIA_TICKET_STREAM
+        )
+    except Exception:
+        return None
+
 
 def token_required(f):
     @wraps(f)
@@ -15,11 +139,9 @@ def token_required(f):
         if not token:
             return jsonify({'erro': 'Token de autenticação está faltando!'}), 401
 
-        try:
-            # Decodifica o token para pegar os dados do usuário
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = data
-        except:
+        # Decodifica o token (ou reaproveita a verificação anterior) para pegar os dados do usuário
+        current_user = verificar_token(token)
+        if current_user is None:
             return jsonify({'erro': 'Token é inválido ou expirou!'}), 401
 
         # Passa os dados do usuário decodificado para a rota
@@ -37,4 +159,4 @@ def role_required(role):
                 return jsonify({'erro': 'Permissão negada para esta ação!'}), 403 # 403 Forbidden
             return f(current_user, *args, **kwargs)
         return decorated_function
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,135 @@
+# backend/app/busca.py
+
+import os
+
+from .db import CursorDicionario, db_connection
+from .preparadas import executar
+
+# Busca por texto em espaços, departamentos, usuários e reservas (GET /api/busca),
+# pelos índices de trigramas de scripts/add_busca.sql. Cada termo casa por
+# trecho (LIKE '%termo%', que inclui o prefixo) ou de forma aproximada por
+# palavra (operador <% do pg_trgm, tolera erros de digitação). Maiúsculas e
+# acentos são ignorados (busca_normalizar).
+
+# Termos mais curtos que isso não geram trigramas e leriam o índice inteiro
+MIN_CARACTERES_BUSCA = 2
+MAX_CARACTERES_BUSCA = 100
+
+# Resultados por entidade
+LIMITE_BUSCA_PADRAO = int(os.getenv('BUSCA_LIMITE_PADRAO', '10'))
+MAX_LIMITE_BUSCA = 50
+
+ENTIDADES_BUSCA = ('espacos', 'departamentos', 'usuarios', 'reservas')
+
+
+def _relevancia(coluna):
+    """
+    Pontuação de um texto normalizado: 1 se começa pelo termo, mais a
+    semelhança por palavra (0 a 1). O prefixo vem antes da aproximação.
+    """
+    return (f"(CASE WHEN {coluna} LIKE busca_normalizar(%(prefixo)s) THEN 1 ELSE 0 END"
+            f" + word_similarity(busca_normalizar(%(termo)s), {coluna}))")
+
+
+def _corresponde(coluna):
+    """Condição que o índice de trigramas atende: trecho ou palavra parecida."""
+    return (f"({coluna} LIKE busca_normalizar(%(trecho)s)"
+            f" OR busca_normalizar(%(termo)s) <%% {coluna})")
+
+
+_NOME_ESPACO = 'busca_normalizar(e.nome)'
+_NOME_DEPARTAMENTO = 'busca_normalizar(d.nome)'
+_NOME_USUARIO = 'busca_normalizar(u.nome)'
+_EMAIL_USUARIO = 'lower(u.email)'
+_FINALIDADE = 'busca_normalizar(r.finalidade)'
+
+_SQL_BUSCA = {
+    'espacos': f"""
+        SELECT e.*, ROUND({_relevancia(_NOME_ESPACO)}::numeric, 3) AS relevancia
+        FROM Espacos e
+        WHERE {_corresponde(_NOME_ESPACO)}
+        ORDER BY relevancia DESC, e.nome ASC
+        LIMIT %(limite)s;
+    """,
+    'departamentos': f"""
+        SELECT d.*, ROUND({_relevancia(_NOME_DEPARTAMENTO)}::numeric, 3) AS relevancia
+        FROM Departamentos d
+        WHERE {_corresponde(_NOME_DEPARTAMENTO)}
+        ORDER BY relevancia DESC, d.nome ASC
+        LIMIT %(limite)s;
+    """,
+    # Sem a senha, como em get_all_usuarios. Cada coluna usa o seu índice (BitmapOr)
+    'usuarios': f"""
+        SELECT u.usuario_id, u.nome, u.email, u.tipo, dp.nome as departamento_nome,
+               ROUND(GREATEST({_relevancia(_NOME_USUARIO)}, {_relevancia(_EMAIL_USUARIO)})::numeric, 3) AS relevancia
+        FROM Usuarios u
+        LEFT JOIN Departamentos dp ON u.departamento_id = dp.departamento_id
+        WHERE {_corresponde(_NOME_USUARIO)} OR {_corresponde(_EMAIL_USUARIO)}
+        ORDER BY relevancia DESC, u.nome ASC
+        LIMIT %(limite)s;
+    """,
+    'reservas': f"""
+        SELECT r.*, e.nome as espaco_nome, u.nome as solicitante_nome,
+               ROUND({_relevancia(_FINALIDADE)}::numeric, 3) AS relevancia
+        FROM Reservas r
+        JOIN Espacos e ON r.espaco_id = e.espaco_id
+        JOIN Usuarios u ON r.solicitante_id = u.usuario_id
+        WHERE {_corresponde(_FINALIDADE)}
+          AND (%(solicitante_id)s::int IS NULL OR r.solicitante_id = %(solicitante_id)s::int)
+        ORDER BY relevancia DESC, r.data_hora_inicio DESC
+        LIMIT %(limite)s;
+    """,
+}
+
+
+def entidades_visiveis(current_user):
+    """
+    Entidades que o usuário pode buscar: o catálogo (espaços e departamentos)
+    é público, reservas exigem login e usuários só aparecem para o gestor.
+    `current_user` é o payload do token, ou None para quem não está logado.
+    """
+    if current_user is None:
+        return ('espacos', 'departamentos')
+    if current_user.get('tipo') == 'gestor':
+        return ENTIDADES_BUSCA
+    return ('espacos', 'departamentos', 'reservas')
+
+
+def _escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def buscar(termo, entidades, current_user, limite=LIMITE_BUSCA_PADRAO):
+    """
+    Busca `termo` em cada uma das `entidades` (já filtradas por
+    entidades_visiveis), até `limite` resultados por entidade, do mais para o
+    menos relevante. Quem não é gestor só encontra as próprias reservas.
+    Retorna {entidade: [linhas com 'relevancia'], ...} ou {"erro": ...}.
+    """
+    escapado = _escapar_like(termo)
+    params = {
+        'termo': termo,
+        'prefixo': escapado + '%',
+        'trecho': '%' + escapado + '%',
+        'limite': limite,
+        'solicitante_id': None,
+    }
+    if current_user is not None and current_user.get('tipo') != 'gestor':
+        params['solicitante_id'] = int(current_user['sub'])
+
+    resultados = {}
+    with db_connection() as conn:
+        if conn is None:
+            return {"erro": "Falha na conexão com o banco de dados"}
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            try:
+                for entidade in entidades:
+                    executar(cursor, _SQL_BUSCA[entidade], params)
+                    resultados[entidade] = cursor.fetchall()
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao buscar '{termo}': {e}")
+                return {"erro": "Erro interno na busca (a migração add_busca.sql foi aplicada?)."}
+
+    return resultados
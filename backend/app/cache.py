@@ -0,0 +1,130 @@
+# backend/app/cache.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from .metricas import registro
+
+
+class TTLCache:
+    """
+    Cache em memória, thread-safe, com tempo de vida (TTL) por entrada e
+    limite de tamanho (descarta a entrada usada há mais tempo - LRU).
+
+    As chaves são tuplas cujo primeiro elemento é o "namespace" (ex: 'espacos').
+    Cada namespace guarda o instante da última invalidação, usado como
+    Last-Modified nas respostas HTTP, e uma geração, que avança a cada
+    invalidação: uma leitura que começou antes dela não grava o resultado.
+    """
+
+    def __init__(self, tamanho_maximo=256, ttl=60.0):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self._dados = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self._modificado_em = {}
+        self._geracoes = {}
+        self._criado_em = datetime.now(timezone.utc).replace(microsecond=0)
+        self.acertos = 0
+        self.falhas = 0
+
+    def get(self, chave):
+        """Retorna (True, valor) se a chave estiver no cache e válida, senão (False, None)."""
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is not None:
+                expira_em, valor = item
+                if expira_em > time.monotonic():
+                    self._dados.move_to_end(chave)
+                    self.acertos += 1
+                    return True, valor
+                del self._dados[chave]
+            self.falhas += 1
+            return False, None
+
+    def geracao(self, namespace):
+        """Geração atual do namespace; pegue-a antes de ler do banco e passe para set()."""
+        with self._lock:
+            return self._geracoes.get(namespace, 0)
+
+    def set(self, chave, valor, geracao=None):
+        """
+        Guarda o valor. Com `geracao`, só guarda se o namespace não foi
+        invalidado desde então (senão o valor lido pode ser anterior à mudança).
+        """
+        with self._lock:
+            if geracao is not None and self._geracoes.get(chave[0], 0) != geracao:
+                return
+            self._dados[chave] = (time.monotonic() + self.ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_maximo:
+                self._dados.popitem(last=False)
+
+    def invalidate(self, *namespaces):
+        """Remove todas as entradas dos namespaces informados."""
+        agora = datetime.now(timezone.utc).replace(microsecond=0)
+        with self._lock:
+            for chave in [c for c in self._dados if c[0] in namespaces]:
+                del self._dados[chave]
+            for namespace in namespaces:
+                self._modificado_em[namespace] = agora
+                self._geracoes[namespace] = self._geracoes.get(namespace, 0) + 1
+
+    def last_modified(self, namespace):
+        """Instante da última invalidação do namespace (ou da criação do cache)."""
+        with self._lock:
+            return self._modificado_em.get(namespace, self._criado_em)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+    def metricas(self):
+        with self._lock:
+            return {'entradas': len(self._dados), 'acertos': self.acertos, 'falhas': self.falhas}
+
+
+# Cache dos dados de catálogo (espaços e departamentos), que mudam pouco.
+# A invalidação vale só para o processo que fez a mudança: os outros workers
+# do gunicorn continuam servindo o catálogo antigo por até CACHE_CATALOGO_TTL
+# segundos depois de um gestor editar um espaço ou departamento.
+catalogo_cache = TTLCache(
+    tamanho_maximo=int(os.getenv('CACHE_CATALOGO_TAMANHO', '256')),
+    ttl=float(os.getenv('CACHE_CATALOGO_TTL', '60')),
+)
+
+
+@registro.coletor
+def _coletar_metricas_cache():
+    metricas = catalogo_cache.metricas()
+    yield 'cache_catalogo_entradas', 'gauge', 'Entradas no cache do catálogo.', metricas['entradas']
+    yield 'cache_catalogo_acertos_total', 'counter', 'Leituras do catálogo atendidas pelo cache.', metricas['acertos']
+    yield 'cache_catalogo_falhas_total', 'counter', 'Leituras do catálogo que foram ao banco.', metricas['falhas']
+
+
+def cached(namespace, cache=catalogo_cache):
+    """
+    Decorator de leitura através do cache: a chave é o namespace mais os
+    argumentos posicionais da função. Resultados vazios (None ou []) não são
+    guardados: as funções do models.py também os devolvem quando o banco está
+    fora do ar, e isso não pode ficar preso no cache até o TTL.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args):
+            chave = (namespace,) + args
+            encontrado, valor = cache.get(chave)
+            if encontrado:
+                return valor
+            geracao = cache.geracao(namespace)
+            valor = f(*args)
+            if valor:
+                cache.set(chave, valor, geracao)
+            return valor
+        decorated.sem_cache = f
+        return decorated
+    return decorator
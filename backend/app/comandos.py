@@ -0,0 +1,70 @@
+# backend/app/comandos.py
+
+import json
+
+import click
+from .models import limpar_reservas_removidas
+from .particoes import MESES_FUTUROS, MESES_HISTORICO, manter_particoes
+from .relatorios import atualizar_relatorios
+from .transferencia import IMPORTACOES, EXPORTACOES, importar, exportar_para_arquivo
+
+
+def registrar_comandos(app):
+    """
+    Registra os comandos de linha de comando da aplicação.
+    Uso (dentro da pasta backend): flask --app run <comando> ...
+    """
+
+    @app.cli.command('importar')
+    @click.argument('entidade', type=click.Choice(sorted(IMPORTACOES)))
+    @click.argument('arquivo', type=click.File('rb'))
+    @click.option('--formato', type=click.Choice(['csv', 'ndjson']), default=None,
+                  help='Formato do arquivo (padrão: pela extensão, csv se não for .ndjson/.jsonl).')
+    @click.option('--simular', is_flag=True, help='Valida e mostra o relatório sem gravar nada.')
+    def importar_comando(entidade, arquivo, formato, simular):
+        """Importa usuários, espaços ou reservas de um arquivo CSV ou NDJSON."""
+        if formato is None:
+            formato = 'ndjson' if arquivo.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+        relatorio = importar(entidade, arquivo, formato=formato, simular=simular)
+        click.echo(json.dumps(relatorio, ensure_ascii=False, indent=2))
+        if 'erro' in relatorio:
+            raise SystemExit(1)
+
+    @app.cli.command('exportar')
+    @click.argument('entidade', type=click.Choice(sorted(EXPORTACOES)))
+    @click.argument('arquivo', type=click.File('w', encoding='utf-8'))
+    def exportar_comando(entidade, arquivo):
+        """Exporta usuários, espaços ou reservas em CSV (use - para a saída padrão)."""
+        exportar_para_arquivo(entidade, arquivo)
+
+    @app.cli.command('atualizar-relatorios')
+    @click.option('--tudo', is_flag=True, help='Recalcula todas as semanas, não só as alteradas.')
+    def atualizar_relatorios_comando(tudo):
+        """Recalcula os relatórios de uso das semanas com reservas alteradas."""
+        resultado = atualizar_relatorios(tudo=tudo)
+        click.echo(json.dumps(resultado, ensure_ascii=False))
+        if 'erro' in resultado:
+            raise SystemExit(1)
+
+    @app.cli.command('limpar-remocoes')
+    @click.option('--dias', type=int, default=30, show_default=True,
+                  help='Apaga os registros de reservas removidas há mais que isso.')
+    def limpar_remocoes_comando(dias):
+        """Apaga registros antigos de reservas removidas (tokens de sincronização anteriores expiram)."""
+        resultado = limpar_reservas_removidas(dias)
+        click.echo(json.dumps(resultado, ensure_ascii=False))
+        if 'erro' in resultado:
+            raise SystemExit(1)
+
+    @app.cli.command('particoes-reservas')
+    @click.option('--meses-futuros', type=int, default=MESES_FUTUROS, show_default=True,
+                  help='Meses à frente do atual com partição criada.')
+    @click.option('--meses-historico', type=int, default=MESES_HISTORICO, show_default=True,
+                  help='Meses anteriores mantidos na tabela (0 mantém todos).')
+    def particoes_reservas_comando(meses_futuros, meses_historico):
+        """Cria as partições mensais dos próximos meses e desanexa as antigas."""
+        resultado = manter_particoes(meses_futuros=meses_futuros, meses_historico=meses_historico)
+        click.echo(json.dumps(resultado, ensure_ascii=False))
+        if 'erro' in resultado:
+            raise SystemExit(1)
@@ -1,12 +1,73 @@
 # backend/app/db.py
 
 import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
 import psycopg2
+import psycopg2.extensions
 from dotenv import load_dotenv
+from flask import g, has_request_context, jsonify
+from .metricas import (
+    METRICAS_SQL_ATIVAS, ConexaoInstrumentada, espera_pool, registro, restaurar_rotulo, rotular_comandos
+)
 
 # Carrega as variáveis de ambiente do arquivo .env para a memória do sistema
 load_dotenv(encoding='utf-8')
 
+
+class CursorDicionario(psycopg2.extensions.cursor):
+    """
+    Cursor que devolve cada linha como um dict comum ({coluna: valor}).
+
+    O DictCursor monta um DictRow por linha (que as funções ainda copiavam
+    para um dict); aqui a linha sai como tupla do psycopg2 e vira dict de uma
+    vez só, com os nomes das colunas lidos uma única vez por consulta.
+    """
+
+    def _nomes(self):
+        return [coluna.name for coluna in self.description]
+
+    def fetchone(self):
+        linha = super().fetchone()
+        return None if linha is None else dict(zip(self._nomes(), linha))
+
+    def fetchmany(self, size=None):
+        linhas = super().fetchmany(self.arraysize if size is None else size)
+        if not linhas:
+            return []
+        nomes = self._nomes()
+        return [dict(zip(nomes, linha)) for linha in linhas]
+
+    def fetchall(self):
+        linhas = super().fetchall()
+        if not linhas:
+            return []
+        nomes = self._nomes()
+        return [dict(zip(nomes, linha)) for linha in linhas]
+
+    def __iter__(self):
+        # Em cursores nomeados, description só existe depois da primeira linha
+        # (chama o __next__ do psycopg2 direto: iter(self) voltaria para este método)
+        proxima = super().__next__
+        nomes = None
+        while True:
+            try:
+                linha = proxima()
+            except StopIteration:
+                return
+            if nomes is None:
+                nomes = self._nomes()
+            yield dict(zip(nomes, linha))
+
+
+class PoolEsgotadoError(Exception):
+    """Lançada quando nenhuma conexão fica livre dentro do tempo limite de espera."""
+
+
 def get_db_connection():
     """
     Cria e retorna uma nova conexão com o banco de dados.
@@ -20,9 +81,529 @@ def get_db_connection():
             user=os.getenv('DB_USER'),
             password=os.getenv('DB_PASSWORD'),
             port=os.getenv('DB_PORT'),
-            client_encoding='UTF8'
+            client_encoding='UTF8',
+            # Cursores que registram tempo e linhas de cada comando (ver metricas.py)
+            connection_factory=ConexaoInstrumentada if METRICAS_SQL_ATIVAS else None,
         )
         return conn
     except Exception as e:
         print(f"Erro ao conectar ao banco de dados: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+class ConnectionPool:
+    """
+    Pool de conexões thread-safe.
+
+    Mantém entre `minimo` e `maximo` conexões abertas. Quem pede uma conexão
+    espera no máximo `timeout` segundos por uma livre. Conexões ociosas há mais
+    de `intervalo_ping` segundos são testadas com um SELECT 1 antes de serem
+    entregues, e conexões quebradas são descartadas e substituídas.
+    """
+
+    def __init__(self, minimo=1, maximo=10, timeout=5.0, intervalo_ping=30.0, fabrica=get_db_connection):
+        if minimo < 0 or maximo < 1 or minimo > maximo:
+            raise ValueError("Tamanhos de pool inválidos: é preciso 0 <= minimo <= maximo e maximo >= 1.")
+
+        self.minimo = minimo
+        self.maximo = maximo
+        self.timeout = timeout
+        self.intervalo_ping = intervalo_ping
+        self._fabrica = fabrica
+
+        self._cond = threading.Condition(threading.Lock())
+        self._ociosas = deque()  # pares (conexão, instante em que foi devolvida)
+        self._total = 0          # conexões abertas (ociosas + emprestadas)
+        self._fechado = False
+
+        self._metricas = {
+            'emprestimos': 0,
+            'esperas': 0,
+            'timeouts': 0,
+            'criadas': 0,
+            'descartadas': 0,
+            'falhas_conexao': 0,
+            'tempo_espera_total': 0.0,
+        }
+
+        for _ in range(minimo):
+            conn = self._abrir()
+            if conn is None:
+                break
+            self._ociosas.append((conn, time.monotonic()))
+            self._total += 1
+
+    def _abrir(self):
+        conn = self._fabrica()
+        with self._cond:
+            if conn is None:
+                self._metricas['falhas_conexao'] += 1
+            else:
+                self._metricas['criadas'] += 1
+        return conn
+
+    def _esta_viva(self, conn, devolvida_em):
+        """Verifica se a conexão ainda pode ser usada antes de entregá-la."""
+        if conn.closed:
+            return False
+        if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - devolvida_em < self.intervalo_ping:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _descartar(self, conn):
+        # Deve ser chamada com o lock adquirido, por causa do contador
+        self._metricas['descartadas'] += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self):
+        """
+        Empresta uma conexão do pool. Lança PoolEsgotadoError se nenhuma
+        ficar disponível dentro do tempo limite.
+        """
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        esperou = False
+
+        while True:
+            with self._cond:
+                if self._fechado:
+                    raise PoolEsgotadoError("O pool de conexões foi fechado.")
+
+                while not self._ociosas and self._total >= self.maximo:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._metricas['timeouts'] += 1
+                        raise PoolEsgotadoError(
+                            f"Nenhuma conexão livre após {self.timeout:.1f}s (máximo de {self.maximo})."
+                        )
+                    esperou = True
+                    self._cond.wait(restante)
+
+                if self._ociosas:
+                    conn, devolvida_em = self._ociosas.pop()
+                else:
+                    # Reserva a vaga antes de abrir a conexão fora do lock
+                    conn, devolvida_em = None, None
+                    self._total += 1
+
+            if conn is None:
+                conn = self._abrir()
+                if conn is None:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise PoolEsgotadoError("Não foi possível abrir uma nova conexão com o banco de dados.")
+            elif not self._esta_viva(conn, devolvida_em):
+                with self._cond:
+                    self._descartar(conn)
+                    self._total -= 1
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self._metricas['emprestimos'] += 1
+                if esperou:
+                    self._metricas['esperas'] += 1
+                self._metricas['tempo_espera_total'] += time.monotonic() - inicio
+            return conn
+
+    def putconn(self, conn, descartar=False):
+        """Devolve uma conexão ao pool, desfazendo qualquer transação aberta."""
+        if not descartar and not conn.closed:
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                descartar = True
+
+        with self._cond:
+            if descartar or conn.closed or self._fechado or len(self._ociosas) + 1 > self.maximo:
+                self._total -= 1
+                self._descartar(conn)
+            else:
+                self._ociosas.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        """Fecha todas as conexões ociosas e impede novos empréstimos."""
+        with self._cond:
+            self._fechado = True
+            while self._ociosas:
+                conn, _ = self._ociosas.pop()
+                self._total -= 1
+                self._descartar(conn)
+            self._cond.notify_all()
+
+    def metricas(self):
+        """Retorna um retrato das métricas do pool."""
+        with self._cond:
+            dados = dict(self._metricas)
+            dados['abertas'] = self._total
+            dados['ociosas'] = len(self._ociosas)
+            dados['em_uso'] = self._total - len(self._ociosas)
+            dados['minimo'] = self.minimo
+            dados['maximo'] = self.maximo
+        return dados
+
+
+# --- POOL GLOBAL DA APLICAÇÃO ---
+# O pool é criado sob demanda e amarrado ao PID do processo, para que um
+# processo filho (fork) nunca reutilize os sockets abertos pelo processo pai.
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Retorna o pool do processo atual, criando-o na primeira chamada."""
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool(
+                minimo=int(os.getenv('DB_POOL_MIN', '1')),
+                maximo=int(os.getenv('DB_POOL_MAX', '10')),
+                timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+                intervalo_ping=float(os.getenv('DB_POOL_PING_INTERVALO', '30')),
+            )
+            _pool_pid = os.getpid()
+    return _pool
+
+
+def fechar_pool():
+    """Fecha as conexões do pool deste processo (usado no desligamento dos workers)."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+        _pool_pid = None
+
+
+def descartar_pool_herdado():
+    """
+    Esquece, sem fechar, um pool herdado do processo pai após um fork.
+    Fechar as conexões aqui encerraria as sessões que o pai ainda usa,
+    já que os sockets são os mesmos.
+    """
+    global _pool, _pool_pid, _pool_lock
+    _pool_lock = threading.Lock()
+    if _pool_pid != os.getpid():
+        _pool = None
+        _pool_pid = None
+
+
+def pool_metrics():
+    """Métricas do pool do processo atual (vazio se o pool ainda não foi criado)."""
+    if _pool is None or _pool_pid != os.getpid():
+        return {}
+    return _pool.metricas()
+
+
+@registro.coletor
+def _coletar_metricas_pool():
+    tipos = {'abertas': 'gauge', 'ociosas': 'gauge', 'em_uso': 'gauge', 'minimo': 'gauge', 'maximo': 'gauge'}
+    for chave, valor in pool_metrics().items():
+        if chave in tipos:
+            yield f'db_pool_{chave}', 'gauge', f'Conexões do pool: {chave}.', valor
+        else:
+            yield f'db_pool_{chave}_total', 'counter', f'Pool de conexões: {chave} desde o início do processo.', valor
+
+
+def _emprestar_conexao():
+    """Pega uma conexão do pool, registrando o tempo de espera. Retorna (pool, conexão)."""
+    pool = get_pool()
+    inicio = time.perf_counter()
+    conn = pool.getconn()
+    espera_pool.observar((), time.perf_counter() - inicio)
+    return pool, conn
+
+
+# --- UNIDADE DE TRABALHO POR REQUISIÇÃO ---
+# Dentro de uma requisição do Flask, todos os blocos db_connection() usam a
+# mesma conexão e a mesma transação, confirmada uma única vez no fim da
+# requisição (ver registrar_unidade_trabalho). Uma rota que encadeia várias
+# funções do models.py empresta uma conexão só. Fora de requisições (CLI,
+# threads, benchmarks) cada bloco continua com a sua própria conexão.
+UNIDADE_TRABALHO_ATIVA = os.getenv('UNIDADE_TRABALHO', '1') != '0'
+
+
+class UnidadeTrabalhoDesfeitaError(Exception):
+    """Escritas já confirmadas por blocos da requisição foram perdidas (a transação teve de ser desfeita inteira)."""
+
+
+class UnidadeTrabalho:
+    """
+    Conexão e transação de uma requisição.
+
+    As funções do models.py continuam chamando conn.commit() e conn.rollback()
+    (ver _ConexaoDaUnidade): o commit de um bloco só marca as escritas dele
+    como confirmadas, e o rollback desfaz apenas o bloco atual. O COMMIT de
+    verdade acontece em confirmar(), seguido dos efeitos registrados com
+    ao_confirmar (invalidação de cache, índice de disponibilidade...).
+    """
+
+    def __init__(self, pool, conn):
+        self.pool = pool
+        self.conn = conn
+        self.pendente = False   # algum bloco já confirmou escritas
+        self.descartar = False  # a conexão quebrou e não volta para o pool
+        self.desfeita = False   # escritas confirmadas se perderam: confirmar() falha
+        self._pos_confirmacao = []
+        self._savepoints = 0
+
+    def bloco(self):
+        """
+        A conexão vista por um bloco db_connection(). Se blocos anteriores já
+        confirmaram escritas, abre um SAVEPOINT para que um rollback deste
+        bloco não as desfaça; senão não há o que proteger e nada é enviado.
+        """
+        savepoint = None
+        if self.pendente:
+            self._savepoints += 1
+            savepoint = f'unidade_{self._savepoints}'
+            with self.conn.cursor() as cursor:
+                cursor.execute(f'SAVEPOINT {savepoint}')
+        return _ConexaoDaUnidade(self, savepoint)
+
+    def ao_confirmar(self, funcao):
+        self._pos_confirmacao.append(funcao)
+
+    def confirmar(self):
+        """Faz o COMMIT (se algum bloco confirmou escritas) e depois executa os efeitos pendentes."""
+        if self.desfeita:
+            self._pos_confirmacao = []
+            raise UnidadeTrabalhoDesfeitaError("A transação da requisição foi desfeita depois de escritas confirmadas.")
+        if self.pendente:
+            self.conn.commit()
+            self.pendente = False
+        funcoes, self._pos_confirmacao = self._pos_confirmacao, []
+        for funcao in funcoes:
+            try:
+                funcao()
+            except Exception as e:
+                # O banco já confirmou: um efeito que falhou não muda a resposta
+                print(f"Erro ao aplicar efeito após o commit: {e}")
+
+    def encerrar(self):
+        """Devolve a conexão ao pool; o que não foi confirmado é desfeito no putconn."""
+        self._pos_confirmacao = []
+        self.pool.putconn(self.conn, descartar=self.descartar)
+
+
+class _ConexaoDaUnidade:
+    """
+    A conexão da unidade de trabalho como um bloco a enxerga: tudo é repassado
+    à conexão real, menos commit() e rollback(). Cada bloco confirma ou desfaz
+    uma vez, como as funções do models.py já fazem. O commit libera o
+    savepoint do bloco (RELEASE), para que uma requisição com muitos blocos
+    não acumule savepoints abertos até o COMMIT.
+    """
+
+    def __init__(self, unidade, savepoint):
+        self._unidade = unidade
+        self._savepoint = savepoint
+        self.encerrado = False  # o bloco já chamou commit() ou rollback()
+
+    def __getattr__(self, nome):
+        return getattr(self._unidade.conn, nome)
+
+    def _executar(self, sql):
+        with self._unidade.conn.cursor() as cursor:
+            cursor.execute(sql)
+
+    def commit(self):
+        # O COMMIT fica para o fim da requisição
+        if self._savepoint is not None:
+            self._executar(f'RELEASE SAVEPOINT {self._savepoint}')
+            self._savepoint = None
+        self._unidade.pendente = True
+        self.encerrado = True
+
+    def rollback(self):
+        self.encerrado = True
+        if self._savepoint is not None:
+            self._executar(f'ROLLBACK TO SAVEPOINT {self._savepoint}; RELEASE SAVEPOINT {self._savepoint}')
+            self._savepoint = None
+            return
+        if self._unidade.pendente:
+            # Sem savepoint, desfazer este bloco desfaz também o que já foi
+            # confirmado (ex: rollback depois do commit do próprio bloco)
+            self._unidade.desfeita = True
+            self._unidade.pendente = False
+        self._unidade.conn.rollback()
+
+    def finalizar(self):
+        """
+        Saída do bloco sem commit() nem rollback(): o que ele escreveu não
+        foi confirmado e não pode ir junto no COMMIT da requisição, então é
+        desfeito. Um bloco que só leu e não tem savepoint não envia nada.
+        """
+        if self.encerrado:
+            return
+        self.encerrado = True
+        if self._savepoint is not None:
+            self._executar(f'ROLLBACK TO SAVEPOINT {self._savepoint}; RELEASE SAVEPOINT {self._savepoint}')
+            self._savepoint = None
+        elif self._unidade.pendente:
+            # Um bloco aninhado confirmou escritas no meio deste: não há
+            # como desfazer só as deste bloco sem perder as dele
+            print("Aviso: bloco da unidade de trabalho terminou sem commit nem rollback depois de escritas confirmadas.")
+        elif self._unidade.conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            self._unidade.conn.rollback()
+
+
+@contextmanager
+def _bloco_da_unidade():
+    unidade = g.get('unidade_trabalho')
+    if unidade is None:
+        try:
+            unidade = UnidadeTrabalho(*_emprestar_conexao())
+        except Exception as e:
+            print(f"Erro ao obter conexão do pool: {e}")
+            yield None
+            return
+        g.unidade_trabalho = unidade
+
+    conn = unidade.conn
+    try:
+        bloco = unidade.bloco()
+    except psycopg2.Error as e:
+        print(f"Erro ao abrir savepoint na conexão da requisição: {e}")
+        unidade.descartar = conn.closed != 0
+        yield None
+        return
+
+    try:
+        yield bloco
+    except psycopg2.InterfaceError:
+        unidade.descartar = True
+        raise
+    except psycopg2.OperationalError:
+        unidade.descartar = conn.closed != 0
+        raise
+    finally:
+        if not unidade.descartar and not conn.closed:
+            try:
+                if conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                    # Um comando que falhou sem rollback deixaria a transação
+                    # inutilizável para os próximos blocos da requisição
+                    bloco.rollback()
+                else:
+                    bloco.finalizar()
+            except psycopg2.Error:
+                unidade.descartar = True
+                unidade.desfeita = unidade.desfeita or unidade.pendente
+
+
+def ao_confirmar(funcao):
+    """
+    Executa `funcao` quando as escritas feitas até aqui estiverem confirmadas
+    no banco: no fim da requisição, dentro de uma unidade de trabalho, ou na
+    hora, fora dela (as funções só chamam isto depois do seu conn.commit()).
+    """
+    unidade = g.get('unidade_trabalho') if has_request_context() else None
+    if unidade is None:
+        funcao()
+    else:
+        unidade.ao_confirmar(funcao)
+
+
+def registrar_unidade_trabalho(app):
+    """
+    Confirma a unidade de trabalho no fim de cada requisição. Respostas 5xx
+    (e exceções não tratadas) desfazem tudo. Deve ser registrada depois dos
+    outros after_request, para rodar antes deles (o Flask os chama em ordem
+    inversa) e uma falha no COMMIT ainda virar uma resposta 500.
+    """
+
+    @app.after_request
+    def confirmar_unidade(response):
+        unidade = g.pop('unidade_trabalho', None)
+        if unidade is None:
+            return response
+        try:
+            if response.status_code < 500:
+                unidade.confirmar()
+        except (psycopg2.Error, UnidadeTrabalhoDesfeitaError) as e:
+            print(f"Erro ao confirmar a transação da requisição: {e}")
+            unidade.descartar = unidade.conn.closed != 0
+            response = jsonify({"erro": "Falha ao gravar as alterações no banco de dados."})
+            response.status_code = 500
+        finally:
+            unidade.encerrar()
+        return response
+
+    @app.teardown_request
+    def encerrar_unidade(exc):
+        # Só sobra unidade aqui se a requisição não passou pelo after_request
+        unidade = g.pop('unidade_trabalho', None)
+        if unidade is not None:
+            unidade.encerrar()
+
+
+@contextmanager
+def db_connection(propria=False):
+    """
+    Empresta uma conexão do pool durante o bloco `with` e sempre a devolve,
+    inclusive quando o bloco retorna antes do fim ou lança uma exceção.
+    Transações não confirmadas são desfeitas na devolução.
+
+    Dentro de uma requisição, entrega a conexão da unidade de trabalho da
+    requisição. `propria=True` pede uma conexão só para o bloco (ex: um
+    cursor que continua aberto enquanto a resposta é enviada em streaming,
+    depois que a unidade já foi encerrada).
+
+    Entrega None se não for possível obter uma conexão, mantendo o contrato
+    das funções do models.py que já tratam `conn is None`.
+
+    Os comandos executados no bloco aparecem nas métricas com o nome da
+    função que abriu o bloco (ex: get_all_reservas).
+    """
+    # Quadros: este gerador, o __enter__ do contextmanager e quem abriu o bloco
+    anterior = rotular_comandos(sys._getframe(2).f_code.co_name)
+    try:
+        with _conexao_do_bloco(propria) as conn:
+            yield conn
+    finally:
+        restaurar_rotulo(anterior)
+
+
+@contextmanager
+def _conexao_do_bloco(propria):
+    if not propria and UNIDADE_TRABALHO_ATIVA and has_request_context():
+        with _bloco_da_unidade() as conn:
+            yield conn
+        return
+
+    try:
+        pool, conn = _emprestar_conexao()
+    except Exception as e:
+        print(f"Erro ao obter conexão do pool: {e}")
+        yield None
+        return
+
+    descartar = False
+    try:
+        yield conn
+    except psycopg2.InterfaceError:
+        descartar = True
+        raise
+    except psycopg2.OperationalError:
+        descartar = conn.closed != 0
+        raise
+    finally:
+        pool.putconn(conn, descartar=descartar)
@@ -0,0 +1,293 @@
+# backend/app/disponibilidade.py
+
+import threading
+from bisect import bisect_left
+from datetime import datetime
+
+from .db import CursorDicionario, db_connection
+
+STATUS_ATIVOS = ('confirmada', 'pendente')
+
+
+class _IntervalosEspaco:
+    """
+    Reservas ativas de um espaço, ordenadas pelo início.
+
+    Além das listas ordenadas, guarda o máximo acumulado dos fins
+    (fim_maximo[i] = maior fim entre as reservas 0..i). Com isso, "existe
+    reserva que sobrepõe [inicio, fim)?" vira uma busca binária: pegamos as
+    reservas que começam antes de `fim` e olhamos se o maior fim entre elas
+    passa de `inicio`. A resposta é exata mesmo que existam sobreposições
+    antigas no banco.
+    """
+
+    __slots__ = ('chaves', 'fins', 'fim_maximo')
+
+    def __init__(self):
+        self.chaves = []      # (data_hora_inicio, reserva_id), ordenadas
+        self.fins = []        # data_hora_fim na mesma ordem de `chaves`
+        self.fim_maximo = []
+
+    def _recalcular_a_partir_de(self, posicao):
+        maximo = self.fim_maximo[posicao - 1] if posicao > 0 else None
+        for i in range(posicao, len(self.fins)):
+            if maximo is None or self.fins[i] > maximo:
+                maximo = self.fins[i]
+            self.fim_maximo[i] = maximo
+
+    def adicionar(self, inicio, fim, reserva_id):
+        posicao = bisect_left(self.chaves, (inicio, reserva_id))
+        self.chaves.insert(posicao, (inicio, reserva_id))
+        self.fins.insert(posicao, fim)
+        self.fim_maximo.insert(posicao, fim)
+        self._recalcular_a_partir_de(posicao)
+
+    def remover(self, inicio, reserva_id):
+        posicao = bisect_left(self.chaves, (inicio, reserva_id))
+        if posicao < len(self.chaves) and self.chaves[posicao] == (inicio, reserva_id):
+            del self.chaves[posicao]
+            del self.fins[posicao]
+            del self.fim_maximo[posicao]
+            self._recalcular_a_partir_de(posicao)
+
+    def ocupado(self, inicio, fim):
+        # Reservas que começam antes do fim da janela: índices 0..k-1
+        k = bisect_left(self.chaves, (fim,))
+        return k > 0 and self.fim_maximo[k - 1] > inicio
+
+
+class IndiceDisponibilidade:
+    """
+    Índice em memória das reservas ativas (pendentes e confirmadas) por espaço.
+
+    É carregado do banco uma vez, na primeira consulta, só com as reservas
+    que ainda não terminaram, e daí em diante mantido incrementalmente: pelas
+    funções do models.py a cada escrita deste processo e pelo ouvinte de
+    avisos (notificacoes.py) para as escritas dos outros processos. Escritas
+    que chegam durante a carga são guardadas e reaplicadas sobre o retrato lido.
+    Janelas que começam antes do instante da carga (o "horizonte") são
+    respondidas pelo banco, já que as reservas já terminadas não foram lidas.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._lock_carga = threading.Lock()
+        self._espacos = {}       # espaco_id -> _IntervalosEspaco
+        self._reservas = {}      # reserva_id -> (espaco_id, inicio)
+        self._carregado = False
+        self._horizonte = None   # now() do banco no momento da carga
+        self._pendentes = None   # escritas recebidas durante a carga, ou None fora dela
+        self._versao = 0         # muda a cada invalidação
+
+    def _ler(self):
+        """(now() do banco, reservas ativas que terminam depois dele), ou None sem conexão."""
+        sql = """
+            SELECT reserva_id, espaco_id, data_hora_inicio, data_hora_fim
+            FROM Reservas
+            WHERE status IN %s AND data_hora_fim > %s
+        """
+        # Conexão própria: a da requisição pode ter escritas ainda não confirmadas
+        with db_connection(propria=True) as conn:
+            if conn is None:
+                return None
+            with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+                cursor.execute("SELECT now() AS horizonte;")
+                horizonte = cursor.fetchone()['horizonte']
+                cursor.execute(sql, (STATUS_ATIVOS, horizonte))
+                linhas = cursor.fetchall()
+            conn.rollback()
+        return horizonte, linhas
+
+    def _carregar(self):
+        with self._lock:
+            versao_inicial = self._versao
+            self._pendentes = []
+
+        lido = None
+        try:
+            lido = self._ler()
+        finally:
+            if lido is None:
+                with self._lock:
+                    self._pendentes = None
+        if lido is None:
+            return False
+        horizonte, linhas = lido
+
+        espacos = {}
+        reservas = {}
+        for linha in linhas:
+            intervalos = espacos.setdefault(linha['espaco_id'], _IntervalosEspaco())
+            intervalos.chaves.append((linha['data_hora_inicio'], linha['reserva_id']))
+            intervalos.fins.append(linha['data_hora_fim'])
+            reservas[linha['reserva_id']] = (linha['espaco_id'], linha['data_hora_inicio'])
+
+        for intervalos in espacos.values():
+            ordem = sorted(range(len(intervalos.chaves)), key=intervalos.chaves.__getitem__)
+            intervalos.chaves = [intervalos.chaves[i] for i in ordem]
+            intervalos.fins = [intervalos.fins[i] for i in ordem]
+            intervalos.fim_maximo = list(intervalos.fins)
+            intervalos._recalcular_a_partir_de(0)
+
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, None
+            if self._versao != versao_inicial:
+                # Invalidado durante a leitura (ex: importação em massa): _garantir_carregado lê de novo
+                return True
+            self._espacos = espacos
+            self._reservas = reservas
+            self._horizonte = horizonte
+            self._carregado = True
+            # Escritas que chegaram durante a leitura, na ordem em que chegaram.
+            # As que o retrato já contém não mudam nada (adicionar e remover são idempotentes).
+            for operacao, argumento in pendentes:
+                operacao(argumento)
+        return True
+
+    def _garantir_carregado(self):
+        if self._carregado:
+            return True
+        # Só uma thread carrega; as outras esperam e aproveitam o resultado
+        with self._lock_carga:
+            # Uma invalidação durante a leitura descarta o retrato: tenta de novo uma vez
+            for _ in range(2):
+                if self._carregado:
+                    return True
+                if not self._carregar():
+                    return False
+            return self._carregado
+
+    def _adiar(self, operacao, argumento):
+        """
+        Chamado com o lock. Durante a carga, guarda a escrita para reaplicar;
+        antes de qualquer carga, ignora (ela já estará no retrato). Retorna
+        True se a escrita não deve ser aplicada agora.
+        """
+        if self._pendentes is not None:
+            self._pendentes.append((operacao, argumento))
+            return True
+        return not self._carregado
+
+    # --- CONSULTAS ---
+
+    def _ocupados_no_banco(self, espaco_ids, janelas):
+        """{posição da janela: espaco_ids ocupados}, consultando o banco, para janelas antes do horizonte."""
+        sql = """
+            SELECT j.ordem - 1 AS posicao, r.espaco_id
+            FROM unnest(%s::timestamptz[], %s::timestamptz[]) WITH ORDINALITY AS j(inicio, fim, ordem)
+            JOIN Reservas r
+              ON r.status IN %s
+             AND tstzrange(r.data_hora_inicio, r.data_hora_fim, '[)') && tstzrange(j.inicio, j.fim, '[)')
+             AND r.data_hora_inicio > j.inicio - interval '4 hours'
+             AND r.data_hora_inicio < j.fim
+            WHERE r.espaco_id = ANY(%s)
+            GROUP BY 1, 2
+        """
+        with db_connection() as conn:
+            if conn is None:
+                return None
+            with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+                cursor.execute(sql, ([i for i, _ in janelas], [f for _, f in janelas], STATUS_ATIVOS, list(espaco_ids)))
+                ocupados = {}
+                for linha in cursor.fetchall():
+                    ocupados.setdefault(linha['posicao'], set()).add(linha['espaco_id'])
+        return ocupados
+
+    def espacos_livres(self, espaco_ids, janelas):
+        """
+        Para cada janela (inicio, fim), retorna a lista dos espaco_ids livres,
+        na mesma ordem de `espaco_ids`. Retorna None se o índice não pôde ser
+        carregado.
+        """
+        if not self._garantir_carregado():
+            return None
+
+        vazio = _IntervalosEspaco()
+        with self._lock:
+            horizonte = self._horizonte
+            intervalos = [self._espacos.get(espaco_id, vazio) for espaco_id in espaco_ids]
+            livres = [
+                None if inicio < horizonte else
+                [espaco_id for espaco_id, ocupacao in zip(espaco_ids, intervalos) if not ocupacao.ocupado(inicio, fim)]
+                for inicio, fim in janelas
+            ]
+
+        # Janelas no passado: as reservas já terminadas não estão no índice
+        passadas = [posicao for posicao, ids in enumerate(livres) if ids is None]
+        if passadas and espaco_ids:
+            ocupados = self._ocupados_no_banco(espaco_ids, [janelas[posicao] for posicao in passadas])
+            if ocupados is None:
+                return None
+            for i, posicao in enumerate(passadas):
+                livres[posicao] = [espaco_id for espaco_id in espaco_ids if espaco_id not in ocupados.get(i, ())]
+        else:
+            livres = [ids if ids is not None else list(espaco_ids) for ids in livres]
+        return livres
+
+    # --- ATUALIZAÇÕES INCREMENTAIS (chamadas pelo models.py após o commit) ---
+
+    def adicionar(self, reserva):
+        """Registra uma reserva criada ou reativada, se ela estiver ativa."""
+        with self._lock:
+            if self._adiar(self.adicionar, reserva):
+                return
+            if reserva['status'] not in STATUS_ATIVOS or reserva['reserva_id'] in self._reservas:
+                return
+            self._espacos.setdefault(reserva['espaco_id'], _IntervalosEspaco()).adicionar(
+                reserva['data_hora_inicio'], reserva['data_hora_fim'], reserva['reserva_id']
+            )
+            self._reservas[reserva['reserva_id']] = (reserva['espaco_id'], reserva['data_hora_inicio'])
+
+    def remover(self, reserva_id):
+        """Retira uma reserva (deletada, cancelada ou recusada) do índice."""
+        with self._lock:
+            if self._adiar(self.remover, reserva_id):
+                return
+            encontrada = self._reservas.pop(reserva_id, None)
+            if encontrada is not None:
+                espaco_id, inicio = encontrada
+                self._espacos[espaco_id].remover(inicio, reserva_id)
+
+    def atualizar_status(self, reserva):
+        """Aplica uma mudança de status vinda de update_reserva_status (a linha já atualizada)."""
+        if reserva['status'] in STATUS_ATIVOS:
+            self.adicionar(reserva)
+        else:
+            self.remover(reserva['reserva_id'])
+
+    def remover_espaco(self, espaco_id):
+        """Descarta as reservas de um espaço deletado (ON DELETE CASCADE)."""
+        with self._lock:
+            if self._adiar(self.remover_espaco, espaco_id):
+                return
+            intervalos = self._espacos.pop(espaco_id, None)
+            if intervalos is not None:
+                for _, reserva_id in intervalos.chaves:
+                    self._reservas.pop(reserva_id, None)
+
+    def invalidar(self):
+        """
+        Descarta o índice e força a carga completa na próxima consulta. Só
+        para quando escritas podem ter se perdido (importação em massa,
+        reconexão do ouvinte, fork do worker).
+        """
+        with self._lock:
+            self._versao += 1
+            self._carregado = False
+            self._espacos = {}
+            self._reservas = {}
+
+
+indice_disponibilidade = IndiceDisponibilidade()
+
+
+def parse_datetime(valor):
+    """
+    Converte uma data ISO 8601 para datetime com fuso horário, para poder ser
+    comparada com as datas vindas do banco. Datas sem fuso são interpretadas
+    no fuso local do servidor. Lança ValueError se o formato for inválido.
+    """
+    data = datetime.fromisoformat(valor)
+    if data.tzinfo is None:
+        data = data.astimezone()
+    return data
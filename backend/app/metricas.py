@@ -0,0 +1,282 @@
+# backend/app/metricas.py
+
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import psycopg2.extensions
+from flask import g, request
+
+# Limites (em segundos) dos buckets dos histogramas
+LIMITES_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_SQL = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Permite desligar a medição dos comandos SQL sem mexer no código (METRICAS_SQL=0)
+METRICAS_SQL_ATIVAS = os.getenv('METRICAS_SQL', '1') != '0'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(nomes, valores, extra=''):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+class Histograma:
+    """
+    Histograma no estilo do Prometheus: contagem por bucket, soma e total,
+    separados por combinação de rótulos (ex: endpoint e status).
+    """
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), limites=LIMITES_HTTP):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.limites = tuple(limites)
+        self._series = {}  # valores dos rótulos -> [contagens por bucket, soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valores, valor):
+        posicao = bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def linhas(self):
+        with self._lock:
+            series = [(valores, list(contagens), soma, total) for valores, (contagens, soma, total) in self._series.items()]
+
+        for valores, contagens, soma, total in sorted(series):
+            acumulado = 0
+            for limite, contagem in zip(self.limites + ('+Inf',), contagens):
+                acumulado += contagem
+                rotulos = _formatar_rotulos(self.rotulos, valores, f'le="{limite}"')
+                yield f'{self.nome}_bucket{rotulos} {acumulado}'
+            rotulos = _formatar_rotulos(self.rotulos, valores)
+            yield f'{self.nome}_sum{rotulos} {soma:.6f}'
+            yield f'{self.nome}_count{rotulos} {total}'
+
+
+class Contador:
+    """Contador que só cresce, separado por combinação de rótulos."""
+
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, valores=(), quantidade=1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + quantidade
+
+    def linhas(self):
+        with self._lock:
+            valores = sorted(self._valores.items())
+        for rotulos, total in valores:
+            yield f'{self.nome}{_formatar_rotulos(self.rotulos, rotulos)} {total}'
+
+
+class RegistroMetricas:
+    """
+    Guarda as métricas do processo e as exporta no formato texto do Prometheus.
+
+    Além das métricas próprias, aceita "coletores": funções chamadas só na
+    exportação, que devolvem (nome, tipo, ajuda, valor) a partir de contadores
+    que já existem em outros módulos (pool de conexões, cache...).
+    """
+
+    def __init__(self):
+        self._metricas = []
+        self._coletores = []
+
+    def histograma(self, nome, ajuda, rotulos=(), limites=LIMITES_HTTP):
+        metrica = Histograma(nome, ajuda, rotulos, limites)
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        metrica = Contador(nome, ajuda, rotulos)
+        self._metricas.append(metrica)
+        return metrica
+
+    def coletor(self, funcao):
+        self._coletores.append(funcao)
+        return funcao
+
+    def exportar(self):
+        linhas = []
+        for metrica in self._metricas:
+            linhas.append(f'# HELP {metrica.nome} {metrica.ajuda}')
+            linhas.append(f'# TYPE {metrica.nome} {metrica.tipo}')
+            linhas.extend(metrica.linhas())
+
+        for coletor in self._coletores:
+            try:
+                amostras = list(coletor())
+            except Exception as e:
+                print(f"Erro ao coletar métricas de {coletor.__name__}: {e}")
+                continue
+            for nome, tipo, ajuda, valor in amostras:
+                linhas.append(f'# HELP {nome} {ajuda}')
+                linhas.append(f'# TYPE {nome} {tipo}')
+                linhas.append(f'{nome} {valor}')
+        return '\n'.join(linhas) + '\n'
+
+
+registro = RegistroMetricas()
+
+duracao_requisicoes = registro.histograma(
+    'http_requisicao_duracao_segundos', 'Tempo de resposta das rotas da API.',
+    ('endpoint', 'metodo', 'status'), LIMITES_HTTP,
+)
+duracao_comandos = registro.histograma(
+    'db_comando_duracao_segundos', 'Tempo de execução dos comandos SQL, por função que os executou.',
+    ('funcao',), LIMITES_SQL,
+)
+linhas_comandos = registro.contador(
+    'db_comando_linhas_total', 'Linhas retornadas ou afetadas pelos comandos SQL.', ('funcao',),
+)
+erros_comandos = registro.contador(
+    'db_comando_erros_total', 'Comandos SQL que terminaram em erro.', ('funcao',),
+)
+espera_pool = registro.histograma(
+    'db_pool_espera_segundos', 'Tempo para conseguir uma conexão do pool.', (), LIMITES_SQL,
+)
+
+
+# --- REQUISIÇÕES HTTP ---
+
+def registrar_metricas_http(app):
+    """Mede a duração de cada requisição, por endpoint, método e status."""
+
+    def observar(inicio, status):
+        endpoint = request.endpoint or 'sem_rota'
+        duracao_requisicoes.observar((endpoint, request.method, str(status)), time.perf_counter() - inicio)
+
+    @app.before_request
+    def iniciar_medicao():
+        g.inicio_requisicao = time.perf_counter()
+
+    @app.after_request
+    def finalizar_medicao(response):
+        inicio = g.pop('inicio_requisicao', None)
+        if inicio is None:
+            return response
+        if response.is_streamed:
+            # Em streaming o trabalho acontece enquanto o corpo é enviado:
+            # mede até o servidor fechar a resposta
+            rotulos = (request.endpoint or 'sem_rota', request.method, str(response.status_code))
+            response.call_on_close(lambda: duracao_requisicoes.observar(rotulos, time.perf_counter() - inicio))
+        else:
+            observar(inicio, response.status_code)
+        return response
+
+    @app.teardown_request
+    def medir_excecao(exc):
+        # Exceções não tratadas não passam pelo after_request
+        inicio = g.pop('inicio_requisicao', None)
+        if inicio is not None and exc is not None:
+            observar(inicio, 500)
+
+
+# --- COMANDOS SQL ---
+
+# Função do models.py (ou de outro módulo) dona dos comandos em andamento:
+# definida por db.db_connection ao emprestar a conexão, uma vez por bloco,
+# em vez de percorrer a pilha de chamadas a cada execute
+_funcao_atual = contextvars.ContextVar('funcao_sql', default='desconhecida')
+
+
+def rotular_comandos(funcao):
+    """Atribui os próximos comandos SQL a `funcao`. Retorna o rótulo anterior, para restaurar_rotulo."""
+    anterior = _funcao_atual.get()
+    _funcao_atual.set(funcao)
+    return anterior
+
+
+def restaurar_rotulo(anterior):
+    _funcao_atual.set(anterior)
+
+
+def funcao_atual():
+    return _funcao_atual.get()
+
+
+def _medir(cursor, funcao, inicio, ok):
+    duracao_comandos.observar((funcao,), time.perf_counter() - inicio)
+    if not ok:
+        erros_comandos.incrementar((funcao,))
+    elif cursor.rowcount > 0:
+        linhas_comandos.incrementar((funcao,), cursor.rowcount)
+
+
+class _CursorInstrumentado:
+    """Mixin que mede execute/executemany/copy_expert de qualquer classe de cursor."""
+
+    def execute(self, query, vars=None):
+        funcao, inicio, ok = _funcao_atual.get(), time.perf_counter(), False
+        try:
+            resultado = super().execute(query, vars)
+            ok = True
+            return resultado
+        finally:
+            _medir(self, funcao, inicio, ok)
+
+    def executemany(self, query, vars_list):
+        funcao, inicio, ok = _funcao_atual.get(), time.perf_counter(), False
+        try:
+            resultado = super().executemany(query, vars_list)
+            ok = True
+            return resultado
+        finally:
+            _medir(self, funcao, inicio, ok)
+
+    def copy_expert(self, sql, file, size=8192):
+        funcao, inicio, ok = _funcao_atual.get(), time.perf_counter(), False
+        try:
+            resultado = super().copy_expert(sql, file, size)
+            ok = True
+            return resultado
+        finally:
+            _medir(self, funcao, inicio, ok)
+
+
+_classes_instrumentadas = {}
+
+
+def _classe_instrumentada(fabrica):
+    """Cria (uma vez por classe) a subclasse medida de um cursor_factory, ex: DictCursor."""
+    classe = _classes_instrumentadas.get(fabrica)
+    if classe is None:
+        classe = type(f'{fabrica.__name__}Instrumentado', (_CursorInstrumentado, fabrica), {})
+        _classes_instrumentadas[fabrica] = classe
+    return classe
+
+
+class ConexaoInstrumentada(psycopg2.extensions.connection):
+    """
+    Conexão cujos cursores registram as métricas de cada comando. Usada como
+    connection_factory em db.get_db_connection; o código do models.py
+    continua pedindo o cursor_factory que quiser (DictCursor, cursores nomeados...).
+    """
+
+    def cursor(self, *args, **kwargs):
+        fabrica = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = _classe_instrumentada(fabrica)
+        return super().cursor(*args, **kwargs)
@@ -1,155 +1,147 @@
 # backend/app/models.py
 
+import base64
+import binascii
+import json
+import psycopg2.errors
 import psycopg2.extras
-from .db import get_db_connection
+from .cache import cached, catalogo_cache
+from .db import CursorDicionario, ao_confirmar, db_connection
+from .disponibilidade import indice_disponibilidade, parse_datetime
+from .preparadas import executar
 from datetime import datetime, timedelta, timezone
 
+MENSAGEM_CONFLITO_HORARIO = "Conflito de horários: o espaço já está reservado neste horário."
+
+# Nome com que a trigger do contador Usuarios.reservas_ativas recusa um aluno acima do limite
+CONSTRAINT_LIMITE_ATIVAS = 'usuarios_limite_reservas_ativas'
+
 # --- FUNÇÃO 1: Listar todos os espaços ---
+@cached('espacos')
 def get_all_espacos():
     """
     Busca todos os espaços cadastrados no banco de dados e os retorna.
     """
-    conn = get_db_connection()
-    if conn is None:
-        return []
+    with db_connection() as conn:
+        if conn is None:
+            return []
 
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    cursor.execute('SELECT * FROM Espacos ORDER BY nome ASC')
-    espacos = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return [dict(row) for row in espacos]
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            cursor.execute('SELECT * FROM Espacos ORDER BY nome ASC')
+            espacos = cursor.fetchall()
+    return espacos
 
 # --- FUNÇÃO 2: Buscar um espaço por ID ---
+@cached('espacos')
 def get_espaco_by_id(espaco_id):
     """Busca um único espaço pelo seu ID."""
-    conn = get_db_connection()
-    if conn is None:
-        return None
-
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    
-    # Usar %s para passar parâmetros previne ataques de SQL Injection.
-    cursor.execute('SELECT * FROM Espacos WHERE espaco_id = %s', (espaco_id,))
-    
-    espaco = cursor.fetchone()
-    
-    cursor.close()
-    conn.close()
-    
-    return dict(espaco) if espaco else None
+    with db_connection() as conn:
+        if conn is None:
+            return None
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            # Usar %s para passar parâmetros previne ataques de SQL Injection.
+            cursor.execute('SELECT * FROM Espacos WHERE espaco_id = %s', (espaco_id,))
+            espaco = cursor.fetchone()
+
+    return espaco
 
 # --- FUNÇÃO 3: Criar um novo espaço ---
 def create_espaco(dados_espaco):
-    """Cria um novo espaço no banco de dados."""
-    conn = get_db_connection()
-    if conn is None:
-        return None
-
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    
+    """Cria um novo espaço no banco de dados e o retorna (como get_espaco_by_id), ou None."""
     sql = """
         INSERT INTO Espacos (nome, tipo, capacidade, gestor_responsavel_id)
         VALUES (%s, %s, %s, %s)
-        RETURNING espaco_id;
+        RETURNING *;
     """
-    
-    try:
-        cursor.execute(sql, (
-            dados_espaco['nome'],
-            dados_espaco['tipo'],
-            dados_espaco.get('capacidade'),
-            dados_espaco['gestor_responsavel_id']
-        ))
-        
-        novo_espaco_id = cursor.fetchone()['espaco_id']
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        return novo_espaco_id
-    except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        print(f"Erro ao criar espaço: {e}")
-        return None
+
+    with db_connection() as conn:
+        if conn is None:
+            return None
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            try:
+                cursor.execute(sql, (
+                    dados_espaco['nome'],
+                    dados_espaco['tipo'],
+                    dados_espaco.get('capacidade'),
+                    dados_espaco['gestor_responsavel_id']
+                ))
+
+                novo_espaco = cursor.fetchone()
+                conn.commit()
+                ao_confirmar(lambda: catalogo_cache.invalidate('espacos'))
+                return novo_espaco
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao criar espaço: {e}")
+                return None
 
 # --- FUNÇÃO 4: Atualizar um espaço ---
 def update_espaco(espaco_id, dados_espaco):
-    """Atualiza um espaço existente no banco de dados."""
-    conn = get_db_connection()
-    if conn is None:
-        return 0
-
-    cursor = conn.cursor()
-
+    """
+    Atualiza um espaço existente no banco de dados. Retorna o espaço já
+    atualizado, ou None se o espaco_id não foi encontrado.
+    """
     sql = """
         UPDATE Espacos
         SET nome = %s, tipo = %s, capacidade = %s, gestor_responsavel_id = %s
-        WHERE espaco_id = %s;
+        WHERE espaco_id = %s
+        RETURNING *;
     """
 
-    try:
-        cursor.execute(sql, (
-            dados_espaco['nome'],
-            dados_espaco['tipo'],
-            dados_espaco.get('capacidade'),
-            dados_espaco['gestor_responsavel_id'],
-            espaco_id
-        ))
-
-        # rowcount retorna o número de linhas afetadas pelo comando.
-        # Será 1 se a atualização foi bem-sucedida, 0 se o espaco_id não foi encontrado.
-        updated_rows = cursor.rowcount
-
-        conn.commit()
-        cursor.close()
-        conn.close()
-
-        return updated_rows
-    except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        print(f"Erro ao atualizar espaço: {e}")
-        return 0
+    with db_connection() as conn:
+        if conn is None:
+            return None
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            try:
+                cursor.execute(sql, (
+                    dados_espaco['nome'],
+                    dados_espaco['tipo'],
+                    dados_espaco.get('capacidade'),
+                    dados_espaco['gestor_responsavel_id'],
+                    espaco_id
+                ))
+
+                # Nenhuma linha volta se o espaco_id não foi encontrado
+                espaco = cursor.fetchone()
+
+                conn.commit()
+                if espaco:
+                    ao_confirmar(lambda: catalogo_cache.invalidate('espacos'))
+                return espaco
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao atualizar espaço: {e}")
+                return None
 
 # --- FUNÇÃO 5: Deletar um espaço ---
 def delete_espaco(espaco_id):
     """Deleta um espaço do banco de dados."""
-    conn = get_db_connection()
-    if conn is None:
-        return 0
-
-    cursor = conn.cursor()
-
     sql = "DELETE FROM Espacos WHERE espaco_id = %s;"
 
-    try:
-        cursor.execute(sql, (espaco_id,))
-        deleted_rows = cursor.rowcount
-        conn.commit()
-        cursor.close()
-        conn.close()
-
-        return deleted_rows
-    except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        print(f"Erro ao deletar espaço: {e}")
-        return 0
+    with db_connection() as conn:
+        if conn is None:
+            return 0
+
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute(sql, (espaco_id,))
+                deleted_rows = cursor.rowcount
+                conn.commit()
+                if deleted_rows:
+                    ao_confirmar(lambda: catalogo_cache.invalidate('espacos'))
+                    ao_confirmar(lambda: indice_disponibilidade.remover_espaco(espaco_id))
+                return deleted_rows
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao deletar espaço: {e}")
+                return 0
 
 # --- FUNÇÃO 6: Buscar uma reserva por ID ---
 def get_reserva_by_id(reserva_id):
     """Busca uma única reserva pelo seu ID."""
-    conn = get_db_connection()
-    if conn is None:
-        return None
-
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-
     # Vamos fazer um JOIN para trazer informações úteis do espaço e do solicitante
     sql = """
         SELECT r.*, e.nome as espaco_nome, u.nome as solicitante_nome
@@ -158,181 +150,446 @@ def get_reserva_by_id(reserva_id):
         JOIN Usuarios u ON r.solicitante_id = u.usuario_id
         WHERE r.reserva_id = %s;
     """
-    cursor.execute(sql, (reserva_id,))
-    reserva = cursor.fetchone()
 
-    cursor.close()
-    conn.close()
-    return dict(reserva) if reserva else None
+    with db_connection() as conn:
+        if conn is None:
+            return None
 
-# --- FUNÇÃO 7: Criar uma nova reserva com validações ---
-def create_reserva(dados_reserva):
-    """Cria uma nova reserva no banco de dados após validar as regras de negócio."""
-    conn = get_db_connection()
-    if conn is None:
-        return {"erro": "Falha na conexão com o banco de dados"}
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            executar(cursor, sql, (reserva_id,))
+            reserva = cursor.fetchone()
 
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    return reserva
 
-    try:
-        # --- VALIDAÇÃO 1: O espaço e o usuário existem? ---
-        espaco = get_espaco_by_id(dados_reserva['espaco_id'])
-        if not espaco:
-            return {"erro": "Espaço não encontrado."}
-
-        cursor.execute("SELECT * FROM Usuarios WHERE usuario_id = %s", (dados_reserva['solicitante_id'],))
-        solicitante = cursor.fetchone()
-        if not solicitante:
-            return {"erro": "Solicitante não encontrado."}
-
-        # --- VALIDAÇÃO 2: Capacidade do espaço ---
-        if espaco['capacidade'] and dados_reserva['num_participantes'] > espaco['capacidade']:
-            return {"erro": f"Número de participantes ({dados_reserva['num_participantes']}) excede a capacidade do espaço ({espaco['capacidade']})."}
-
-        # --- VALIDAÇÃO 3: Laboratórios apenas para professores ---
-        if espaco['tipo'] == 'laboratorio' and solicitante['tipo'] not in ['professor', 'gestor']:
-            return {"erro": "Apenas professores e gestores podem reservar laboratórios."}
+# --- FUNÇÃO 7: Criar uma nova reserva com validações ---
+# Motivos de recusa que create_reserva pode devolver em resultado['motivo'].
+MOTIVOS_RECUSA_RESERVA = {
+    'espaco_nao_encontrado': "Espaço não encontrado.",
+    'solicitante_nao_encontrado': "Solicitante não encontrado.",
+    'capacidade_excedida': "Número de participantes ({num_participantes}) excede a capacidade do espaço ({capacidade}).",
+    'laboratorio_restrito': "Apenas professores e gestores podem reservar laboratórios.",
+    'limite_reservas_ativas': "Limite de 2 reservas ativas atingido para alunos.",
+    'conflito_horario': MENSAGEM_CONFLITO_HORARIO,
+    'sem_conexao': "Falha na conexão com o banco de dados",
+    'erro_interno': "Ocorreu um erro interno ao processar a reserva.",
+}
+
+def _recusa_reserva(motivo, **valores):
+    return {"erro": MOTIVOS_RECUSA_RESERVA[motivo].format(**valores), "motivo": motivo}
 
+def create_reserva(dados_reserva):
+    """
+    Cria uma nova reserva no banco de dados após validar as regras de negócio.
 
-        # --- MUDANÇA AQUI: VALIDAÇÃO 4: Limite de reservas ativas para alunos ---
-        if solicitante['tipo'] == 'aluno':
-            cursor.execute("""
-                SELECT COUNT(*) as total_ativas FROM Reservas
-                WHERE solicitante_id = %s AND status IN ('confirmada', 'pendente')
-            """, (solicitante['usuario_id'],))
-
-            if cursor.fetchone()['total_ativas'] >= 2:
-                return {"erro": "Limite de 2 reservas ativas atingido para alunos."}
-
-        # --- VALIDAÇÃO 5: Conflito de horários ---
-        cursor.execute("""
-            SELECT reserva_id FROM Reservas
-            WHERE espaco_id = %s AND status IN ('confirmada', 'pendente') AND
-            (data_hora_inicio < %s AND data_hora_fim > %s)
-        """, (dados_reserva['espaco_id'], dados_reserva['data_hora_fim'], dados_reserva['data_hora_inicio']))
-
-        if cursor.fetchone():
-            return {"erro": "O espaço já está reservado neste horário."}
-
-        # --- LÓGICA DE APROVAÇÃO AUTOMÁTICA ---
-        status_inicial = 'pendente'
-        if espaco['tipo'] == 'sala_de_aula':
-            status_inicial = 'confirmada'
-
-        # --- INSERÇÃO NO BANCO ---
-        sql = """
+    Todas as validações e o INSERT acontecem em um único comando SQL (uma ida
+    ao banco). Retorna a reserva criada já com espaco_nome e solicitante_nome,
+    no mesmo formato de get_reserva_by_id, ou {"erro": ..., "motivo": ...}
+    com um dos códigos de MOTIVOS_RECUSA_RESERVA.
+    """
+    # Cada CTE corresponde a uma etapa da validação antiga:
+    # - solicitacao: o espaço e o usuário existem? (LEFT JOIN deixa NULL quando não)
+    # - validacao: capacidade, laboratório só para professores/gestores e
+    #   limite de 2 reservas ativas para alunos, na mesma ordem de antes
+    # - inserida: só insere se nenhuma regra foi violada, já com a aprovação
+    #   automática de salas de aula
+    # O conflito de horários continua a cargo das constraints <partição>_sem_conflito
+    # (mesmo mês) e da trigger reservas_conflito_virada (meses vizinhos).
+    # O limite dos alunos lê o contador Usuarios.reservas_ativas (uma linha só);
+    # dois pedidos simultâneos do mesmo aluno são barrados pela trigger que
+    # mantém o contador (add_reservas_ativas_contador.sql).
+    sql = """
+        WITH solicitacao AS (
+            SELECT e.espaco_id, e.nome AS espaco_nome, e.tipo AS espaco_tipo, e.capacidade,
+                   u.usuario_id, u.nome AS solicitante_nome, u.tipo AS solicitante_tipo, u.reservas_ativas
+            FROM (VALUES (%(espaco_id)s::int, %(solicitante_id)s::int)) AS p(espaco_id, solicitante_id)
+            LEFT JOIN Espacos e ON e.espaco_id = p.espaco_id
+            LEFT JOIN Usuarios u ON u.usuario_id = p.solicitante_id
+        ),
+        validacao AS (
+            SELECT s.*,
+                CASE
+                    WHEN s.espaco_id IS NULL THEN 'espaco_nao_encontrado'
+                    WHEN s.usuario_id IS NULL THEN 'solicitante_nao_encontrado'
+                    WHEN s.capacidade > 0 AND %(num_participantes)s::int > s.capacidade THEN 'capacidade_excedida'
+                    WHEN s.espaco_tipo = 'laboratorio' AND s.solicitante_tipo NOT IN ('professor', 'gestor')
+                        THEN 'laboratorio_restrito'
+                    WHEN s.solicitante_tipo = 'aluno' AND s.reservas_ativas >= 2 THEN 'limite_reservas_ativas'
+                END AS motivo
+            FROM solicitacao s
+        ),
+        inserida AS (
             INSERT INTO Reservas (espaco_id, solicitante_id, data_hora_inicio, data_hora_fim, finalidade, num_participantes, status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING reserva_id;
-        """
-        cursor.execute(sql, (
-            dados_reserva['espaco_id'],
-            dados_reserva['solicitante_id'],
-            dados_reserva['data_hora_inicio'],
-            dados_reserva['data_hora_fim'],
-            dados_reserva.get('finalidade'),
-            dados_reserva['num_participantes'],
-            status_inicial
-        ))
-
-        novo_reserva_id = cursor.fetchone()['reserva_id']
-        conn.commit()
-
-        return {"id": novo_reserva_id}
-
-    except Exception as e:
-        conn.rollback()
-        print(f"Erro ao criar reserva: {e}")
-        return {"erro": "Ocorreu um erro interno ao processar a reserva."}
-    finally:
-        cursor.close()
-        conn.close()
-        
+            SELECT v.espaco_id, v.usuario_id, %(data_hora_inicio)s::timestamptz, %(data_hora_fim)s::timestamptz,
+                   %(finalidade)s::varchar, %(num_participantes)s::int,
+                   CASE WHEN v.espaco_tipo = 'sala_de_aula' THEN 'confirmada' ELSE 'pendente' END
+            FROM validacao v
+            WHERE v.motivo IS NULL
+            RETURNING *
+        )
+        SELECT v.motivo, v.capacidade AS espaco_capacidade, i.*, v.espaco_nome, v.solicitante_nome
+        FROM validacao v
+        LEFT JOIN inserida i ON true;
+    """
+    params = {
+        'espaco_id': dados_reserva['espaco_id'],
+        'solicitante_id': dados_reserva['solicitante_id'],
+        'data_hora_inicio': dados_reserva['data_hora_inicio'],
+        'data_hora_fim': dados_reserva['data_hora_fim'],
+        'finalidade': dados_reserva.get('finalidade'),
+        'num_participantes': dados_reserva['num_participantes'],
+    }
+
+    with db_connection() as conn:
+        if conn is None:
+            return _recusa_reserva('sem_conexao')
+
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+            try:
+                executar(cursor, sql, params)
+                reserva = dict(cursor.fetchone())
+                conn.commit()
+            except psycopg2.errors.ExclusionViolation:
+                conn.rollback()
+                return _recusa_reserva('conflito_horario')
+            except psycopg2.errors.CheckViolation as e:
+                conn.rollback()
+                if e.diag.constraint_name == CONSTRAINT_LIMITE_ATIVAS:
+                    return _recusa_reserva('limite_reservas_ativas')
+                print(f"Erro ao criar reserva: {e}")
+                return _recusa_reserva('erro_interno')
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao criar reserva: {e}")
+                return _recusa_reserva('erro_interno')
+
+    motivo = reserva.pop('motivo')
+    capacidade = reserva.pop('espaco_capacidade')
+    if motivo:
+        return _recusa_reserva(motivo, num_participantes=dados_reserva['num_participantes'], capacidade=capacidade)
+
+    ao_confirmar(lambda: indice_disponibilidade.adicionar(reserva))
+    return reserva
+
 # --- FUNÇÃO 8: Atualizar o status de uma reserva ---
 def update_reserva_status(reserva_id, novo_status, aprovador_id):
     """
     Atualiza o status de uma reserva (ex: de 'pendente' para 'confirmada').
     Registra o ID do gestor que realizou a ação.
-    """
-    conn = get_db_connection()
-    if conn is None:
-        return 0
-
-    cursor = conn.cursor()
 
+    Retorna a reserva atualizada, com espaco_nome e solicitante_nome (mesmo
+    formato de get_reserva_by_id), None se ela não existe ou o status é
+    inválido, ou {"erro": ..., "motivo": ...} se o banco recusou a mudança
+    (ex: reativar uma reserva cancelada num horário já ocupado).
+    """
     # Validação para garantir que o novo status é um dos valores permitidos.
     # Isso previne que a API tente inserir um status inválido no banco.
     status_permitidos = ['confirmada', 'cancelada', 'recusada']
     if novo_status not in status_permitidos:
-        return 0 # Retorna 0 se o status for inválido
+        return None # Retorna None se o status for inválido
 
+    # O UPDATE devolve a linha nova (com o que as triggers preencheram) e os
+    # nomes vêm no mesmo comando, sem uma segunda consulta
     sql = """
-        UPDATE Reservas
-        SET status = %s, aprovador_id = %s
-        WHERE reserva_id = %s;
+        WITH atualizada AS (
+            UPDATE Reservas
+            SET status = %s, aprovador_id = %s
+            WHERE reserva_id = %s
+            RETURNING *
+        )
+        SELECT a.*, e.nome as espaco_nome, u.nome as solicitante_nome
+        FROM atualizada a
+        JOIN Espacos e ON a.espaco_id = e.espaco_id
+        JOIN Usuarios u ON a.solicitante_id = u.usuario_id;
     """
 
-    try:
-        cursor.execute(sql, (novo_status, aprovador_id, reserva_id))
-        updated_rows = cursor.rowcount
-        conn.commit()
-        cursor.close()
-        conn.close()
-
-        return updated_rows
-    except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        print(f"Erro ao atualizar status da reserva: {e}")
-        return 0
-    
-# --- FUNÇÃO 9: Listar todas as reservas com filtros ---
-def get_all_reservas(filtros):
-    """Busca todas as reservas, aplicando filtros dinâmicos."""
-    conn = get_db_connection()
-    if conn is None:
-        return []
+    with db_connection() as conn:
+        if conn is None:
+            return _recusa_reserva('sem_conexao')
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            try:
+                executar(cursor, sql, (novo_status, aprovador_id, reserva_id))
+                reserva = cursor.fetchone()
+                conn.commit()
+                if reserva:
+                    ao_confirmar(lambda: indice_disponibilidade.atualizar_status(reserva))
+                return reserva
+            except psycopg2.errors.ExclusionViolation:
+                # Reativada ('confirmada') num horário que outra reserva já ocupa
+                conn.rollback()
+                return _recusa_reserva('conflito_horario')
+            except psycopg2.errors.CheckViolation as e:
+                conn.rollback()
+                if e.diag.constraint_name == CONSTRAINT_LIMITE_ATIVAS:
+                    return _recusa_reserva('limite_reservas_ativas')
+                print(f"Erro ao atualizar status da reserva: {e}")
+                return _recusa_reserva('erro_interno')
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao atualizar status da reserva: {e}")
+                return _recusa_reserva('erro_interno')
 
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+# --- FUNÇÃO 9: Listar todas as reservas com filtros ---
+SQL_RESERVAS_COM_NOMES = """
+    SELECT r.*, e.nome as espaco_nome, u.nome as solicitante_nome
+    FROM Reservas r
+    JOIN Espacos e ON r.espaco_id = e.espaco_id
+    JOIN Usuarios u ON r.solicitante_id = u.usuario_id
+"""
+
+# Maior página aceita por get_reservas_pagina
+LIMITE_MAXIMO_PAGINA = 500
+
+def _filtro_convertido(filtros, nome, conversao):
+    """O valor do filtro `nome` convertido, ou ValueError com o nome do filtro inválido."""
+    try:
+        return conversao(filtros[nome])
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Filtro '{nome}' inválido.") from e
 
-    sql = """
-        SELECT r.*, e.nome as espaco_nome, u.nome as solicitante_nome
-        FROM Reservas r
-        JOIN Espacos e ON r.espaco_id = e.espaco_id
-        JOIN Usuarios u ON r.solicitante_id = u.usuario_id
+def _filtros_reservas(filtros):
+    """
+    Monta as cláusulas WHERE (e seus parâmetros) a partir dos filtros da listagem.
+    Lança ValueError se um id não for número ou uma data não estiver em ISO 8601,
+    antes de qualquer consulta (e antes de uma resposta em streaming começar).
     """
-
     where_clauses = []
     params = []
 
     if filtros.get('espaco_id'):
         where_clauses.append("r.espaco_id = %s")
-        params.append(filtros['espaco_id'])
+        params.append(_filtro_convertido(filtros, 'espaco_id', int))
 
     if filtros.get('solicitante_id'):
         where_clauses.append("r.solicitante_id = %s")
-        params.append(filtros['solicitante_id'])
+        params.append(_filtro_convertido(filtros, 'solicitante_id', int))
 
     # --- MUDANÇA AQUI ---
     if filtros.get('status'):
-        # Divide a string 'pendente,confirmada' em uma tupla ('pendente', 'confirmada')
-        statuses = tuple(filtros['status'].split(','))
-        # Usa o operador 'IN' do SQL para buscar em uma lista de valores
-        where_clauses.append("r.status IN %s")
+        # Divide a string 'pendente,confirmada' em uma lista ['pendente', 'confirmada']
+        statuses = filtros['status'].split(',')
+        # '= ANY(array)' em vez de 'IN (...)': a SQL não muda com o número de
+        # status, então pode ser preparada uma vez só
+        where_clauses.append("r.status = ANY(%s)")
         params.append(statuses)
 
+    # Intervalo de datas: traz as reservas que ocupam algum momento entre 'inicio' e 'fim'
+    if filtros.get('inicio'):
+        inicio = _filtro_convertido(filtros, 'inicio', parse_datetime)
+        where_clauses.append("r.data_hora_fim > %s")
+        params.append(inicio)
+        # Redundante (uma reserva dura no máximo 4 horas), mas é uma condição
+        # na chave de partição: a consulta só lê os meses do período
+        where_clauses.append("r.data_hora_inicio > %s::timestamptz - interval '4 hours'")
+        params.append(inicio)
+
+    if filtros.get('fim'):
+        where_clauses.append("r.data_hora_inicio < %s")
+        params.append(_filtro_convertido(filtros, 'fim', parse_datetime))
+
+    return where_clauses, params
+
+def encode_cursor_reservas(reserva):
+    """Gera o token opaco de paginação a partir da última reserva de uma página."""
+    chave = [reserva['data_hora_inicio'].isoformat(), reserva['reserva_id']]
+    return base64.urlsafe_b64encode(json.dumps(chave).encode()).decode()
+
+def decode_cursor_reservas(token):
+    """Lê um token de paginação. Lança ValueError se ele for inválido."""
+    try:
+        data_iso, reserva_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return datetime.fromisoformat(data_iso), int(reserva_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError("Cursor de paginação inválido.") from e
+
+def get_all_reservas(filtros):
+    """Busca todas as reservas, aplicando filtros dinâmicos. Lança ValueError se um filtro for inválido."""
+    where_clauses, params = _filtros_reservas(filtros)
+
+    sql = SQL_RESERVAS_COM_NOMES
     if where_clauses:
         sql += " WHERE " + " AND ".join(where_clauses)
 
     sql += " ORDER BY r.data_hora_inicio DESC;"
 
-    cursor.execute(sql, tuple(params))
-    reservas = cursor.fetchall()
+    with db_connection() as conn:
+        if conn is None:
+            return []
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            executar(cursor, sql, tuple(params))
+            reservas = cursor.fetchall()
+
+    return reservas
+
+def get_reservas_pagina(filtros, limite, cursor=None):
+    """
+    Busca uma página de reservas usando paginação por chave (keyset) em
+    (data_hora_inicio, reserva_id), na mesma ordem decrescente da listagem completa.
+
+    Retorna (reservas, proximo_cursor); proximo_cursor é None na última página.
+    Lança ValueError se o cursor ou um filtro for inválido.
+    """
+    limite = max(1, min(int(limite), LIMITE_MAXIMO_PAGINA))
+    where_clauses, params = _filtros_reservas(filtros)
+
+    if cursor:
+        # Continua exatamente depois da última linha da página anterior
+        where_clauses.append("(r.data_hora_inicio, r.reserva_id) < (%s, %s)")
+        params.extend(decode_cursor_reservas(cursor))
+
+    sql = SQL_RESERVAS_COM_NOMES
+    if where_clauses:
+        sql += " WHERE " + " AND ".join(where_clauses)
+
+    # Pede uma linha a mais só para saber se existe próxima página
+    sql += " ORDER BY r.data_hora_inicio DESC, r.reserva_id DESC LIMIT %s;"
+    params.append(limite + 1)
+
+    with db_connection() as conn:
+        if conn is None:
+            return [], None
+
+        with conn.cursor(cursor_factory=CursorDicionario) as db_cursor:
+            executar(db_cursor, sql, tuple(params))
+            reservas = db_cursor.fetchall()
+
+    proximo_cursor = None
+    if len(reservas) > limite:
+        reservas = reservas[:limite]
+        proximo_cursor = encode_cursor_reservas(reservas[-1])
+
+    return reservas, proximo_cursor
+
+def iter_reservas(filtros, tamanho_lote=1000):
+    """
+    Percorre as reservas filtradas com um cursor nomeado (server-side),
+    trazendo `tamanho_lote` linhas por vez. A memória usada não depende do
+    tamanho do resultado. A conexão fica emprestada até o gerador terminar
+    ou ser fechado; é uma conexão própria, e não a da requisição, porque o
+    gerador é consumido durante o streaming, depois do fim da requisição.
+
+    Os filtros são validados já na chamada (ValueError), e não na primeira
+    linha lida, para que a rota responda 400 antes de o streaming começar.
+    """
+    where_clauses, params = _filtros_reservas(filtros)
+
+    sql = SQL_RESERVAS_COM_NOMES
+    if where_clauses:
+        sql += " WHERE " + " AND ".join(where_clauses)
+
+    sql += " ORDER BY r.data_hora_inicio DESC, r.reserva_id DESC;"
+
+    return _percorrer_reservas(sql, params, tamanho_lote)
+
+def _percorrer_reservas(sql, params, tamanho_lote):
+    with db_connection(propria=True) as conn:
+        if conn is None:
+            return
 
-    cursor.close()
-    conn.close()
-    return [dict(row) for row in reservas]
+        with conn.cursor(name='iter_reservas', cursor_factory=CursorDicionario) as cursor:
+            cursor.itersize = tamanho_lote
+            cursor.execute(sql, tuple(params))
+            yield from cursor
+
+class TokenSincronizacaoExpiradoError(Exception):
+    """O token é anterior à última limpeza de reservas_removidas: é preciso buscar tudo de novo."""
+
+def encode_token_sincronizacao(txid):
+    return base64.urlsafe_b64encode(json.dumps({'txid': txid}).encode()).decode()
+
+def decode_token_sincronizacao(token):
+    """Lê um token de sincronização. Lança ValueError se ele for inválido."""
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(token.encode()))['txid'])
+    except (TypeError, ValueError, KeyError, binascii.Error) as e:
+        raise ValueError("Token de sincronização inválido.") from e
+
+def get_reservas_alteradas(filtros, token=None):
+    """
+    Sincronização incremental (scripts/add_reservas_sincronizacao.sql).
+    Retorna (reservas, removidas, novo_token):
+    - reservas: as que atendem aos filtros e mudaram desde o token (todas, sem token);
+    - removidas: ids das apagadas ou que deixaram de atender aos filtros;
+    - novo_token: a ser enviado na próxima chamada.
+    Uma mesma mudança pode vir em duas chamadas seguidas; o cliente só substitui a linha.
+    Lança ValueError se o token for inválido e TokenSincronizacaoExpiradoError se ele expirou.
+    """
+    desde = decode_token_sincronizacao(token) if token else None
+    where_clauses, params = _filtros_reservas(filtros)
+
+    with db_connection() as conn:
+        if conn is None:
+            return [], [], None
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            # O novo token vem antes das consultas: o que terminar depois dele
+            # é entregue de novo na próxima chamada, nunca perdido
+            cursor.execute("""
+                SELECT txid_snapshot_xmin(txid_current_snapshot()) AS txid,
+                       (SELECT txid_minimo FROM reservas_sincronizacao) AS txid_minimo;
+            """)
+            marco = cursor.fetchone()
+            if desde is not None and desde < (marco['txid_minimo'] or 0):
+                raise TokenSincronizacaoExpiradoError()
+
+            sql = SQL_RESERVAS_COM_NOMES
+            clausulas = list(where_clauses)
+            if desde is not None:
+                clausulas.append("r.txid_alteracao >= %s")
+            if clausulas:
+                sql += " WHERE " + " AND ".join(clausulas)
+            sql += " ORDER BY r.data_hora_inicio DESC;"
+            executar(cursor, sql, tuple(params + ([desde] if desde is not None else [])))
+            reservas = cursor.fetchall()
+
+            removidas = []
+            if desde is not None:
+                sql = "SELECT reserva_id FROM reservas_removidas WHERE txid >= %s"
+                params_removidas = [desde]
+                if where_clauses:
+                    # Alteradas que saíram do filtro (ex: pendente -> confirmada com ?status=pendente)
+                    sql += """
+                        UNION
+                        SELECT r.reserva_id FROM Reservas r
+                        WHERE r.txid_alteracao >= %s AND NOT (""" + " AND ".join(where_clauses) + ")"
+                    params_removidas += [desde] + params
+                executar(cursor, sql + ";", tuple(params_removidas))
+                removidas = [row['reserva_id'] for row in cursor.fetchall()]
+
+    return reservas, removidas, encode_token_sincronizacao(marco['txid'])
+
+def limpar_reservas_removidas(dias):
+    """
+    Apaga os registros de reservas removidas há mais de `dias` dias. Tokens de
+    sincronização anteriores a eles passam a ser recusados. Retorna quantos
+    registros foram apagados, ou {"erro": ...}.
+    """
+    sql = """
+        WITH apagadas AS (
+            DELETE FROM reservas_removidas
+            WHERE removida_em < now() - make_interval(days => %s)
+            RETURNING txid
+        )
+        UPDATE reservas_sincronizacao
+        SET txid_minimo = GREATEST(txid_minimo, (SELECT MAX(txid) + 1 FROM apagadas))
+        WHERE EXISTS (SELECT 1 FROM apagadas)
+        RETURNING (SELECT COUNT(*) FROM apagadas);
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return {"erro": "Falha na conexão com o banco de dados"}
+
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute(sql, (int(dias),))
+                linha = cursor.fetchone()
+                conn.commit()
+                return {"removidas_apagadas": linha[0] if linha else 0}
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao limpar reservas removidas: {e}")
+                return {"erro": "Erro interno ao limpar as reservas removidas."}
 
 # --- FUNÇÃO 10: Deletar/Cancelar uma reserva ---
 def delete_reserva(reserva_id, current_user):
@@ -341,55 +598,47 @@ def delete_reserva(reserva_id, current_user):
     - Gestores podem cancelar qualquer reserva a qualquer momento.
     - Outros usuários podem cancelar se atenderem à regra de 12h.
     """
-    conn = get_db_connection()
-    if conn is None:
-        return {"erro": "Falha na conexão com o banco de dados"}
+    with db_connection() as conn:
+        if conn is None:
+            return {"erro": "Falha na conexão com o banco de dados"}
 
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+            try:
+                cursor.execute("SELECT * FROM Reservas WHERE reserva_id = %s", (reserva_id,))
+                reserva = cursor.fetchone()
 
-    try:
-        cursor.execute("SELECT * FROM Reservas WHERE reserva_id = %s", (reserva_id,))
-        reserva = cursor.fetchone()
-
-        if not reserva:
-            return {"erro": "Reserva não encontrada."}
+                if not reserva:
+                    return {"erro": "Reserva não encontrada."}
 
-        is_owner = reserva['solicitante_id'] == int(current_user['sub'])
-        is_gestor = current_user['tipo'] == 'gestor'
+                is_owner = reserva['solicitante_id'] == int(current_user['sub'])
+                is_gestor = current_user['tipo'] == 'gestor'
 
-        if not is_owner and not is_gestor:
-            return {"erro": "Ação não permitida. Você não tem permissão para cancelar esta reserva."}
+                if not is_owner and not is_gestor:
+                    return {"erro": "Ação não permitida. Você não tem permissão para cancelar esta reserva."}
 
-        # Se for o dono, mas não for gestor, precisa checar a regra das 12h
-        if is_owner and not is_gestor:
-            # --- CORREÇÃO AQUI: Usamos a hora atual com fuso horário UTC ---
-            agora_utc = datetime.now(timezone.utc)
-            if agora_utc > (reserva['data_hora_inicio'] - timedelta(hours=12)):
-                return {"erro": "Cancelamento não permitido. O prazo de 12 horas de antecedência foi excedido."}
+                # Se for o dono, mas não for gestor, precisa checar a regra das 12h
+                if is_owner and not is_gestor:
+                    # --- CORREÇÃO AQUI: Usamos a hora atual com fuso horário UTC ---
+                    agora_utc = datetime.now(timezone.utc)
+                    if agora_utc > (reserva['data_hora_inicio'] - timedelta(hours=12)):
+                        return {"erro": "Cancelamento não permitido. O prazo de 12 horas de antecedência foi excedido."}
 
-        cursor.execute("DELETE FROM Reservas WHERE reserva_id = %s", (reserva_id,))
-        deleted_rows = cursor.rowcount
-        conn.commit()
+                cursor.execute("DELETE FROM Reservas WHERE reserva_id = %s", (reserva_id,))
+                deleted_rows = cursor.rowcount
+                conn.commit()
+                if deleted_rows:
+                    ao_confirmar(lambda: indice_disponibilidade.remover(reserva_id))
 
-        return {"sucesso": deleted_rows}
+                return {"sucesso": deleted_rows}
 
-    except Exception as e:
-        conn.rollback()
-        print(f"Erro ao deletar reserva: {e}")
-        return {"erro": "Ocorreu um erro interno ao processar o cancelamento."}
-    finally:
-        cursor.close()
-        conn.close()
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao deletar reserva: {e}")
+                return {"erro": "Ocorreu um erro interno ao processar o cancelamento."}
 
 # --- FUNÇÃO 11: Listar todos os usuários ---
 def get_all_usuarios():
     """Busca todos os usuários cadastrados, sem incluir a senha."""
-    conn = get_db_connection()
-    if conn is None:
-        return []
-
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-
     # Selecionamos todos os campos, EXCETO a senha.
     sql = """
         SELECT u.usuario_id, u.nome, u.email, u.tipo, d.nome as departamento_nome
@@ -397,84 +646,85 @@ def get_all_usuarios():
         LEFT JOIN Departamentos d ON u.departamento_id = d.departamento_id
         ORDER BY u.nome ASC;
     """
-    cursor.execute(sql)
-    usuarios = cursor.fetchall()
 
-    cursor.close()
-    conn.close()
-    return [dict(row) for row in usuarios]
+    with db_connection() as conn:
+        if conn is None:
+            return []
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            cursor.execute(sql)
+            usuarios = cursor.fetchall()
+
+    return usuarios
 
 # --- FUNÇÃO 12: Buscar um usuário por ID ---
 def get_usuario_by_id(usuario_id):
     """Busca um único usuário pelo seu ID, sem incluir a senha."""
-    conn = get_db_connection()
-    if conn is None:
-        return None
-
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-
     sql = """
         SELECT u.usuario_id, u.nome, u.email, u.tipo, d.nome as departamento_nome
         FROM Usuarios u
         LEFT JOIN Departamentos d ON u.departamento_id = d.departamento_id
         WHERE u.usuario_id = %s;
     """
-    cursor.execute(sql, (usuario_id,))
-    usuario = cursor.fetchone()
 
-    cursor.close()
-    conn.close()
-    return dict(usuario) if usuario else None
+    with db_connection() as conn:
+        if conn is None:
+            return None
 
-# --- FUNÇÃO 13: Criar um novo usuário ---
-def create_usuario(dados_usuario):
-    """Cria um novo usuário, salvando a senha em texto puro."""
-    conn = get_db_connection()
-    if conn is None:
-        return None
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            cursor.execute(sql, (usuario_id,))
+            usuario = cursor.fetchone()
 
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    return usuario
 
+# --- FUNÇÃO 13: Criar um novo usuário ---
+def create_usuario(dados_usuario):
+    """
+    Cria um novo usuário, salvando a senha em texto puro.
+    Retorna o usuário criado (mesmo formato de get_usuario_by_id), ou None.
+    """
     # A senha original é pega diretamente dos dados recebidos
     senha_pura = dados_usuario['senha']
 
     sql = """
-        INSERT INTO Usuarios (nome, email, senha, tipo, departamento_id)
-        VALUES (%s, %s, %s, %s, %s)
-        RETURNING usuario_id;
+        WITH novo AS (
+            INSERT INTO Usuarios (nome, email, senha, tipo, departamento_id)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING usuario_id, nome, email, tipo, departamento_id
+        )
+        SELECT n.usuario_id, n.nome, n.email, n.tipo, d.nome as departamento_nome
+        FROM novo n
+        LEFT JOIN Departamentos d ON n.departamento_id = d.departamento_id;
     """
 
-    try:
-        cursor.execute(sql, (
-            dados_usuario['nome'],
-            dados_usuario['email'],
-            senha_pura, # Salva a senha em TEXTO PURO
-            dados_usuario['tipo'],
-            dados_usuario.get('departamento_id')
-        ))
-
-        novo_usuario_id = cursor.fetchone()['usuario_id']
-        conn.commit()
-        cursor.close()
-        conn.close()
-
-        return novo_usuario_id
-    except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        print(f"Erro ao criar usuário: {e}")
-        return None
-    
+    with db_connection() as conn:
+        if conn is None:
+            return None
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            try:
+                cursor.execute(sql, (
+                    dados_usuario['nome'],
+                    dados_usuario['email'],
+                    senha_pura, # Salva a senha em TEXTO PURO
+                    dados_usuario['tipo'],
+                    dados_usuario.get('departamento_id')
+                ))
+
+                novo_usuario = cursor.fetchone()
+                conn.commit()
+                return novo_usuario
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao criar usuário: {e}")
+                return None
+
 # --- FUNÇÃO 14: Atualizar um usuário ---
 def update_usuario(usuario_id, dados_usuario):
-    """Atualiza um usuário existente. Se uma nova senha for fornecida, ela também é atualizada."""
-    conn = get_db_connection()
-    if conn is None:
-        return 0
-
-    cursor = conn.cursor()
-
+    """
+    Atualiza um usuário existente. Se uma nova senha for fornecida, ela também é atualizada.
+    Retorna o usuário atualizado (mesmo formato de get_usuario_by_id), ou None se não existe.
+    """
     # Monta a query dinamicamente
     fields = [
         'nome = %s',
@@ -494,68 +744,75 @@ def update_usuario(usuario_id, dados_usuario):
         fields.append('senha = %s')
         params.append(dados_usuario['senha']) # Lembre-se, não estamos usando hash
 
-    sql = f"UPDATE Usuarios SET {', '.join(fields)} WHERE usuario_id = %s;"
+    sql = f"""
+        WITH atualizado AS (
+            UPDATE Usuarios SET {', '.join(fields)} WHERE usuario_id = %s
+            RETURNING usuario_id, nome, email, tipo, departamento_id
+        )
+        SELECT a.usuario_id, a.nome, a.email, a.tipo, d.nome as departamento_nome
+        FROM atualizado a
+        LEFT JOIN Departamentos d ON a.departamento_id = d.departamento_id;
+    """
     params.append(usuario_id)
 
-    try:
-        cursor.execute(sql, tuple(params))
-        updated_rows = cursor.rowcount
-        conn.commit()
-        return updated_rows
-    except Exception as e:
-        conn.rollback()
-        print(f"Erro ao atualizar usuário: {e}")
-        return 0
-    finally:
-        cursor.close()
-        conn.close()
+    with db_connection() as conn:
+        if conn is None:
+            return None
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            try:
+                cursor.execute(sql, tuple(params))
+                usuario = cursor.fetchone()
+                conn.commit()
+                return usuario
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao atualizar usuário: {e}")
+                return None
 
 # --- FUNÇÃO 15: Deletar um usuário ---
 def delete_usuario(usuario_id):
     """Deleta um usuário do banco de dados."""
-    conn = get_db_connection()
-    if conn is None:
-        return 0
-
-    cursor = conn.cursor()
     sql = "DELETE FROM Usuarios WHERE usuario_id = %s;"
 
-    try:
-        cursor.execute(sql, (usuario_id,))
-        deleted_rows = cursor.rowcount
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return deleted_rows
-    except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        print(f"Erro ao deletar usuário: {e}")
-        return 0
-    
+    with db_connection() as conn:
+        if conn is None:
+            return 0
+
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute(sql, (usuario_id,))
+                deleted_rows = cursor.rowcount
+                conn.commit()
+                if deleted_rows:
+                    # O ON DELETE SET NULL em gestor_responsavel_id altera linhas de Espacos
+                    ao_confirmar(lambda: catalogo_cache.invalidate('espacos'))
+                    # As reservas do usuário foram apagadas em cascata
+                    ao_confirmar(indice_disponibilidade.invalidar)
+                return deleted_rows
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao deletar usuário: {e}")
+                return 0
+
 # --- FUNÇÃO 16: Autenticar um usuário ---
 def authenticate_usuario(email, senha):
     """
     Verifica se um usuário com o e-mail e senha fornecidos existe.
     Retorna os dados do usuário se as credenciais estiverem corretas, senão retorna None.
     """
-    conn = get_db_connection()
-    if conn is None:
-        return None
-
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    with db_connection() as conn:
+        if conn is None:
+            return None
 
-    # Busca o usuário pelo e-mail
-    cursor.execute("SELECT * FROM Usuarios WHERE email = %s", (email,))
-    usuario = cursor.fetchone()
-
-    cursor.close()
-    conn.close()
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            # Busca o usuário pelo e-mail
+            executar(cursor, "SELECT * FROM Usuarios WHERE email = %s", (email,))
+            usuario = cursor.fetchone()
 
     # Se o usuário foi encontrado e a senha (em texto puro) corresponde
     if usuario and usuario['senha'] == senha:
-        return dict(usuario)
+        return usuario
 
     # Se o usuário não existe ou a senha está errada
     return None
@@ -565,12 +822,6 @@ def get_available_espacos(filtros):
     """
     Busca espaços que NÃO TÊM reservas conflitantes no período especificado.
     """
-    conn = get_db_connection()
-    if conn is None:
-        return []
-
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-
     # Parâmetros obrigatórios para a busca
     data_inicio = filtros.get('inicio')
     data_fim = filtros.get('fim')
@@ -590,10 +841,15 @@ def get_available_espacos(filtros):
             SELECT 1 FROM Reservas r
             WHERE r.espaco_id = e.espaco_id
             AND r.status IN ('confirmada', 'pendente')
-            AND (r.data_hora_inicio < %s AND r.data_hora_fim > %s)
+            AND tstzrange(r.data_hora_inicio, r.data_hora_fim, '[)') && tstzrange(%s, %s, '[)')
+            AND r.data_hora_inicio > %s::timestamptz - interval '4 hours'
+            AND r.data_hora_inicio < %s
         )
     """
-    params = [data_fim, data_inicio]
+    # A sobreposição escrita com tstzrange usa o índice GiST da constraint de conflito;
+    # o intervalo em data_hora_inicio (reservas duram no máximo 4 horas) limita
+    # a busca às partições do período
+    params = [data_inicio, data_fim, data_inicio, data_fim]
 
     # Adiciona o filtro de tipo se ele for fornecido
     if tipo_espaco:
@@ -602,72 +858,443 @@ def get_available_espacos(filtros):
 
     sql += " ORDER BY e.nome;"
 
-    cursor.execute(sql, tuple(params))
-    espacos_disponiveis = [dict(row) for row in cursor.fetchall()]
+    with db_connection() as conn:
+        if conn is None:
+            return []
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            executar(cursor, sql, tuple(params))
+            espacos_disponiveis = cursor.fetchall()
 
-    cursor.close()
-    conn.close()
     return espacos_disponiveis
 
+# --- FUNÇÃO 18: Criar reservas em lote (lista ou recorrência) ---
+# Maior número de ocorrências aceitas em um único lote
+MAX_OCORRENCIAS_LOTE = 100
+
+def gerar_ocorrencias_semanais(data_hora_inicio, data_hora_fim, ate):
+    """
+    Gera as ocorrências semanais de uma reserva, da primeira data até a data
+    'ate' (inclusive). As datas continuam no mesmo formato/fuso das originais.
+    Lança ValueError se alguma data for inválida ou passar do limite do lote.
+    """
+    inicio = datetime.fromisoformat(data_hora_inicio)
+    fim = datetime.fromisoformat(data_hora_fim)
+    limite = datetime.fromisoformat(ate).date()
+
+    ocorrencias = []
+    while inicio.date() <= limite:
+        if len(ocorrencias) == MAX_OCORRENCIAS_LOTE:
+            raise ValueError(f"A recorrência gera mais de {MAX_OCORRENCIAS_LOTE} ocorrências.")
+        ocorrencias.append({'data_hora_inicio': inicio.isoformat(), 'data_hora_fim': fim.isoformat()})
+        inicio += timedelta(weeks=1)
+        fim += timedelta(weeks=1)
+    return ocorrencias
+
+def _datas_validas(ocorrencia):
+    """Mesmas regras das constraints chk_datas_validas e chk_duracao_maxima."""
+    try:
+        inicio = datetime.fromisoformat(ocorrencia['data_hora_inicio'])
+        fim = datetime.fromisoformat(ocorrencia['data_hora_fim'])
+        return inicio < fim <= inicio + timedelta(hours=4)
+    except (KeyError, TypeError, ValueError):
+        return False
+
+def create_reservas_lote(dados_reserva, ocorrencias, tudo_ou_nada=True):
+    """
+    Cria várias ocorrências da mesma reserva (mesmo espaço, solicitante,
+    finalidade e participantes) em uma única transação.
+
+    As regras que não dependem da data (espaço/solicitante existem, capacidade,
+    laboratório) são checadas uma vez para o lote todo; o limite de reservas
+    ativas dos alunos considera o lote inteiro. Todas as ocorrências são
+    inseridas em um único INSERT multi-linha com ON CONFLICT DO NOTHING: as
+    que esbarram na constraint de conflito de horários simplesmente não entram.
+
+    - tudo_ou_nada=True: se qualquer ocorrência falhar, nada é gravado.
+    - tudo_ou_nada=False: grava as que passaram e informa as que falharam.
+
+    Retorna {"criadas": n, "ocorrencias": [...]} com o resultado de cada
+    ocorrência, ou {"erro": ..., "motivo": ...} se o lote todo for recusado.
+    """
+    sql_contexto = """
+        SELECT e.espaco_id, e.tipo AS espaco_tipo, e.capacidade,
+               u.usuario_id, u.tipo AS solicitante_tipo, u.reservas_ativas AS total_ativas
+        FROM (VALUES (%s::int, %s::int)) AS p(espaco_id, solicitante_id)
+        LEFT JOIN Espacos e ON e.espaco_id = p.espaco_id
+        LEFT JOIN Usuarios u ON u.usuario_id = p.solicitante_id;
+    """
+    # O LEFT JOIN final devolve, para cada ocorrência (na ordem pedida), o
+    # reserva_id criado ou NULL se ela foi descartada. O ON CONFLICT só
+    # enxerga a partição (mês) em que a linha entraria; o NOT EXISTS descarta
+    # antes as ocorrências que conflitam com reservas de outro mês, que
+    # fariam a trigger reservas_conflito_virada abortar o lote inteiro.
+    # Reservas duram no máximo 4 horas: só as que começam até 4 horas antes
+    # podem alcançar a ocorrência.
+    sql_insercao = """
+        WITH entrada (ordem, data_hora_inicio, data_hora_fim, espaco_id, solicitante_id,
+                      finalidade, num_participantes, status) AS (
+            VALUES %s
+        ),
+        inseridas AS (
+            INSERT INTO Reservas (espaco_id, solicitante_id, data_hora_inicio, data_hora_fim, finalidade, num_participantes, status)
+            SELECT espaco_id, solicitante_id, data_hora_inicio, data_hora_fim, finalidade, num_participantes, status
+            FROM entrada n
+            WHERE NOT EXISTS (
+                SELECT 1 FROM Reservas r
+                WHERE r.espaco_id = n.espaco_id
+                  AND r.status IN ('confirmada', 'pendente')
+                  AND r.data_hora_inicio > n.data_hora_inicio - interval '4 hours'
+                  AND r.data_hora_inicio < n.data_hora_fim
+                  AND r.data_hora_fim > n.data_hora_inicio
+            )
+            ORDER BY ordem
+            ON CONFLICT DO NOTHING
+            RETURNING reserva_id, espaco_id, data_hora_inicio, data_hora_fim, status
+        )
+        SELECT e.ordem, i.reserva_id, i.espaco_id, i.data_hora_inicio, i.data_hora_fim, i.status
+        FROM entrada e
+        LEFT JOIN inseridas i ON i.data_hora_inicio = e.data_hora_inicio AND i.data_hora_fim = e.data_hora_fim
+        ORDER BY e.ordem;
+    """
+    template = "(%s, %s::timestamptz, %s::timestamptz, %s::int, %s::int, %s::varchar, %s::int, %s::varchar)"
+
+    resultados = [
+        {'data_hora_inicio': o.get('data_hora_inicio'), 'data_hora_fim': o.get('data_hora_fim'), 'resultado': None}
+        for o in ocorrencias
+    ]
+    for resultado, ocorrencia in zip(resultados, ocorrencias):
+        if not _datas_validas(ocorrencia):
+            resultado['resultado'] = 'datas_invalidas'
+
+    with db_connection() as conn:
+        if conn is None:
+            return _recusa_reserva('sem_conexao')
+
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+            try:
+                cursor.execute(sql_contexto, (dados_reserva['espaco_id'], dados_reserva['solicitante_id']))
+                contexto = cursor.fetchone()
+
+                # --- VALIDAÇÕES QUE VALEM PARA O LOTE TODO ---
+                if contexto['espaco_id'] is None:
+                    return _recusa_reserva('espaco_nao_encontrado')
+                if contexto['usuario_id'] is None:
+                    return _recusa_reserva('solicitante_nao_encontrado')
+                if contexto['capacidade'] and dados_reserva['num_participantes'] > contexto['capacidade']:
+                    return _recusa_reserva('capacidade_excedida', num_participantes=dados_reserva['num_participantes'],
+                                           capacidade=contexto['capacidade'])
+                if contexto['espaco_tipo'] == 'laboratorio' and contexto['solicitante_tipo'] not in ['professor', 'gestor']:
+                    return _recusa_reserva('laboratorio_restrito')
+
+                # --- LIMITE DE RESERVAS ATIVAS PARA ALUNOS (contando o lote) ---
+                if contexto['solicitante_tipo'] == 'aluno':
+                    vagas = max(0, 2 - contexto['total_ativas'])
+                    for resultado in resultados:
+                        if resultado['resultado'] is None:
+                            if vagas > 0:
+                                vagas -= 1
+                            else:
+                                resultado['resultado'] = 'limite_reservas_ativas'
+
+                status_inicial = 'confirmada' if contexto['espaco_tipo'] == 'sala_de_aula' else 'pendente'
+                linhas = [
+                    (ordem, o['data_hora_inicio'], o['data_hora_fim'], dados_reserva['espaco_id'],
+                     dados_reserva['solicitante_id'], dados_reserva.get('finalidade'),
+                     dados_reserva['num_participantes'], status_inicial)
+                    for ordem, (o, resultado) in enumerate(zip(ocorrencias, resultados))
+                    if resultado['resultado'] is None
+                ]
+
+                criadas = []
+                if linhas and not (tudo_ou_nada and len(linhas) < len(ocorrencias)):
+                    inseridas = psycopg2.extras.execute_values(
+                        cursor, sql_insercao, linhas, template=template, page_size=len(linhas), fetch=True
+                    )
+                    ids_vistos = set()
+                    for linha in inseridas:
+                        resultado = resultados[linha['ordem']]
+                        # Ocorrências repetidas no pedido casam com a mesma linha inserida
+                        if linha['reserva_id'] is None or linha['reserva_id'] in ids_vistos:
+                            resultado['resultado'] = 'conflito_horario'
+                        else:
+                            ids_vistos.add(linha['reserva_id'])
+                            resultado['resultado'] = 'criada'
+                            resultado['reserva_id'] = linha['reserva_id']
+                            criadas.append(dict(linha))
+
+                if tudo_ou_nada and len(criadas) < len(ocorrencias):
+                    conn.rollback()
+                    criadas = []
+                    for resultado in resultados:
+                        if resultado['resultado'] in (None, 'criada'):
+                            resultado['resultado'] = 'nao_criada'
+                            resultado.pop('reserva_id', None)
+                else:
+                    conn.commit()
+
+            except psycopg2.errors.ExclusionViolation:
+                # Conflito com uma reserva de outro mês gravada por outro pedido
+                # depois do NOT EXISTS (trigger da tabela particionada)
+                conn.rollback()
+                return _recusa_reserva('conflito_horario')
+            except psycopg2.errors.CheckViolation as e:
+                # Outro pedido do mesmo aluno ocupou as vagas depois da leitura do contador
+                conn.rollback()
+                if e.diag.constraint_name == CONSTRAINT_LIMITE_ATIVAS:
+                    return _recusa_reserva('limite_reservas_ativas')
+                print(f"Erro ao criar reservas em lote: {e}")
+                return _recusa_reserva('erro_interno')
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao criar reservas em lote: {e}")
+                return _recusa_reserva('erro_interno')
+
+    def indexar_criadas():
+        for reserva in criadas:
+            indice_disponibilidade.adicionar(reserva)
+
+    if criadas:
+        ao_confirmar(indexar_criadas)
+
+    return {"criadas": len(criadas), "ocorrencias": resultados}
+
+# --- FUNÇÃO 19: Atualizar o status de várias reservas de uma vez ---
+# Maior número de reservas alteradas por chamada (por ids ou por filtro)
+MAX_RESERVAS_STATUS_LOTE = 500
+
+def update_reservas_status_lote(novo_status, aprovador_id, reserva_ids=None, filtros=None):
+    """
+    Aplica o mesmo status a várias reservas em um único UPDATE, escolhidas
+    por `reserva_ids` ou pelos `filtros` da listagem (ex: todas as pendentes
+    de um espaço; no máximo MAX_RESERVAS_STATUS_LOTE por chamada).
+
+    Reservas canceladas ou recusadas que voltam a ser confirmadas passam de
+    novo pelas regras da reserva, de uma vez para o conjunto: conflito de
+    horário com as reservas ativas e com as outras reativadas do lote (a de
+    menor reserva_id fica) e o limite de 2 reservas ativas dos alunos.
+    As recusadas ficam como estão; as demais são atualizadas.
+
+    Retorna {"atualizadas": n, "limite_atingido": bool, "resultados": [...]},
+    com um item {"reserva_id", "resultado", "reserva" (se atualizada)} por
+    reserva, ou {"erro": ..., "motivo": ...}. O resultado é 'atualizada',
+    'sem_mudanca', 'nao_encontrada', 'conflito_horario' ou 'limite_reservas_ativas'.
+    """
+    status_permitidos = ['confirmada', 'cancelada', 'recusada']
+    if novo_status not in status_permitidos:
+        return {"erro": "Status inválido.", "motivo": "status_invalido"}
+
+    if reserva_ids is not None:
+        where_clauses, params = ["r.reserva_id = ANY(%s)"], [list(reserva_ids)]
+    else:
+        try:
+            where_clauses, params = _filtros_reservas(filtros or {})
+        except ValueError as e:
+            return {"erro": str(e), "motivo": "filtro_invalido"}
+        if not where_clauses:
+            return {"erro": "Informe ao menos um filtro.", "motivo": "filtro_invalido"}
+
+    # - alvo: as reservas escolhidas, travadas até o fim da transação
+    # - avaliacao: quem volta a ficar ativa e se isso cria conflito de horário
+    #   (o GiST das constraints <partição>_sem_conflito responde o EXISTS)
+    # - decisao: o limite dos alunos, contando as reativações do próprio lote
+    # - atualizadas: um UPDATE só, com as linhas novas no RETURNING
+    sql = f"""
+        WITH alvo AS (
+            SELECT r.reserva_id, r.espaco_id, r.solicitante_id, r.status,
+                   tstzrange(r.data_hora_inicio, r.data_hora_fim, '[)') AS periodo,
+                   %s AND r.status NOT IN ('confirmada', 'pendente') AS reativa
+            FROM Reservas r
+            WHERE {" AND ".join(where_clauses)}
+            ORDER BY r.reserva_id
+            LIMIT %s
+            FOR UPDATE OF r
+        ),
+        avaliacao AS (
+            SELECT a.*,
+                CASE
+                    WHEN a.status = %s THEN 'sem_mudanca'
+                    WHEN a.reativa AND (
+                        EXISTS (
+                            SELECT 1 FROM Reservas o
+                            WHERE o.espaco_id = a.espaco_id AND o.reserva_id <> a.reserva_id
+                              AND o.status IN ('confirmada', 'pendente')
+                              AND o.data_hora_inicio > lower(a.periodo) - interval '4 hours'
+                              AND o.data_hora_inicio < upper(a.periodo)
+                              AND tstzrange(o.data_hora_inicio, o.data_hora_fim, '[)') && a.periodo
+                        )
+                        OR EXISTS (
+                            SELECT 1 FROM alvo b
+                            WHERE b.reativa AND b.espaco_id = a.espaco_id
+                              AND b.reserva_id < a.reserva_id AND b.periodo && a.periodo
+                        )
+                    ) THEN 'conflito_horario'
+                END AS motivo
+            FROM alvo a
+        ),
+        contagem AS (
+            SELECT v.*, u.tipo AS solicitante_tipo, u.reservas_ativas,
+                   count(*) FILTER (WHERE v.reativa AND v.motivo IS NULL)
+                       OVER (PARTITION BY v.solicitante_id ORDER BY v.reserva_id) AS reativacoes
+            FROM avaliacao v
+            JOIN Usuarios u ON u.usuario_id = v.solicitante_id
+        ),
+        decisao AS (
+            SELECT c.reserva_id,
+                CASE
+                    WHEN c.motivo IS NULL AND c.reativa AND c.solicitante_tipo = 'aluno'
+                         AND c.reservas_ativas + c.reativacoes > 2 THEN 'limite_reservas_ativas'
+                    ELSE c.motivo
+                END AS motivo
+            FROM contagem c
+        ),
+        atualizadas AS (
+            UPDATE Reservas r
+            SET status = %s, aprovador_id = %s
+            FROM decisao d
+            WHERE r.reserva_id = d.reserva_id AND d.motivo IS NULL
+            RETURNING r.*
+        )
+        SELECT d.reserva_id AS alvo_id, d.motivo, a.*, e.nome as espaco_nome, u.nome as solicitante_nome
+        FROM decisao d
+        LEFT JOIN atualizadas a ON a.reserva_id = d.reserva_id
+        LEFT JOIN Espacos e ON a.espaco_id = e.espaco_id
+        LEFT JOIN Usuarios u ON a.solicitante_id = u.usuario_id
+        ORDER BY d.reserva_id;
+    """
+    reativar = novo_status == 'confirmada'
+    params = [reativar] + params + [MAX_RESERVAS_STATUS_LOTE, novo_status, novo_status, aprovador_id]
+
+    with db_connection() as conn:
+        if conn is None:
+            return {"erro": "Falha na conexão com o banco de dados", "motivo": "sem_conexao"}
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            try:
+                executar(cursor, sql, tuple(params))
+                linhas = cursor.fetchall()
+                conn.commit()
+            except psycopg2.errors.ExclusionViolation:
+                # Outra reserva ocupou o horário entre a checagem e o UPDATE
+                conn.rollback()
+                return {"erro": MENSAGEM_CONFLITO_HORARIO, "motivo": "conflito_horario"}
+            except psycopg2.errors.CheckViolation as e:
+                conn.rollback()
+                if e.diag.constraint_name == CONSTRAINT_LIMITE_ATIVAS:
+                    return {"erro": MOTIVOS_RECUSA_RESERVA['limite_reservas_ativas'], "motivo": "limite_reservas_ativas"}
+                print(f"Erro ao atualizar status em lote: {e}")
+                return {"erro": "Ocorreu um erro interno ao atualizar as reservas.", "motivo": "erro_interno"}
+            except psycopg2.DataError as e:
+                conn.rollback()
+                return {"erro": f"Filtros inválidos: {e}", "motivo": "filtro_invalido"}
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao atualizar status em lote: {e}")
+                return {"erro": "Ocorreu um erro interno ao atualizar as reservas.", "motivo": "erro_interno"}
+
+    resultados = []
+    atualizadas = []
+    for linha in linhas:
+        reserva_id = linha.pop('alvo_id')
+        motivo = linha.pop('motivo')
+        if motivo:
+            resultados.append({"reserva_id": reserva_id, "resultado": motivo})
+        else:
+            atualizadas.append(linha)
+            resultados.append({"reserva_id": reserva_id, "resultado": 'atualizada', "reserva": linha})
+
+    if reserva_ids is not None:
+        encontradas = {resultado['reserva_id'] for resultado in resultados}
+        resultados += [
+            {"reserva_id": reserva_id, "resultado": 'nao_encontrada'}
+            for reserva_id in dict.fromkeys(reserva_ids) if reserva_id not in encontradas
+        ]
+
+    def atualizar_indice():
+        for reserva in atualizadas:
+            if reativar:
+                indice_disponibilidade.adicionar(reserva)
+            else:
+                indice_disponibilidade.remover(reserva['reserva_id'])
+
+    if atualizadas:
+        ao_confirmar(atualizar_indice)
+
+    return {
+        "atualizadas": len(atualizadas),
+        # Por filtro, pode haver mais reservas além das MAX_RESERVAS_STATUS_LOTE desta chamada
+        "limite_atingido": len(linhas) == MAX_RESERVAS_STATUS_LOTE,
+        "resultados": resultados,
+    }
+
 # --- FUNÇÕES DE DEPARTAMENTOS ---
 
+@cached('departamentos')
 def get_all_departamentos():
     """Busca todos os departamentos."""
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    cursor.execute("SELECT * FROM Departamentos ORDER BY nome ASC")
-    departamentos = [dict(row) for row in cursor.fetchall()]
-    cursor.close()
-    conn.close()
+    with db_connection() as conn:
+        if conn is None:
+            return []
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            cursor.execute("SELECT * FROM Departamentos ORDER BY nome ASC")
+            departamentos = cursor.fetchall()
+
     return departamentos
 
 def create_departamento(dados_depto):
-    """Cria um novo departamento."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("INSERT INTO Departamentos (nome) VALUES (%s) RETURNING departamento_id", (dados_depto['nome'],))
-        novo_id = cursor.fetchone()[0]
-        conn.commit()
-        return novo_id
-    except Exception as e:
-        conn.rollback()
-        print(f"Erro ao criar departamento: {e}")
-        return None
-    finally:
-        cursor.close()
-        conn.close()
+    """Cria um novo departamento e o retorna, ou None."""
+    with db_connection() as conn:
+        if conn is None:
+            return None
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            try:
+                cursor.execute("INSERT INTO Departamentos (nome) VALUES (%s) RETURNING *", (dados_depto['nome'],))
+                novo_depto = cursor.fetchone()
+                conn.commit()
+                ao_confirmar(lambda: catalogo_cache.invalidate('departamentos'))
+                return novo_depto
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao criar departamento: {e}")
+                return None
 
 def update_departamento(depto_id, dados_depto):
-    """Atualiza o nome de um departamento."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("UPDATE Departamentos SET nome = %s WHERE departamento_id = %s", (dados_depto['nome'], depto_id))
-        updated_rows = cursor.rowcount
-        conn.commit()
-        return updated_rows
-    except Exception as e:
-        conn.rollback()
-        print(f"Erro ao atualizar departamento: {e}")
-        return 0
-    finally:
-        cursor.close()
-        conn.close()
+    """Atualiza o nome de um departamento. Retorna o departamento atualizado, ou None se não existe."""
+    with db_connection() as conn:
+        if conn is None:
+            return None
+
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            try:
+                cursor.execute("UPDATE Departamentos SET nome = %s WHERE departamento_id = %s RETURNING *",
+                               (dados_depto['nome'], depto_id))
+                depto = cursor.fetchone()
+                conn.commit()
+                if depto:
+                    ao_confirmar(lambda: catalogo_cache.invalidate('departamentos'))
+                return depto
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao atualizar departamento: {e}")
+                return None
 
 def delete_departamento(depto_id):
     """Deleta um departamento."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("DELETE FROM Departamentos WHERE departamento_id = %s", (depto_id,))
-        deleted_rows = cursor.rowcount
-        conn.commit()
-        return deleted_rows
-    except Exception as e:
-        conn.rollback()
-        print(f"Erro ao deletar departamento: {e}")
-        return 0
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+    with db_connection() as conn:
+        if conn is None:
+            return 0
+
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute("DELETE FROM Departamentos WHERE departamento_id = %s", (depto_id,))
+                deleted_rows = cursor.rowcount
+                conn.commit()
+                if deleted_rows:
+                    ao_confirmar(lambda: catalogo_cache.invalidate('departamentos'))
+                return deleted_rows
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao deletar departamento: {e}")
+                return 0
@@ -0,0 +1,301 @@
+# backend/app/models_async.py
+
+import asyncio
+import os
+import time
+
+import asyncpg
+from .cache import catalogo_cache
+from .metricas import duracao_comandos, erros_comandos, linhas_comandos
+from .disponibilidade import parse_datetime
+from .models import (
+    SQL_RESERVAS_COM_NOMES, LIMITE_MAXIMO_PAGINA, encode_cursor_reservas, decode_cursor_reservas, _filtro_convertido,
+    TokenSincronizacaoExpiradoError, encode_token_sincronizacao, decode_token_sincronizacao,
+)
+
+# Versões assíncronas (asyncpg) das funções de leitura do models.py, usadas
+# pelas rotas ASGI de routes_async.py. Elas devolvem os mesmos dicionários que
+# as versões síncronas, para que as respostas JSON sejam idênticas.
+#
+# O asyncpg não converte texto automaticamente como o psycopg2: parâmetros que
+# chegam como texto da query string são convertidos pelo próprio PostgreSQL
+# com ($n::text)::tipo, mantendo o mesmo comportamento das consultas síncronas
+# (ex: datas sem fuso no fuso da sessão). Os filtros da listagem de reservas
+# são convertidos no Python, pelas mesmas funções do models.py.
+
+_pool = None
+_lock_pool = None
+
+
+async def _obter_pool():
+    """Retorna o pool do asyncpg, criando-o na primeira chamada. None se o banco estiver fora do ar."""
+    global _pool, _lock_pool
+    if _pool is not None:
+        return _pool
+
+    if _lock_pool is None:
+        _lock_pool = asyncio.Lock()
+    async with _lock_pool:
+        if _pool is None:
+            try:
+                _pool = await asyncpg.create_pool(
+                    host=os.getenv('DB_HOST'),
+                    database=os.getenv('DB_DATABASE'),
+                    user=os.getenv('DB_USER'),
+                    password=os.getenv('DB_PASSWORD'),
+                    port=int(os.getenv('DB_PORT') or 5432),
+                    min_size=int(os.getenv('ASYNC_DB_POOL_MIN', '1')),
+                    max_size=int(os.getenv('ASYNC_DB_POOL_MAX', '20')),
+                )
+            except (OSError, asyncpg.PostgresError) as e:
+                print(f"Erro ao conectar ao banco de dados (asyncpg): {e}")
+                return None
+    return _pool
+
+
+async def fechar_pool():
+    """Fecha o pool do asyncpg (chamado no desligamento da aplicação ASGI)."""
+    global _pool, _lock_pool
+    if _pool is not None:
+        await _pool.close()
+    _pool = None
+    _lock_pool = None
+
+
+async def _consultar(funcao, metodo, sql, *params):
+    """
+    Executa `sql` com pool.fetch/pool.fetchrow, registrando as mesmas métricas
+    dos cursores síncronos (rotuladas por `funcao`). Retorna None sem conexão.
+    """
+    pool = await _obter_pool()
+    if pool is None:
+        return None
+
+    inicio, ok = time.perf_counter(), False
+    try:
+        resultado = await getattr(pool, metodo)(sql, *params)
+        ok = True
+        return resultado
+    finally:
+        duracao_comandos.observar((funcao,), time.perf_counter() - inicio)
+        if not ok:
+            erros_comandos.incrementar((funcao,))
+        elif isinstance(resultado, list):
+            linhas_comandos.incrementar((funcao,), len(resultado))
+
+
+# --- FUNÇÃO 1: Listar todos os espaços ---
+async def get_all_espacos():
+    """Busca todos os espaços, usando o mesmo cache de catálogo da versão síncrona."""
+    encontrado, espacos = catalogo_cache.get(('espacos',))
+    if encontrado:
+        return espacos
+
+    geracao = catalogo_cache.geracao('espacos')
+    linhas = await _consultar('get_all_espacos', 'fetch', 'SELECT * FROM Espacos ORDER BY nome ASC')
+    espacos = [dict(linha) for linha in linhas or []]
+    if espacos:
+        catalogo_cache.set(('espacos',), espacos, geracao)
+    return espacos
+
+
+# --- FUNÇÃO 9: Listar reservas com filtros ---
+def _filtros_reservas(filtros, params):
+    """
+    Mesmos filtros de models._filtros_reservas, com os placeholders $n do asyncpg.
+    Os parâmetros são acrescentados em `params`. Lança ValueError se um id não
+    for número ou uma data não estiver em ISO 8601.
+    """
+    where_clauses = []
+
+    def parametro(valor):
+        params.append(valor)
+        return f'${len(params)}'
+
+    if filtros.get('espaco_id'):
+        where_clauses.append(f"r.espaco_id = {parametro(_filtro_convertido(filtros, 'espaco_id', int))}")
+
+    if filtros.get('solicitante_id'):
+        where_clauses.append(f"r.solicitante_id = {parametro(_filtro_convertido(filtros, 'solicitante_id', int))}")
+
+    if filtros.get('status'):
+        where_clauses.append(f"r.status = ANY({parametro(filtros['status'].split(','))}::text[])")
+
+    if filtros.get('inicio'):
+        inicio = parametro(_filtro_convertido(filtros, 'inicio', parse_datetime))
+        where_clauses.append(f"r.data_hora_fim > {inicio}::timestamptz")
+        # Mesma condição redundante do models.py, para limitar as partições lidas
+        where_clauses.append(f"r.data_hora_inicio > {inicio}::timestamptz - interval '4 hours'")
+
+    if filtros.get('fim'):
+        where_clauses.append(f"r.data_hora_inicio < {parametro(_filtro_convertido(filtros, 'fim', parse_datetime))}::timestamptz")
+
+    return where_clauses
+
+
+def _sql_reservas(where_clauses, ordem):
+    sql = SQL_RESERVAS_COM_NOMES
+    if where_clauses:
+        sql += " WHERE " + " AND ".join(where_clauses)
+    return sql + ordem
+
+
+async def get_all_reservas(filtros):
+    """Busca todas as reservas, aplicando filtros dinâmicos."""
+    params = []
+    sql = _sql_reservas(_filtros_reservas(filtros, params), " ORDER BY r.data_hora_inicio DESC;")
+    linhas = await _consultar('get_all_reservas', 'fetch', sql, *params)
+    return [dict(linha) for linha in linhas or []]
+
+
+async def get_reservas_pagina(filtros, limite, cursor=None):
+    """
+    Uma página de reservas por keyset, como models.get_reservas_pagina.
+    Retorna (reservas, proximo_cursor). Lança ValueError se o cursor ou os filtros forem inválidos.
+    """
+    limite = max(1, min(int(limite), LIMITE_MAXIMO_PAGINA))
+    params = []
+    where_clauses = _filtros_reservas(filtros, params)
+
+    if cursor:
+        data_hora_inicio, reserva_id = decode_cursor_reservas(cursor)
+        params.extend([data_hora_inicio, reserva_id])
+        where_clauses.append(f"(r.data_hora_inicio, r.reserva_id) < (${len(params) - 1}, ${len(params)})")
+
+    params.append(limite + 1)
+    sql = _sql_reservas(where_clauses, f" ORDER BY r.data_hora_inicio DESC, r.reserva_id DESC LIMIT ${len(params)};")
+
+    linhas = await _consultar('get_reservas_pagina', 'fetch', sql, *params)
+    reservas = [dict(linha) for linha in linhas or []]
+
+    proximo_cursor = None
+    if len(reservas) > limite:
+        reservas = reservas[:limite]
+        proximo_cursor = encode_cursor_reservas(reservas[-1])
+
+    return reservas, proximo_cursor
+
+
+def iter_reservas(filtros, tamanho_lote=1000):
+    """
+    Percorre as reservas filtradas com um cursor no servidor, `tamanho_lote`
+    linhas por vez. A conexão fica emprestada até o gerador terminar. Os
+    filtros são validados já na chamada (ValueError), antes do streaming.
+    """
+    params = []
+    sql = _sql_reservas(_filtros_reservas(filtros, params), " ORDER BY r.data_hora_inicio DESC, r.reserva_id DESC;")
+    return _percorrer_reservas(sql, params, tamanho_lote)
+
+
+async def _percorrer_reservas(sql, params, tamanho_lote):
+    pool = await _obter_pool()
+    if pool is None:
+        return
+
+    inicio, total = time.perf_counter(), 0
+    try:
+        async with pool.acquire() as conn:
+            # Cursores do asyncpg só existem dentro de uma transação
+            async with conn.transaction(readonly=True):
+                async for linha in conn.cursor(sql, *params, prefetch=tamanho_lote):
+                    total += 1
+                    yield dict(linha)
+    finally:
+        duracao_comandos.observar(('iter_reservas',), time.perf_counter() - inicio)
+        linhas_comandos.incrementar(('iter_reservas',), total)
+
+
+async def get_reservas_alteradas(filtros, token=None):
+    """
+    Sincronização incremental, como models.get_reservas_alteradas.
+    Retorna (reservas, removidas, novo_token). Lança ValueError se o token ou
+    os filtros forem inválidos e TokenSincronizacaoExpiradoError se o token expirou.
+    """
+    desde = decode_token_sincronizacao(token) if token else None
+    params = []
+    where_clauses = _filtros_reservas(filtros, params)
+
+    pool = await _obter_pool()
+    if pool is None:
+        return [], [], None
+
+    inicio = time.perf_counter()
+    async with pool.acquire() as conn:
+        # O novo token vem antes das consultas (ver models.get_reservas_alteradas)
+        marco = await conn.fetchrow("""
+            SELECT txid_snapshot_xmin(txid_current_snapshot()) AS txid,
+                   (SELECT txid_minimo FROM reservas_sincronizacao) AS txid_minimo;
+        """)
+        if desde is not None and desde < (marco['txid_minimo'] or 0):
+            raise TokenSincronizacaoExpiradoError()
+
+        clausulas = list(where_clauses)
+        params_alteradas = list(params)
+        if desde is not None:
+            params_alteradas.append(desde)
+            clausulas.append(f"r.txid_alteracao >= ${len(params_alteradas)}")
+        sql = _sql_reservas(clausulas, " ORDER BY r.data_hora_inicio DESC;")
+        reservas = [dict(linha) for linha in await conn.fetch(sql, *params_alteradas)]
+
+        removidas = []
+        if desde is not None:
+            params_removidas = params + [desde]
+            sql = f"SELECT reserva_id FROM reservas_removidas WHERE txid >= ${len(params_removidas)}"
+            if where_clauses:
+                sql += f"""
+                    UNION
+                    SELECT r.reserva_id FROM Reservas r
+                    WHERE r.txid_alteracao >= ${len(params_removidas)} AND NOT ({" AND ".join(where_clauses)})"""
+            removidas = [linha['reserva_id'] for linha in await conn.fetch(sql, *params_removidas)]
+
+    duracao_comandos.observar(('get_reservas_alteradas',), time.perf_counter() - inicio)
+    linhas_comandos.incrementar(('get_reservas_alteradas',), len(reservas) + len(removidas))
+    return reservas, removidas, encode_token_sincronizacao(marco['txid'])
+
+
+# --- FUNÇÃO 12: Buscar um usuário por ID ---
+async def get_usuario_by_id(usuario_id):
+    """Busca um único usuário pelo seu ID, sem incluir a senha."""
+    sql = """
+        SELECT u.usuario_id, u.nome, u.email, u.tipo, d.nome as departamento_nome
+        FROM Usuarios u
+        LEFT JOIN Departamentos d ON u.departamento_id = d.departamento_id
+        WHERE u.usuario_id = $1;
+    """
+    usuario = await _consultar('get_usuario_by_id', 'fetchrow', sql, usuario_id)
+    return dict(usuario) if usuario else None
+
+
+# --- FUNÇÃO 17: Buscar espaços disponíveis por data/hora ---
+async def get_available_espacos(filtros):
+    """Busca espaços que NÃO TÊM reservas conflitantes no período especificado."""
+    data_inicio = filtros.get('inicio')
+    data_fim = filtros.get('fim')
+    if not data_inicio or not data_fim:
+        return []
+
+    sql = """
+        SELECT * FROM Espacos e
+        WHERE NOT EXISTS (
+            SELECT 1 FROM Reservas r
+            WHERE r.espaco_id = e.espaco_id
+            AND r.status IN ('confirmada', 'pendente')
+            AND tstzrange(r.data_hora_inicio, r.data_hora_fim, '[)')
+                && tstzrange(($1::text)::timestamptz, ($2::text)::timestamptz, '[)')
+            AND r.data_hora_inicio > ($1::text)::timestamptz - interval '4 hours'
+            AND r.data_hora_inicio < ($2::text)::timestamptz
+        )
+    """
+    # Mesmo limite de get_available_espacos do models.py: o intervalo em
+    # data_hora_inicio (reservas duram no máximo 4 horas) restringe a busca
+    # às partições do período em vez de consultar todos os meses.
+    params = [data_inicio, data_fim]
+
+    if filtros.get('tipo'):
+        params.append(filtros['tipo'])
+        sql += " AND e.tipo = $3"
+
+    sql += " ORDER BY e.nome;"
+
+    linhas = await _consultar('get_available_espacos', 'fetch', sql, *params)
+    return [dict(linha) for linha in linhas or []]
@@ -0,0 +1,249 @@
+# backend/app/notificacoes.py
+
+import json
+import os
+import queue
+import select
+import threading
+from datetime import datetime
+
+from .db import get_db_connection
+from .disponibilidade import STATUS_ATIVOS, indice_disponibilidade, parse_datetime
+from .metricas import registro
+
+# Mudanças em Reservas avisadas pelo banco (scripts/add_reservas_notificacoes.sql).
+# Cada processo da API mantém uma conexão com LISTEN neste canal e repassa os
+# avisos para as assinaturas abertas (GET /api/reservas/stream) e para o
+# índice de disponibilidade, que assim enxerga as escritas dos outros processos.
+CANAL = 'reservas_alteracoes'
+
+# Desliga o LISTEN (ex: banco sem a trigger de aviso)
+NOTIFICACOES_ATIVAS = os.getenv('NOTIFICACOES_RESERVAS', '1') != '0'
+
+# Colunas de data que chegam como texto ISO no JSON do aviso
+COLUNAS_DATA = ('data_hora_inicio', 'data_hora_fim', 'data_solicitacao', 'data_aprovacao', 'updated_at')
+
+# Avisada às assinaturas quando avisos podem ter se perdido (conexão caiu ou fila cheia)
+REINICIO = object()
+
+
+class Assinatura:
+    """Fila de avisos de um cliente. Se ele não der conta de ler, a fila enche e a assinatura é encerrada."""
+
+    def __init__(self, tamanho_fila):
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+
+    def entregar(self, aviso):
+        try:
+            self.fila.put_nowait(aviso)
+            return True
+        except queue.Full:
+            return False
+
+    def proximo(self, timeout):
+        """O próximo aviso, REINICIO, ou None se nada chegou em `timeout` segundos."""
+        try:
+            return self.fila.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class OuvinteReservas:
+    """
+    Thread que escuta o canal de avisos de Reservas em uma conexão própria
+    (fora do pool, já que o LISTEN vale só para a sessão que o executou).
+    Se a conexão cair, reconecta, recarrega o índice de disponibilidade e
+    avisa REINICIO às assinaturas, que precisam buscar a lista de novo.
+    """
+
+    def __init__(self, tamanho_fila=1000, intervalo_reconexao=5.0):
+        self.tamanho_fila = tamanho_fila
+        self.intervalo_reconexao = intervalo_reconexao
+        self._lock = threading.Lock()
+        self._assinaturas = set()
+        self._thread = None
+        self._pid = None
+        self._parar = threading.Event()
+        self.conectado = False
+        self.avisos = 0
+        self.reinicios = 0
+        self.reconexoes = 0
+        self.recusadas = 0
+
+    def _rodando(self):
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self):
+        """Inicia a thread neste processo, se ainda não estiver rodando (seguro chamar a cada requisição)."""
+        if not NOTIFICACOES_ATIVAS or self._rodando():
+            return
+        with self._lock:
+            if self._rodando():
+                return
+            if self._pid != os.getpid():
+                # Assinaturas herdadas do processo pai (fork) não têm cliente aqui
+                self._assinaturas = set()
+            self._pid = os.getpid()
+            self._parar = threading.Event()
+            self._thread = threading.Thread(target=self._executar, name='ouvinte-reservas', daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+    def assinar(self, limite=None):
+        """Nova assinatura, ou None se o processo já tiver `limite` assinaturas abertas."""
+        assinatura = Assinatura(self.tamanho_fila)
+        with self._lock:
+            if limite is not None and len(self._assinaturas) >= limite:
+                self.recusadas += 1
+                return None
+            self._assinaturas.add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    def total_assinaturas(self):
+        with self._lock:
+            return len(self._assinaturas)
+
+    def _publicar(self, aviso):
+        with self._lock:
+            assinaturas = list(self._assinaturas)
+        for assinatura in assinaturas:
+            if not assinatura.entregar(aviso):
+                # Cliente lento: para de receber e, ao ler REINICIO, busca tudo de novo
+                self.cancelar(assinatura)
+                assinatura.fila = queue.Queue()
+                assinatura.fila.put(REINICIO)
+
+    def _executar(self):
+        primeira = True
+        while not self._parar.is_set():
+            conn = get_db_connection()
+            if conn is None:
+                self._parar.wait(self.intervalo_reconexao)
+                continue
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CANAL};')
+                self.conectado = True
+
+                # Escritas feitas antes do LISTEN não chegaram aqui
+                indice_disponibilidade.invalidar()
+                if not primeira:
+                    self.reconexoes += 1
+                    self._publicar(REINICIO)
+                primeira = False
+
+                while not self._parar.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._processar(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"Erro no ouvinte de reservas: {e}")
+            finally:
+                self.conectado = False
+                conn.close()
+            self._parar.wait(self.intervalo_reconexao)
+
+    def _processar(self, payload):
+        try:
+            conteudo = json.loads(payload)
+            if conteudo.get('op') == 'reset':
+                avisos = None
+            else:
+                avisos = conteudo['avisos']
+                for aviso in avisos:
+                    for linha in (aviso['reserva'], aviso.get('anterior') or {}):
+                        for coluna in COLUNAS_DATA:
+                            if linha.get(coluna):
+                                linha[coluna] = datetime.fromisoformat(linha[coluna])
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Aviso de reserva inválido: {e}")
+            return
+
+        if avisos is None:
+            # Comando grande demais para avisar linha a linha: recarrega tudo
+            self.reinicios += 1
+            indice_disponibilidade.invalidar()
+            self._publicar(REINICIO)
+            return
+
+        for aviso in avisos:
+            self.avisos += 1
+            reserva = aviso['reserva']
+            if aviso['op'] == 'delete' or reserva['status'] not in STATUS_ATIVOS:
+                indice_disponibilidade.remover(reserva['reserva_id'])
+            else:
+                if aviso['op'] == 'update':
+                    # Pode ter mudado de horário ou de espaço: tira a posição antiga
+                    indice_disponibilidade.remover(reserva['reserva_id'])
+                indice_disponibilidade.adicionar(reserva)
+
+            self._publicar(aviso)
+
+
+ouvinte_reservas = OuvinteReservas(tamanho_fila=int(os.getenv('SSE_TAMANHO_FILA', '1000')))
+
+
+@registro.coletor
+def _coletar_metricas_ouvinte():
+    yield 'reservas_stream_assinaturas', 'gauge', 'Clientes conectados em /api/reservas/stream.', ouvinte_reservas.total_assinaturas()
+    yield 'reservas_stream_recusadas_total', 'counter', 'Conexões em /api/reservas/stream recusadas por limite de assinaturas.', ouvinte_reservas.recusadas
+    yield 'reservas_avisos_total', 'counter', 'Avisos de mudança em Reservas recebidos do banco.', ouvinte_reservas.avisos
+    yield 'reservas_avisos_reinicios_total', 'counter', 'Avisos de "reset" (comando que alterou reservas demais) recebidos do banco.', ouvinte_reservas.reinicios
+    yield 'reservas_avisos_reconexoes_total', 'counter', 'Reconexões do LISTEN de Reservas.', ouvinte_reservas.reconexoes
+
+
+# --- FILTROS DAS ASSINATURAS ---
+
+def filtro_reservas(filtros):
+    """
+    Monta uma função reserva -> bool com os mesmos filtros de get_all_reservas
+    (espaco_id, solicitante_id, status separado por vírgula, inicio, fim).
+    Lança ValueError se algum filtro for inválido.
+    """
+    espaco_id = int(filtros['espaco_id']) if filtros.get('espaco_id') else None
+    solicitante_id = int(filtros['solicitante_id']) if filtros.get('solicitante_id') else None
+    status = set(filtros['status'].split(',')) if filtros.get('status') else None
+    inicio = parse_datetime(filtros['inicio']) if filtros.get('inicio') else None
+    fim = parse_datetime(filtros['fim']) if filtros.get('fim') else None
+
+    def corresponde(reserva):
+        return (
+            (espaco_id is None or reserva['espaco_id'] == espaco_id)
+            and (solicitante_id is None or reserva['solicitante_id'] == solicitante_id)
+            and (status is None or reserva['status'] in status)
+            and (inicio is None or reserva['data_hora_fim'] > inicio)
+            and (fim is None or reserva['data_hora_inicio'] < fim)
+        )
+
+    return corresponde
+
+
+def evento_para_cliente(aviso, corresponde):
+    """
+    Traduz um aviso do banco para o que muda na lista filtrada do cliente:
+    ('insert', reserva) se a reserva entrou nela, ('update', reserva) se
+    continua nela com outros dados, ('delete', {'reserva_id': ...}) se saiu,
+    ou None se o aviso não afeta a lista.
+    """
+    reserva = aviso['reserva']
+    if aviso['op'] == 'delete':
+        antes, depois = corresponde(reserva), False
+    elif aviso['op'] == 'update':
+        antes, depois = corresponde(aviso['anterior']), corresponde(reserva)
+    else:
+        antes, depois = False, corresponde(reserva)
+
+    if depois:
+        return ('update' if antes else 'insert'), reserva
+    if antes:
+        return 'delete', {'reserva_id': reserva['reserva_id']}
+    return None
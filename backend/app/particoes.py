@@ -0,0 +1,83 @@
+# backend/app/particoes.py
+
+import os
+import re
+from datetime import date, datetime, timezone
+
+from .db import db_connection
+
+# Manutenção das partições mensais de Reservas (scripts/particionar_reservas.sql).
+# Meses futuros ficam criados com antecedência, para que reservas novas não
+# caiam na partição padrão, e meses antigos são desanexados da tabela.
+
+# Meses à frente do atual que devem existir
+MESES_FUTUROS = int(os.getenv('PARTICOES_MESES_FUTUROS', '12'))
+
+# Meses anteriores ao atual que continuam na tabela (0 mantém todos)
+MESES_HISTORICO = int(os.getenv('PARTICOES_MESES_HISTORICO', '24'))
+
+# Chave do pg_try_advisory_xact_lock que impede duas manutenções ao mesmo tempo
+_CHAVE_LOCK_PARTICOES = 720023
+
+_NOME_PARTICAO = re.compile(r'^reservas_(\d{4})_(\d{2})$')
+
+_SQL_PARTICOES = """
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'reservas'::regclass
+    ORDER BY c.relname;
+"""
+
+
+def _somar_meses(mes, meses):
+    """Primeiro dia do mês `meses` meses depois (ou antes, se negativo) de `mes`."""
+    indice = mes.year * 12 + mes.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def manter_particoes(meses_futuros=MESES_FUTUROS, meses_historico=MESES_HISTORICO):
+    """
+    Cria as partições do mês atual e dos `meses_futuros` seguintes (movendo
+    para elas o que estiver na partição padrão) e desanexa as partições de
+    meses anteriores aos últimos `meses_historico` (0 não desanexa nada).
+    Os meses são em UTC, como os limites das partições.
+    Tudo em uma transação. Retorna {"criadas": [...], "desanexadas": [...]} ou {"erro": ...}.
+    """
+    mes_atual = datetime.now(timezone.utc).date().replace(day=1)
+    criadas = []
+    desanexadas = []
+
+    with db_connection() as conn:
+        if conn is None:
+            return {"erro": "Falha na conexão com o banco de dados"}
+
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute("SELECT pg_try_advisory_xact_lock(%s);", (_CHAVE_LOCK_PARTICOES,))
+                if not cursor.fetchone()[0]:
+                    conn.rollback()
+                    return {"erro": "Outra manutenção das partições está em andamento."}
+
+                for meses in range(meses_futuros + 1):
+                    cursor.execute("SELECT reservas_criar_particao(%s);", (_somar_meses(mes_atual, meses),))
+                    particao = cursor.fetchone()[0]
+                    if particao:
+                        criadas.append(particao)
+
+                if meses_historico > 0:
+                    limite = _somar_meses(mes_atual, -meses_historico)
+                    cursor.execute(_SQL_PARTICOES)
+                    for (particao,) in cursor.fetchall():
+                        encontrado = _NOME_PARTICAO.match(particao)
+                        if encontrado and date(int(encontrado[1]), int(encontrado[2]), 1) < limite:
+                            cursor.execute("SELECT reservas_desanexar_particao(%s);", (particao,))
+                            desanexadas.append(particao)
+
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao manter as partições de reservas: {e}")
+                return {"erro": "Erro interno ao manter as partições (a migração particionar_reservas.sql foi aplicada?)."}
+
+    return {"criadas": criadas, "desanexadas": desanexadas}
@@ -0,0 +1,125 @@
+# backend/app/preparadas.py
+
+import hashlib
+import os
+import re
+import threading
+import weakref
+
+import psycopg2.errors
+import psycopg2.extensions
+
+# Desliga os prepared statements (ex: atrás de um PgBouncer em modo transaction)
+PREPARAR_ATIVO = os.getenv('DB_PREPARAR', '1') != '0'
+
+# Limite de comandos preparados por conexão. Os filtros de get_all_reservas
+# geram uma variação da SQL por combinação, mas o número é pequeno e fixo.
+MAX_PREPARADAS_POR_CONEXAO = 128
+
+_PLACEHOLDER = re.compile(r'%\((\w+)\)s|%s|%%')
+
+
+class ConsultaPreparada:
+    """
+    Uma SQL no formato do psycopg2 (%s ou %(nome)s) convertida para PREPARE,
+    com parâmetros $1, $2... O nome do comando vem de um hash da SQL, então a
+    mesma consulta tem o mesmo nome em todas as conexões.
+    """
+
+    def __init__(self, sql):
+        self.nome = 'prep_' + hashlib.sha1(sql.encode()).hexdigest()[:16]
+        self.nomes_parametros = []
+        posicionais = 0
+
+        def trocar(encontrado):
+            nonlocal posicionais
+            texto = encontrado.group(0)
+            if texto == '%%':
+                return '%'
+            if texto == '%s':
+                posicionais += 1
+                return f'${posicionais}'
+            nome = encontrado.group(1)
+            if nome not in self.nomes_parametros:
+                self.nomes_parametros.append(nome)
+            return f'${self.nomes_parametros.index(nome) + 1}'
+
+        corpo = _PLACEHOLDER.sub(trocar, sql).strip().rstrip(';')
+        total = len(self.nomes_parametros) or posicionais
+
+        self.sql_prepare = f'PREPARE {self.nome} AS {corpo}'
+        self.sql_execute = f'EXECUTE {self.nome}'
+        if total:
+            self.sql_execute += ' (' + ', '.join(['%s'] * total) + ')'
+
+    def argumentos(self, params):
+        if self.nomes_parametros:
+            return tuple(params[nome] for nome in self.nomes_parametros)
+        return tuple(params or ())
+
+
+_consultas = {}                                  # SQL original -> ConsultaPreparada
+_preparadas = weakref.WeakKeyDictionary()        # conexão -> nomes já preparados nela
+_lock = threading.Lock()
+
+
+def _consulta(sql):
+    consulta = _consultas.get(sql)
+    if consulta is None:
+        consulta = _consultas.setdefault(sql, ConsultaPreparada(sql))
+    return consulta
+
+
+def _nomes_preparados(conn):
+    with _lock:
+        nomes = _preparadas.get(conn)
+        if nomes is None:
+            nomes = _preparadas[conn] = set()
+        return nomes
+
+
+def executar(cursor, sql, params=None):
+    """
+    Executa `sql` como um prepared statement da conexão do cursor: na primeira
+    vez faz o PREPARE, e daí em diante só o EXECUTE (sem reenviar nem
+    replanejar a SQL). Conexões novas, inclusive as que substituem uma
+    conexão perdida, começam sem nada preparado.
+
+    Se o servidor não conhece mais o comando (ex: DISCARD ALL) ou o formato
+    do resultado mudou (ex: ALTER TABLE em uma tabela do SELECT *), prepara
+    de novo e repete, desde que não houvesse transação aberta antes da
+    chamada. Dentro de uma transação o erro é propagado, porque repetir
+    exigiria desfazer o que já foi feito nela.
+    """
+    if not PREPARAR_ATIVO:
+        return cursor.execute(sql, params)
+
+    conn = cursor.connection
+    consulta = _consulta(sql)
+    nomes = _nomes_preparados(conn)
+    sem_transacao = conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    if consulta.nome not in nomes:
+        if len(nomes) >= MAX_PREPARADAS_POR_CONEXAO:
+            return cursor.execute(sql, params)
+        try:
+            cursor.execute(consulta.sql_prepare)
+        except psycopg2.errors.DuplicatePreparedStatement:
+            # Já estava preparado (o registro local se perdeu): só seguir
+            if not sem_transacao:
+                raise
+            conn.rollback()
+        nomes.add(consulta.nome)
+
+    try:
+        return cursor.execute(consulta.sql_execute, consulta.argumentos(params))
+    except (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.FeatureNotSupported) as e:
+        if not sem_transacao:
+            nomes.discard(consulta.nome)
+            raise
+        conn.rollback()
+        if isinstance(e, psycopg2.errors.FeatureNotSupported):
+            # "cached plan must not change result type": descarta e prepara de novo
+            cursor.execute(f'DEALLOCATE {consulta.nome}')
+        cursor.execute(consulta.sql_prepare)
+        return cursor.execute(consulta.sql_execute, consulta.argumentos(params))
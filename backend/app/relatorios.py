@@ -0,0 +1,226 @@
+# backend/app/relatorios.py
+
+import os
+from datetime import date, timedelta
+
+from .db import CursorDicionario, db_connection
+
+# Relatórios de uso semanal, servidos da tabela relatorio_uso_semanal
+# (scripts/add_relatorios.sql) e não da tabela Reservas. O recálculo é feito
+# por atualizar_relatorios, só nas semanas/espaços registrados em relatorio_alteracoes.
+
+# Horas em que um espaço pode ser reservado por semana; base do % de ocupação
+HORAS_UTEIS_SEMANA = float(os.getenv('RELATORIO_HORAS_SEMANA', '84'))
+
+# Semanas/espaços recalculados por transação
+LOTE_ATUALIZACAO = 500
+
+# Chave do pg_try_advisory_xact_lock que impede dois recálculos ao mesmo tempo
+_CHAVE_LOCK_ATUALIZACAO = 720017
+
+AGRUPAMENTOS = ('espaco', 'tipo', 'departamento')
+
+# --- ATUALIZAÇÃO DOS AGREGADOS ---
+# Semanas/espaços registrados, com os ids das linhas do registro de cada um
+_SQL_PENDENTES = """
+    SELECT semana, espaco_id, array_agg(alteracao_id) FROM relatorio_alteracoes
+    GROUP BY semana, espaco_id
+    ORDER BY semana, espaco_id
+    LIMIT %s;
+"""
+
+_SQL_APAGAR_AGREGADOS = """
+    DELETE FROM relatorio_uso_semanal a
+    USING unnest(%(semanas)s::date[], %(espacos)s::int[]) AS p(semana, espaco_id)
+    WHERE a.semana = p.semana AND a.espaco_id = p.espaco_id;
+"""
+
+# Lê de Reservas só as semanas pedidas, pelo índice (espaco_id, data_hora_inicio)
+_SQL_RECALCULAR = """
+    INSERT INTO relatorio_uso_semanal (
+        semana, espaco_id, departamento_id, total_reservas, confirmadas, pendentes, canceladas, recusadas,
+        horas_confirmadas, horas_pendentes, decisoes, segundos_ate_decisao
+    )
+    SELECT p.semana, p.espaco_id, u.departamento_id,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE r.status = 'confirmada'),
+           COUNT(*) FILTER (WHERE r.status = 'pendente'),
+           COUNT(*) FILTER (WHERE r.status = 'cancelada'),
+           COUNT(*) FILTER (WHERE r.status = 'recusada'),
+           COALESCE(SUM(EXTRACT(EPOCH FROM r.data_hora_fim - r.data_hora_inicio)) FILTER (WHERE r.status = 'confirmada'), 0) / 3600,
+           COALESCE(SUM(EXTRACT(EPOCH FROM r.data_hora_fim - r.data_hora_inicio)) FILTER (WHERE r.status = 'pendente'), 0) / 3600,
+           COUNT(r.data_aprovacao),
+           COALESCE(SUM(EXTRACT(EPOCH FROM r.data_aprovacao - r.data_solicitacao)), 0)
+    FROM unnest(%(semanas)s::date[], %(espacos)s::int[]) AS p(semana, espaco_id)
+    JOIN Reservas r ON r.espaco_id = p.espaco_id
+     AND r.data_hora_inicio >= relatorio_inicio_semana(p.semana)
+     AND r.data_hora_inicio < relatorio_inicio_semana(p.semana + 7)
+    LEFT JOIN Usuarios u ON u.usuario_id = r.solicitante_id
+    GROUP BY p.semana, p.espaco_id, u.departamento_id;
+"""
+
+# Apaga só as linhas lidas: as registradas durante o recálculo ficam para a próxima vez
+_SQL_CONCLUIR = """
+    DELETE FROM relatorio_alteracoes WHERE alteracao_id = ANY(%(alteracoes)s::bigint[]);
+"""
+
+# Marca tudo: as semanas com reservas e as que já estão nos agregados (que podem ter ficado vazias)
+_SQL_MARCAR_TUDO = """
+    INSERT INTO relatorio_alteracoes (semana, espaco_id)
+    SELECT relatorio_semana(data_hora_inicio), espaco_id FROM Reservas
+    UNION
+    SELECT semana, espaco_id FROM relatorio_uso_semanal;
+"""
+
+
+def atualizar_relatorios(tudo=False):
+    """
+    Recalcula os agregados das semanas/espaços pendentes, em lotes de
+    LOTE_ATUALIZACAO, cada um na sua transação. Com `tudo`, marca antes todas
+    as semanas (ex: depois de mudar o departamento de vários usuários).
+    Retorna {"semanas_recalculadas": n} ou {"erro": ...}.
+    """
+    total = 0
+    with db_connection() as conn:
+        if conn is None:
+            return {"erro": "Falha na conexão com o banco de dados"}
+
+        with conn.cursor() as cursor:
+            try:
+                if tudo:
+                    cursor.execute(_SQL_MARCAR_TUDO)
+                    conn.commit()
+
+                while True:
+                    cursor.execute("SELECT pg_try_advisory_xact_lock(%s);", (_CHAVE_LOCK_ATUALIZACAO,))
+                    if not cursor.fetchone()[0]:
+                        conn.rollback()
+                        return {"erro": "Outra atualização dos relatórios está em andamento."}
+
+                    cursor.execute(_SQL_PENDENTES, (LOTE_ATUALIZACAO,))
+                    pendentes = cursor.fetchall()
+                    if not pendentes:
+                        conn.commit()
+                        break
+
+                    params = {
+                        'semanas': [p[0] for p in pendentes],
+                        'espacos': [p[1] for p in pendentes],
+                        'alteracoes': [alteracao for p in pendentes for alteracao in p[2]],
+                    }
+                    cursor.execute(_SQL_APAGAR_AGREGADOS, params)
+                    cursor.execute(_SQL_RECALCULAR, params)
+                    cursor.execute(_SQL_CONCLUIR, params)
+                    conn.commit()
+                    total += len(pendentes)
+
+                    if len(pendentes) < LOTE_ATUALIZACAO:
+                        break
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao atualizar relatórios: {e}")
+                return {"erro": "Erro interno ao atualizar os relatórios."}
+
+    return {"semanas_recalculadas": total}
+
+
+# --- CONSULTA DOS RELATÓRIOS ---
+# Para cada agrupamento: colunas do grupo, JOINs e quantos espaços entram no
+# denominador da ocupação. Departamento não tem espaços próprios: a ocupação
+# dele é a parte das horas de todos os espaços que o departamento usou.
+_GRUPOS = {
+    'espaco': {
+        'colunas': "a.espaco_id, e.nome AS espaco_nome, e.tipo AS espaco_tipo",
+        'join': "JOIN Espacos e ON e.espaco_id = a.espaco_id",
+        'agrupar': "a.espaco_id, e.nome, e.tipo",
+        'espacos': "1",
+    },
+    'tipo': {
+        'colunas': "e.tipo AS espaco_tipo",
+        'join': "JOIN Espacos e ON e.espaco_id = a.espaco_id",
+        'agrupar': "e.tipo",
+        'espacos': "(SELECT COUNT(*) FROM Espacos WHERE tipo = e.tipo)",
+    },
+    'departamento': {
+        'colunas': "a.departamento_id, d.nome AS departamento_nome",
+        'join': "JOIN Espacos e ON e.espaco_id = a.espaco_id "
+                "LEFT JOIN Departamentos d ON d.departamento_id = a.departamento_id",
+        'agrupar': "a.departamento_id, d.nome",
+        'espacos': "(SELECT COUNT(*) FROM Espacos)",
+    },
+}
+
+
+def _semana_de(valor):
+    """Segunda-feira da semana de uma data 'AAAA-MM-DD'. Lança ValueError se for inválida."""
+    dia = date.fromisoformat(valor)
+    return dia - timedelta(days=dia.weekday())
+
+
+def get_relatorio_uso(agrupamento, filtros):
+    """
+    Uso semanal por espaço, tipo de espaço ou departamento do solicitante:
+    horas reservadas, % de ocupação, latência média de aprovação e taxa de
+    cancelamento. Filtros: inicio/fim (datas, semanas inteiras), espaco_id, tipo.
+    Lança ValueError se o agrupamento ou um filtro for inválido.
+    """
+    if agrupamento not in AGRUPAMENTOS:
+        raise ValueError(f"Agrupamento inválido: {agrupamento}")
+    grupo = _GRUPOS[agrupamento]
+
+    where_clauses = []
+    params = {'horas_semana': HORAS_UTEIS_SEMANA}
+    if filtros.get('inicio'):
+        where_clauses.append("a.semana >= %(inicio)s")
+        params['inicio'] = _semana_de(filtros['inicio'])
+    if filtros.get('fim'):
+        where_clauses.append("a.semana <= %(fim)s")
+        params['fim'] = _semana_de(filtros['fim'])
+    if filtros.get('espaco_id'):
+        where_clauses.append("a.espaco_id = %(espaco_id)s")
+        params['espaco_id'] = int(filtros['espaco_id'])
+    if filtros.get('tipo'):
+        where_clauses.append("e.tipo = %(tipo)s")
+        params['tipo'] = filtros['tipo']
+
+    sql = f"""
+        SELECT a.semana, {grupo['colunas']},
+               SUM(a.total_reservas)::int AS total_reservas,
+               SUM(a.confirmadas)::int AS confirmadas,
+               SUM(a.pendentes)::int AS pendentes,
+               SUM(a.canceladas)::int AS canceladas,
+               SUM(a.recusadas)::int AS recusadas,
+               ROUND(SUM(a.horas_confirmadas), 2)::float AS horas_reservadas,
+               ROUND(SUM(a.horas_pendentes), 2)::float AS horas_pendentes,
+               ROUND(100 * SUM(a.horas_confirmadas) / NULLIF({grupo['espacos']} * %(horas_semana)s::numeric, 0), 2)::float
+                   AS ocupacao_percentual,
+               ROUND(SUM(a.segundos_ate_decisao) / NULLIF(SUM(a.decisoes), 0) / 3600, 2)::float
+                   AS latencia_aprovacao_horas,
+               ROUND(100.0 * SUM(a.canceladas) / NULLIF(SUM(a.total_reservas), 0), 2)::float
+                   AS taxa_cancelamento_percentual
+        FROM relatorio_uso_semanal a
+        {grupo['join']}
+    """
+    if where_clauses:
+        sql += " WHERE " + " AND ".join(where_clauses)
+    sql += f" GROUP BY a.semana, {grupo['agrupar']} ORDER BY a.semana, {grupo['agrupar']};"
+
+    with db_connection() as conn:
+        if conn is None:
+            return []
+        with conn.cursor(cursor_factory=CursorDicionario) as cursor:
+            cursor.execute(sql, params)
+            relatorio = cursor.fetchall()
+    for item in relatorio:
+        item['semana'] = item['semana'].isoformat()
+    return relatorio
+
+
+def get_semanas_pendentes():
+    """Quantas semanas/espaços esperam recálculo (0 = relatórios em dia). None sem conexão."""
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM (SELECT DISTINCT semana, espaco_id FROM relatorio_alteracoes) p;")
+            return cursor.fetchone()[0]
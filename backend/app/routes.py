@@ -1,24 +1,81 @@
 # backend/app/routes.py
 
+import hmac
+import os
+import time
+
 import jwt
-from .auth import token_required, role_required
+from .admissao import controle_admissao
+from .auth import token_required, role_required, verificar_token, gerar_ticket_stream, verificar_ticket_stream, VALIDADE_TICKET_STREAM
+from .busca import (
+    ENTIDADES_BUSCA, LIMITE_BUSCA_PADRAO, MAX_LIMITE_BUSCA, MIN_CARACTERES_BUSCA, MAX_CARACTERES_BUSCA,
+    buscar, entidades_visiveis
+)
+from .cache import catalogo_cache
+from .disponibilidade import indice_disponibilidade, parse_datetime
+from .metricas import registro as registro_metricas
+from .notificacoes import NOTIFICACOES_ATIVAS, REINICIO, ouvinte_reservas, filtro_reservas, evento_para_cliente
+from .serializacao import para_colunas
+from .relatorios import AGRUPAMENTOS, get_relatorio_uso, get_semanas_pendentes
+from .transferencia import IMPORTACOES, EXPORTACOES, importar, exportar_stream
 from datetime import datetime, timedelta
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request, current_app, stream_with_context
 from .models import (
     get_all_espacos, get_espaco_by_id, create_espaco, update_espaco, delete_espaco,
-    create_reserva, get_reserva_by_id, update_reserva_status, get_all_reservas, delete_reserva,
+    create_reserva, update_reserva_status, get_all_reservas, get_reservas_pagina, iter_reservas, delete_reserva,
+    get_reservas_alteradas, TokenSincronizacaoExpiradoError,
     get_all_usuarios, get_usuario_by_id, create_usuario, update_usuario, delete_usuario, authenticate_usuario,
-    get_all_departamentos, create_departamento, update_departamento, delete_departamento, get_available_espacos
+    get_all_departamentos, create_departamento, update_departamento, delete_departamento, get_available_espacos,
+    create_reservas_lote, gerar_ocorrencias_semanais, MAX_OCORRENCIAS_LOTE,
+    update_reservas_status_lote, MAX_RESERVAS_STATUS_LOTE
 )
 
 api_bp = Blueprint('api_bp', __name__, url_prefix='/api')
 
+# Código HTTP para cada motivo de recusa de create_reserva (os demais viram 403)
+STATUS_RECUSA_RESERVA = {
+    'capacidade_excedida': 409,
+    'conflito_horario': 409,
+    'sem_conexao': 503,
+    'erro_interno': 500,
+}
+
+def _lista(itens):
+    """Lista de uma rota de listagem, no formato colunar se o cliente pedir ?formato=colunar."""
+    if request.args.get('formato') == 'colunar':
+        return para_colunas(itens)
+    return itens
+
+def _usuario_do_token(current_user, *args, **kwargs):
+    """Chave do balde por usuário das rotas autenticadas."""
+    return current_user['sub']
+
+def _email_do_login():
+    """Chave do balde por usuário do login: o e-mail tentado, mesmo que não exista."""
+    dados = request.get_json(silent=True)
+    if isinstance(dados, dict) and isinstance(dados.get('email'), str):
+        return dados['email'].strip().lower()
+    return None
+
+def _resposta_catalogo(dados, namespace):
+    """
+    Resposta JSON para os dados de catálogo, com ETag e Last-Modified.
+    Se o cliente mandar If-None-Match/If-Modified-Since e nada mudou,
+    devolve 304 sem corpo.
+    """
+    resposta = jsonify(dados)
+    resposta.last_modified = catalogo_cache.last_modified(namespace)
+    resposta.add_etag()
+    # Permite guardar a resposta, mas exige revalidação antes de cada uso
+    resposta.cache_control.no_cache = True
+    return resposta.make_conditional(request)
+
 # --- ROTA 1: Listar todos os espaços ---
 @api_bp.route('/espacos', methods=['GET'])
 def listar_espacos_route():
     """Endpoint para listar todos os espaços."""
     espacos = get_all_espacos()
-    return jsonify(espacos)
+    return _resposta_catalogo(_lista(espacos), 'espacos')
 
 # --- ROTA 2: Buscar um espaço por ID ---
 @api_bp.route('/espacos/<int:espaco_id>', methods=['GET'])
@@ -27,7 +84,7 @@ def buscar_espaco_route(espaco_id):
     espaco = get_espaco_by_id(espaco_id)
     if espaco is None:
         return jsonify({"erro": "Espaço não encontrado"}), 404
-    return jsonify(espaco)
+    return _resposta_catalogo(espaco, 'espacos')
 
 # --- ROTA 3: Criar um novo espaço ---
 @api_bp.route('/espacos', methods=['POST'])
@@ -40,12 +97,11 @@ def criar_espaco_route(current_user):
     if not dados or 'nome' not in dados or 'tipo' not in dados or 'gestor_responsavel_id' not in dados:
         return jsonify({"erro": "Dados incompletos para criar o espaço"}), 400
 
-    novo_espaco_id = create_espaco(dados)
+    novo_espaco = create_espaco(dados)
 
-    if novo_espaco_id is None:
+    if novo_espaco is None:
         return jsonify({"erro": "Falha ao criar o espaço"}), 500
 
-    novo_espaco = get_espaco_by_id(novo_espaco_id)
     return jsonify(novo_espaco), 201
 
 # --- ROTA 4: Atualizar um espaço existente (PUT) ---
@@ -58,12 +114,11 @@ def atualizar_espaco_route(current_user, espaco_id):
     if not dados:
         return jsonify({"erro": "Dados ausentes"}), 400
 
-    updated_rows = update_espaco(espaco_id, dados)
+    espaco_atualizado = update_espaco(espaco_id, dados)
 
-    if updated_rows == 0:
+    if espaco_atualizado is None:
         return jsonify({"erro": "Espaço não encontrado"}), 404
 
-    espaco_atualizado = get_espaco_by_id(espaco_id)
     return jsonify(espaco_atualizado)
 
 # --- ROTA 5: Deletar um espaço (DELETE) ---
@@ -82,6 +137,7 @@ def deletar_espaco_route(current_user, espaco_id):
 # --- ROTA 6: Criar uma nova reserva (POST) ---
 @api_bp.route('/reservas', methods=['POST'])
 @token_required
+@controle_admissao('reservas_escrita', usuario=_usuario_do_token)
 def criar_reserva_route(current_user): # A função já recebe o usuário do token
     """Endpoint para solicitar uma nova reserva."""
     dados = request.get_json()
@@ -94,14 +150,78 @@ def criar_reserva_route(current_user): # A função já recebe o usuário do tok
     # Adicionamos o ID do solicitante a partir do token, de forma segura.
     dados['solicitante_id'] = int(current_user['sub'])
 
+    # Em caso de sucesso, create_reserva já devolve a reserva completa (com os JOINs)
     resultado = create_reserva(dados)
 
     if "erro" in resultado:
-        status_code = 409 if "conflito" in resultado["erro"].lower() or "excede" in resultado["erro"].lower() else 403
+        status_code = STATUS_RECUSA_RESERVA.get(resultado.get("motivo"), 403)
+        return jsonify(resultado), status_code
+
+    return jsonify(resultado), 201
+
+# --- ROTA 18: Criar reservas em lote / recorrentes (POST) ---
+@api_bp.route('/reservas/lote', methods=['POST'])
+@token_required
+@controle_admissao('reservas_escrita', usuario=_usuario_do_token)
+def criar_reservas_lote_route(current_user):
+    """
+    Endpoint para solicitar várias ocorrências da mesma reserva de uma vez.
+    Corpo: espaco_id, num_participantes, finalidade (opcional) e
+    - "ocorrencias": [{"data_hora_inicio": "...", "data_hora_fim": "..."}, ...], ou
+    - "recorrencia": {"frequencia": "semanal", "data_hora_inicio": "...",
+                      "data_hora_fim": "...", "ate": "2025-12-15"}
+    "modo": "tudo_ou_nada" (padrão) ou "melhor_esforco".
+    """
+    dados = request.get_json(silent=True)
+
+    if not dados or 'espaco_id' not in dados or 'num_participantes' not in dados:
+        return jsonify({"erro": "Dados incompletos para criar as reservas"}), 400
+
+    modo = dados.get('modo', 'tudo_ou_nada')
+    if modo not in ('tudo_ou_nada', 'melhor_esforco'):
+        return jsonify({"erro": "Valor de 'modo' inválido. Use 'tudo_ou_nada' ou 'melhor_esforco'."}), 400
+
+    if 'recorrencia' in dados:
+        recorrencia = dados['recorrencia'] or {}
+        if recorrencia.get('frequencia', 'semanal') != 'semanal':
+            return jsonify({"erro": "Apenas a frequência 'semanal' é suportada"}), 400
+        try:
+            ocorrencias = gerar_ocorrencias_semanais(
+                recorrencia['data_hora_inicio'], recorrencia['data_hora_fim'], recorrencia['ate']
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"erro": f"Recorrência inválida: {e}"}), 400
+    else:
+        ocorrencias = dados.get('ocorrencias')
+        if not isinstance(ocorrencias, list) or not all(isinstance(o, dict) for o in ocorrencias):
+            return jsonify({"erro": "Informe 'ocorrencias' ou 'recorrencia'"}), 400
+        if len(ocorrencias) > MAX_OCORRENCIAS_LOTE:
+            return jsonify({"erro": f"Máximo de {MAX_OCORRENCIAS_LOTE} ocorrências por lote"}), 400
+
+    if not ocorrencias:
+        return jsonify({"erro": "Nenhuma ocorrência para criar"}), 400
+
+    # O solicitante sempre vem do token, como na criação individual
+    dados['solicitante_id'] = int(current_user['sub'])
+
+    resultado = create_reservas_lote(dados, ocorrencias, tudo_ou_nada=(modo == 'tudo_ou_nada'))
+
+    if "erro" in resultado:
+        status_code = STATUS_RECUSA_RESERVA.get(resultado.get("motivo"), 403)
         return jsonify(resultado), status_code
 
-    nova_reserva = get_reserva_by_id(resultado['id'])
-    return jsonify(nova_reserva), 201
+    resultado['modo'] = modo
+    return jsonify(resultado), 201 if resultado['criadas'] else 409
+
+# Código HTTP para cada motivo de erro de update_reserva_status e update_reservas_status_lote
+STATUS_ERRO_STATUS_LOTE = {
+    'status_invalido': 400,
+    'filtro_invalido': 400,
+    'conflito_horario': 409,
+    'limite_reservas_ativas': 409,
+    'sem_conexao': 503,
+    'erro_interno': 500,
+}
 
 # --- ROTA 7: Atualizar o status de uma reserva (PUT) ---
 @api_bp.route('/reservas/<int:reserva_id>/status', methods=['PUT'])
@@ -124,15 +244,60 @@ def atualizar_status_reserva_route(current_user, reserva_id):
     novo_status = dados['status']
 
     # Passamos o aprovador_id seguro para a função do modelo.
-    updated_rows = update_reserva_status(reserva_id, novo_status, aprovador_id)
+    # A reserva atualizada já volta do UPDATE, pronta para a resposta
+    reserva_atualizada = update_reserva_status(reserva_id, novo_status, aprovador_id)
 
-    if updated_rows == 0:
+    if reserva_atualizada is None:
         return jsonify({"erro": "Reserva não encontrada ou status inválido"}), 404
+    if "erro" in reserva_atualizada:
+        return jsonify(reserva_atualizada), STATUS_ERRO_STATUS_LOTE.get(reserva_atualizada.get("motivo"), 500)
 
-    # Busca a reserva atualizada para retornar na resposta
-    reserva_atualizada = get_reserva_by_id(reserva_id)
     return jsonify(reserva_atualizada)
 
+# --- ROTA 24: Aprovar/recusar várias reservas de uma vez (PUT) ---
+
+@api_bp.route('/reservas/status', methods=['PUT'])
+@token_required
+@role_required('gestor')
+def atualizar_status_reservas_lote_route(current_user):
+    """
+    Endpoint para um gestor aplicar o mesmo status a várias reservas.
+    Corpo: "status" e
+    - "reserva_ids": [1, 2, ...], ou
+    - "filtros": {"espaco_id": 3, "status": "pendente", "inicio": "...", "fim": "..."}
+    Responde com o resultado de cada reserva. Por filtro, no máximo
+    MAX_RESERVAS_STATUS_LOTE por chamada ("limite_atingido": true pede outra).
+    """
+    dados = request.get_json(silent=True)
+    if not dados or 'status' not in dados:
+        return jsonify({"erro": "O novo 'status' é obrigatório"}), 400
+
+    reserva_ids = dados.get('reserva_ids')
+    filtros = dados.get('filtros')
+    if (reserva_ids is None) == (filtros is None):
+        return jsonify({"erro": "Informe 'reserva_ids' ou 'filtros'"}), 400
+
+    if reserva_ids is not None:
+        if (not isinstance(reserva_ids, list) or not reserva_ids
+                or not all(isinstance(i, int) and not isinstance(i, bool) for i in reserva_ids)):
+            return jsonify({"erro": "'reserva_ids' deve ser uma lista de ids"}), 400
+        if len(reserva_ids) > MAX_RESERVAS_STATUS_LOTE:
+            return jsonify({"erro": f"Máximo de {MAX_RESERVAS_STATUS_LOTE} reservas por chamada"}), 400
+    elif (not isinstance(filtros, dict) or set(filtros) - {'espaco_id', 'solicitante_id', 'status', 'inicio', 'fim'}
+            or not isinstance(filtros.get('status', ''), str)):
+        return jsonify({"erro": "Filtros aceitos: espaco_id, solicitante_id, status, inicio, fim"}), 400
+
+    # O aprovador é sempre o gestor logado, como na rota individual
+    resultado = update_reservas_status_lote(
+        dados['status'], int(current_user['sub']), reserva_ids=reserva_ids, filtros=filtros
+    )
+
+    if "erro" in resultado:
+        return jsonify(resultado), STATUS_ERRO_STATUS_LOTE.get(resultado.get("motivo"), 500)
+
+    resultado['status'] = dados['status']
+    return jsonify(resultado)
+
 # --- ROTA 8: Listar todas as reservas com filtros (GET) ---
 @api_bp.route('/reservas', methods=['GET'])
 @token_required
@@ -140,10 +305,158 @@ def listar_reservas_route(current_user):
     """
     Endpoint para listar reservas, aceitando filtros como query parameters.
     Ex: /api/reservas?solicitante_id=5&status=confirmada
+    Filtros de data: ?inicio=2025-09-01T00:00:00&fim=2025-10-01T00:00:00
+
+    Sem 'limite' nem 'stream', devolve a lista completa (comportamento original).
+    - Paginação: ?limite=50 devolve {"reservas": [...], "proximo_cursor": "..."};
+      a próxima página é pedida com ?limite=50&cursor=<proximo_cursor>.
+    - Streaming: ?stream=ndjson (uma reserva JSON por linha) ou ?stream=json
+      (array JSON enviado em pedaços), lidos do banco por um cursor no servidor.
+    - Formato: ?formato=colunar devolve {"colunas": [...], "linhas": [[...], ...]}
+      no lugar da lista (também nas respostas paginadas e de sincronização).
+    - Sincronização: ?since= (vazio) devolve {"reservas": [...], "removidas": [],
+      "sync_token": "..."}; com ?since=<sync_token> vêm só as reservas alteradas
+      e os ids das removidas desde então. 410 se o token expirou.
+    """
+    filtros = request.args.to_dict()
+
+    if 'since' in filtros:
+        try:
+            reservas, removidas, sync_token = get_reservas_alteradas(filtros, filtros['since'])
+        except ValueError:
+            return jsonify({"erro": "Token de sincronização ou filtros inválidos"}), 400
+        except TokenSincronizacaoExpiradoError:
+            return jsonify({"erro": "Token de sincronização expirado. Busque a lista completa com ?since="}), 410
+        return jsonify({"reservas": _lista(reservas), "removidas": removidas, "sync_token": sync_token})
+
+    modo_stream = filtros.get('stream')
+    if modo_stream:
+        if modo_stream not in ('ndjson', 'json'):
+            return jsonify({"erro": "Valor de 'stream' inválido. Use 'ndjson' ou 'json'."}), 400
+        try:
+            reservas = iter_reservas(filtros)
+        except ValueError:
+            return jsonify({"erro": "Filtros inválidos"}), 400
+        return _stream_reservas(reservas, modo_stream)
+
+    if 'limite' in filtros:
+        try:
+            reservas, proximo_cursor = get_reservas_pagina(filtros, int(filtros['limite']), filtros.get('cursor'))
+        except ValueError:
+            return jsonify({"erro": "Parâmetros de paginação ou filtros inválidos"}), 400
+        return jsonify({"reservas": _lista(reservas), "proximo_cursor": proximo_cursor})
+
+    try:
+        reservas = get_all_reservas(filtros)
+    except ValueError:
+        return jsonify({"erro": "Filtros inválidos"}), 400
+    return jsonify(_lista(reservas))
+
+def _stream_reservas(reservas, modo):
+    """Monta a resposta em streaming de listar_reservas_route a partir do iter_reservas já validado."""
+    dumps = current_app.json.dumps
+
+    def gerar_ndjson():
+        for reserva in reservas:
+            yield dumps(reserva) + "\n"
+
+    def gerar_array():
+        separador = "["
+        for reserva in reservas:
+            yield separador + dumps(reserva)
+            separador = ","
+        yield "[]" if separador == "[" else "]"
+
+    if modo == 'ndjson':
+        return Response(stream_with_context(gerar_ndjson()), mimetype='application/x-ndjson')
+    return Response(stream_with_context(gerar_array()), mimetype='application/json')
+
+# --- ROTA 23: MUDANÇAS DAS RESERVAS EM TEMPO REAL (SSE) ---
+# Tempo máximo de uma conexão; depois o EventSource do navegador reconecta sozinho
+DURACAO_MAXIMA_SSE = float(os.getenv('SSE_DURACAO_MAXIMA', '300'))
+INTERVALO_PING_SSE = 15.0
+# Cada conexão ocupa uma thread do worker (gthread) durante toda a sua duração.
+# Acima deste número de conexões por processo o stream responde 503, para que
+# as outras rotas continuem tendo threads livres. Padrão: metade das threads.
+MAX_ASSINATURAS_SSE = int(os.getenv('SSE_MAX_ASSINATURAS', str(max(1, int(os.getenv('GUNICORN_THREADS', '4')) // 2))))
+
+@api_bp.route('/reservas/stream', methods=['GET'])
+def stream_reservas_route():
     """
+    Server-Sent Events com as mudanças nas reservas, para o cliente atualizar
+    a lista que já tem em vez de buscá-la inteira de novo. Aceita os mesmos
+    filtros de GET /api/reservas. Como o EventSource do navegador não manda
+    cabeçalhos, a autenticação também pode vir em ?ticket= (ver ROTA 26).
+
+    Eventos: 'insert' e 'update' (a reserva, no formato da listagem),
+    'delete' ({"reserva_id": ...}, também quando a reserva deixa de
+    atender aos filtros) e 'reset' (avisos se perderam: busque a lista de novo).
+    """
+    token = request.headers.get('x-access-token')
+    ticket = request.args.get('ticket')
+    if not token and not ticket:
+        return jsonify({'erro': 'Token de autenticação está faltando!'}), 401
+    if token and verificar_token(token) is None:
+        return jsonify({'erro': 'Token é inválido ou expirou!'}), 401
+    if not token and verificar_ticket_stream(ticket) is None:
+        return jsonify({'erro': 'Ticket é inválido ou expirou!'}), 401
+
+    if not NOTIFICACOES_ATIVAS:
+        return jsonify({"erro": "Avisos de mudanças desativados neste servidor"}), 503
+
     filtros = request.args.to_dict()
-    reservas = get_all_reservas(filtros)
-    return jsonify(reservas)
+    filtros.pop('ticket', None)
+    try:
+        corresponde = filtro_reservas(filtros)
+    except ValueError:
+        return jsonify({"erro": "Filtros inválidos"}), 400
+
+    ouvinte_reservas.iniciar()
+    assinatura = ouvinte_reservas.assinar(limite=MAX_ASSINATURAS_SSE)
+    if assinatura is None:
+        resposta = jsonify({"erro": "Muitas conexões abertas em /api/reservas/stream. Tente novamente em instantes."})
+        resposta.headers['Retry-After'] = '30'
+        return resposta, 503
+    dumps = current_app.json.dumps
+
+    def gerar():
+        try:
+            yield "retry: 3000\n\n"
+            limite = time.monotonic() + DURACAO_MAXIMA_SSE
+            while (restante := limite - time.monotonic()) > 0:
+                aviso = assinatura.proximo(min(INTERVALO_PING_SSE, restante))
+                if aviso is None:
+                    # Comentário SSE: mantém a conexão viva em proxies e detecta clientes que saíram
+                    yield ": ping\n\n"
+                    continue
+                if aviso is REINICIO:
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                evento = evento_para_cliente(aviso, corresponde)
+                if evento:
+                    tipo, dados = evento
+                    yield f"event: {tipo}\ndata: {dumps(dados, separators=(',', ':'))}\n\n"
+        finally:
+            ouvinte_reservas.cancelar(assinatura)
+
+    resposta = Response(stream_with_context(gerar()), mimetype='text/event-stream')
+    resposta.headers['Cache-Control'] = 'no-cache'
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    return resposta
+
+# --- ROTA 26: TICKET PARA O STREAM DE RESERVAS ---
+@api_bp.route('/reservas/stream/ticket', methods=['POST'])
+@token_required
+def ticket_stream_reservas_route(current_user):
+    """
+    Troca o token de login por um ticket que vale VALIDADE_TICKET_STREAM
+    segundos e só serve para abrir GET /api/reservas/stream?ticket=..., para
+    que o token de login não vá na URL (nem nos logs de acesso).
+    """
+    return jsonify({
+        "ticket": gerar_ticket_stream(current_user),
+        "expira_em": VALIDADE_TICKET_STREAM,
+    })
 
 # --- ROTA 9: Deletar/Cancelar uma reserva (DELETE) ---
 @api_bp.route('/reservas/<int:reserva_id>', methods=['DELETE'])
@@ -168,7 +481,7 @@ def deletar_reserva_route(current_user, reserva_id):
 def listar_usuarios_route(current_user):
     """Endpoint para listar todos os usuários."""
     usuarios = get_all_usuarios()
-    return jsonify(usuarios)
+    return jsonify(_lista(usuarios))
 
 # --- ROTA 11: Buscar um usuário por ID (GET) ---
 @api_bp.route('/usuarios/<int:usuario_id>', methods=['GET'])
@@ -193,12 +506,11 @@ def criar_usuario_route(current_user):
     if not all(field in dados for field in required_fields):
         return jsonify({"erro": "Dados incompletos"}), 400
 
-    novo_usuario_id = create_usuario(dados)
+    novo_usuario = create_usuario(dados)
 
-    if novo_usuario_id is None:
+    if novo_usuario is None:
         return jsonify({"erro": "Falha ao criar o usuário (verifique se o e-mail já existe)"}), 500
 
-    novo_usuario = get_usuario_by_id(novo_usuario_id)
     return jsonify(novo_usuario), 201
 
 # --- ROTA 13: Atualizar um usuário (PUT) ---
@@ -211,12 +523,11 @@ def atualizar_usuario_route(current_user, usuario_id):
     if not dados:
         return jsonify({"erro": "Dados ausentes"}), 400
 
-    updated_rows = update_usuario(usuario_id, dados)
+    usuario_atualizado = update_usuario(usuario_id, dados)
 
-    if updated_rows == 0:
+    if usuario_atualizado is None:
         return jsonify({"erro": "Usuário não encontrado"}), 404
 
-    usuario_atualizado = get_usuario_by_id(usuario_id)
     return jsonify(usuario_atualizado)
 
 # --- ROTA 14: Deletar um usuário (DELETE) ---
@@ -234,6 +545,7 @@ def deletar_usuario_route(current_user, usuario_id):
 
 # --- ROTA 15: Login de usuário (POST) ---
 @api_bp.route('/login', methods=['POST'])
+@controle_admissao('login', usuario=_email_do_login, so_falhas=True)
 def login_route():
     """
     Endpoint de login. Recebe email e senha, retorna um token JWT se forem válidos.
@@ -276,7 +588,199 @@ def buscar_espacos_disponiveis_route():
     """
     filtros = request.args.to_dict()
     espacos = get_available_espacos(filtros)
-    return jsonify(espacos)
+    return jsonify(_lista(espacos))
+
+# --- ROTA 17: DISPONIBILIDADE EM VÁRIAS JANELAS ---
+# Limite de janelas por requisição, para uma única chamada não monopolizar o processo
+MAX_JANELAS_DISPONIBILIDADE = 200
+
+@api_bp.route('/espacos/disponibilidade', methods=['POST'])
+def consultar_disponibilidade_route():
+    """
+    Endpoint público que responde a disponibilidade de várias janelas de uma vez,
+    usando o índice em memória das reservas ativas.
+    Corpo: {"janelas": [{"inicio": "...", "fim": "..."}, ...],
+            "tipo": "laboratorio", "capacidade_minima": 20}   (tipo e capacidade são opcionais)
+    """
+    dados = request.get_json(silent=True)
+    if not dados or not isinstance(dados.get('janelas'), list) or not dados['janelas']:
+        return jsonify({"erro": "Informe ao menos uma janela em 'janelas'"}), 400
+
+    if len(dados['janelas']) > MAX_JANELAS_DISPONIBILIDADE:
+        return jsonify({"erro": f"Máximo de {MAX_JANELAS_DISPONIBILIDADE} janelas por consulta"}), 400
+
+    try:
+        janelas = [(parse_datetime(j['inicio']), parse_datetime(j['fim'])) for j in dados['janelas']]
+        capacidade_minima = int(dados['capacidade_minima']) if dados.get('capacidade_minima') else None
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"erro": "Janelas inválidas: use datas ISO 8601 em 'inicio' e 'fim'"}), 400
+
+    if any(fim <= inicio for inicio, fim in janelas):
+        return jsonify({"erro": "Em cada janela, 'fim' deve ser posterior a 'inicio'"}), 400
+
+    # Os filtros de tipo e capacidade são aplicados sobre o catálogo (em cache)
+    espacos = [
+        e for e in get_all_espacos()
+        if (not dados.get('tipo') or e['tipo'] == dados['tipo'])
+        and (capacidade_minima is None or (e['capacidade'] or 0) >= capacidade_minima)
+    ]
+
+    livres = indice_disponibilidade.espacos_livres([e['espaco_id'] for e in espacos], janelas)
+    if livres is None:
+        return jsonify({"erro": "Falha na conexão com o banco de dados"}), 503
+
+    return jsonify({
+        "espacos": espacos,
+        "janelas": [
+            {"inicio": j['inicio'], "fim": j['fim'], "espacos_disponiveis": ids}
+            for j, ids in zip(dados['janelas'], livres)
+        ]
+    })
+
+# --- ROTA 19: IMPORTAÇÃO EM MASSA (COPY) ---
+@api_bp.route('/importacao/<entidade>', methods=['POST'])
+@token_required
+@role_required('gestor')
+def importar_route(current_user, entidade):
+    """
+    Endpoint para um gestor importar usuários, espaços ou reservas em massa.
+    O arquivo pode vir no corpo da requisição (text/csv ou application/x-ndjson)
+    ou como upload multipart no campo 'arquivo'. CSV precisa de cabeçalho.
+    Ex: /api/importacao/usuarios?formato=csv&simular=1
+    """
+    if entidade not in IMPORTACOES:
+        return jsonify({"erro": "Entidade inválida"}), 404
+
+    if 'arquivo' in request.files:
+        arquivo = request.files['arquivo']
+        fluxo = arquivo.stream
+        nome = arquivo.filename or ''
+    else:
+        fluxo = request.stream
+        nome = ''
+
+    formato = request.args.get('formato')
+    if formato is None:
+        ndjson = request.mimetype == 'application/x-ndjson' or nome.endswith(('.ndjson', '.jsonl'))
+        formato = 'ndjson' if ndjson else 'csv'
+
+    simular = request.args.get('simular') in ('1', 'true', 'sim')
+    relatorio = importar(entidade, fluxo, formato=formato, simular=simular)
+
+    if "erro" in relatorio:
+        return jsonify(relatorio), 400
+    return jsonify(relatorio)
+
+# --- ROTA 20: EXPORTAÇÃO EM MASSA (COPY) ---
+@api_bp.route('/exportacao/<entidade>', methods=['GET'])
+@token_required
+@role_required('gestor')
+def exportar_route(current_user, entidade):
+    """
+    Endpoint para um gestor baixar usuários, espaços ou reservas em CSV.
+    O CSV sai do COPY TO STDOUT direto para a resposta, em pedaços.
+    Reservas aceitam os mesmos filtros da listagem (espaco_id, status, inicio, fim...).
+    """
+    if entidade not in EXPORTACOES:
+        return jsonify({"erro": "Entidade inválida"}), 404
+
+    resposta = Response(exportar_stream(entidade, request.args.to_dict()), mimetype='text/csv')
+    resposta.headers['Content-Disposition'] = f'attachment; filename={entidade}.csv'
+    return resposta
+
+# --- ROTA 21: MÉTRICAS (formato Prometheus) ---
+@api_bp.route('/metrics', methods=['GET'])
+def metricas_route():
+    """
+    Exporta as métricas do processo (tempos das rotas e dos comandos SQL,
+    pool de conexões e cache) no formato texto do Prometheus.
+    Se METRICAS_TOKEN estiver definido, exige 'Authorization: Bearer <token>'.
+    """
+    token = os.getenv('METRICAS_TOKEN')
+    if token:
+        enviado = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(enviado.encode(), token.encode()):
+            return jsonify({"erro": "Não autorizado"}), 401
+
+    return Response(registro_metricas.exportar(), mimetype='text/plain; version=0.0.4')
+
+# --- ROTA 22: RELATÓRIOS DE USO SEMANAL ---
+@api_bp.route('/relatorios/uso', methods=['GET'])
+@token_required
+@role_required('gestor')
+def relatorio_uso_route(current_user):
+    """
+    Endpoint para um gestor ver o uso semanal dos espaços: horas reservadas,
+    % de ocupação, latência média de aprovação e taxa de cancelamento.
+    Lê só os agregados (flask atualizar-relatorios), nunca a tabela de reservas.
+    Ex: /api/relatorios/uso?agrupar=tipo&inicio=2025-08-01&fim=2025-08-31
+    """
+    agrupamento = request.args.get('agrupar', 'espaco')
+    if agrupamento not in AGRUPAMENTOS:
+        return jsonify({"erro": f"Valor de 'agrupar' inválido. Use {', '.join(AGRUPAMENTOS)}."}), 400
+
+    try:
+        relatorio = get_relatorio_uso(agrupamento, request.args.to_dict())
+    except ValueError:
+        return jsonify({"erro": "Filtros inválidos. Datas no formato AAAA-MM-DD."}), 400
+
+    return jsonify({
+        "agrupamento": agrupamento,
+        # Semanas/espaços alterados que ainda não entraram nos números
+        "semanas_pendentes": get_semanas_pendentes(),
+        "relatorio": relatorio,
+    })
+
+# --- ROTA 25: BUSCA POR TEXTO ---
+@api_bp.route('/busca', methods=['GET'])
+def busca_route():
+    """
+    Endpoint de busca por nome/finalidade, para as telas não baixarem as
+    listas inteiras. O login é opcional: sem token a busca cobre só o
+    catálogo (espaços e departamentos); com token inclui as reservas (as
+    próprias, para quem não é gestor) e, para o gestor, os usuários.
+    Ex: /api/busca?q=lab&tipos=espacos,reservas&limite=5
+    """
+    current_user = None
+    token = request.headers.get('x-access-token')
+    if token:
+        current_user = verificar_token(token)
+        if current_user is None:
+            return jsonify({'erro': 'Token é inválido ou expirou!'}), 401
+
+    termo = ' '.join(request.args.get('q', '').split())
+    if not MIN_CARACTERES_BUSCA <= len(termo) <= MAX_CARACTERES_BUSCA:
+        return jsonify({"erro": f"O parâmetro 'q' deve ter entre {MIN_CARACTERES_BUSCA} e {MAX_CARACTERES_BUSCA} caracteres."}), 400
+
+    visiveis = entidades_visiveis(current_user)
+    if request.args.get('tipos'):
+        entidades = [t.strip() for t in request.args['tipos'].split(',') if t.strip()]
+        invalidas = [t for t in entidades if t not in ENTIDADES_BUSCA]
+        if invalidas or not entidades:
+            return jsonify({"erro": f"Valor de 'tipos' inválido. Use {', '.join(ENTIDADES_BUSCA)}."}), 400
+        proibidas = [t for t in entidades if t not in visiveis]
+        if proibidas:
+            return jsonify({"erro": f"Sem permissão para buscar: {', '.join(proibidas)}."}), 401 if current_user is None else 403
+        entidades = list(dict.fromkeys(entidades))
+    else:
+        entidades = list(visiveis)
+
+    try:
+        limite = int(request.args.get('limite', LIMITE_BUSCA_PADRAO))
+    except ValueError:
+        limite = 0
+    if not 1 <= limite <= MAX_LIMITE_BUSCA:
+        return jsonify({"erro": f"O parâmetro 'limite' deve ser um número entre 1 e {MAX_LIMITE_BUSCA}."}), 400
+
+    resultados = buscar(termo, entidades, current_user, limite)
+    if 'erro' in resultados:
+        return jsonify(resultados), 500
+
+    return jsonify({
+        "termo": termo,
+        "limite": limite,
+        "resultados": {entidade: _lista(itens) for entidade, itens in resultados.items()},
+    })
 
 # --- ROTA Adicional: Buscar dados do usuário logado ---
 @api_bp.route('/me', methods=['GET'])
@@ -302,7 +806,7 @@ def get_current_user_data(current_user):
 def listar_departamentos_route():
     """Endpoint público para listar todos os departamentos."""
     departamentos = get_all_departamentos()
-    return jsonify(departamentos)
+    return _resposta_catalogo(_lista(departamentos), 'departamentos')
 
 @api_bp.route('/departamentos', methods=['POST'])
 @token_required
@@ -313,12 +817,11 @@ def criar_departamento_route(_):
     if not dados or 'nome' not in dados:
         return jsonify({"erro": "O nome do departamento é obrigatório"}), 400
 
-    novo_id = create_departamento(dados)
-    if novo_id is None:
+    novo_depto = create_departamento(dados)
+    if novo_depto is None:
         return jsonify({"erro": "Falha ao criar departamento, verifique se o nome já existe."}), 409
 
     # Retorna o novo objeto criado
-    novo_depto = {'departamento_id': novo_id, 'nome': dados['nome']}
     return jsonify(novo_depto), 201
 
 @api_bp.route('/departamentos/<int:depto_id>', methods=['PUT'])
@@ -330,11 +833,10 @@ def atualizar_departamento_route(_, depto_id):
     if not dados or 'nome' not in dados:
         return jsonify({"erro": "O nome do departamento é obrigatório"}), 400
 
-    updated_rows = update_departamento(depto_id, dados)
-    if updated_rows == 0:
+    depto_atualizado = update_departamento(depto_id, dados)
+    if depto_atualizado is None:
         return jsonify({"erro": "Departamento não encontrado"}), 404
 
-    depto_atualizado = {'departamento_id': depto_id, 'nome': dados['nome']}
     return jsonify(depto_atualizado)
 
 @api_bp.route('/departamentos/<int:depto_id>', methods=['DELETE'])
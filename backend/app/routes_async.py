@@ -0,0 +1,222 @@
+# backend/app/routes_async.py
+
+import os
+import time
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import generate_etag, http_date, is_resource_modified
+
+from . import create_app
+from . import models_async
+from .auth import verificar_token
+from .cache import catalogo_cache
+from .metricas import duracao_requisicoes
+from .models import TokenSincronizacaoExpiradoError
+from .notificacoes import ouvinte_reservas
+from .serializacao import COMPRESSAO_MINIMO, para_colunas
+
+# Versão ASGI das rotas de leitura mais usadas. Elas respondem com o mesmo
+# JSON (mesmo provider do Flask) e os mesmos códigos das rotas do api_bp,
+# mas sem prender uma thread enquanto esperam o banco. Todo o resto da API
+# continua sendo atendido pelo Flask, montado como fallback em '/'.
+
+
+# As rotas Flask recebem o CORS do flask-cors; estas precisam mandar o cabeçalho
+# por conta própria (o preflight OPTIONS cai no Flask)
+_CORS = {'Access-Control-Allow-Origin': '*'}
+
+
+def _corpo_json(request, dados):
+    """O mesmo corpo que o jsonify do Flask geraria (compacto, ou indentado em debug)."""
+    flask_app = request.app.state.flask_app
+    if flask_app.debug:
+        return flask_app.json.dumps(dados, indent=2) + "\n"
+    return flask_app.json.dumps(dados, separators=(",", ":")) + "\n"
+
+
+def _json(request, dados, status=200):
+    corpo = _corpo_json(request, dados)
+    return Response(corpo, status_code=status, media_type='application/json', headers=_CORS)
+
+
+def _lista(request, itens):
+    """Mesmo ?formato=colunar das rotas Flask."""
+    if request.query_params.get('formato') == 'colunar':
+        return para_colunas(itens)
+    return itens
+
+
+def _rota(endpoint):
+    """Mede a rota com o mesmo nome de endpoint da versão Flask (ex: api_bp.listar_espacos_route)."""
+    def decorator(f):
+        async def decorated(request):
+            inicio = time.perf_counter()
+            resposta = await f(request)
+            duracao_requisicoes.observar((endpoint, request.method, str(resposta.status_code)), time.perf_counter() - inicio)
+            return resposta
+        decorated.__name__ = f.__name__
+        return decorated
+    return decorator
+
+
+def _usuario_do_token(request):
+    """Equivalente ao token_required: retorna (current_user, None) ou (None, resposta de erro)."""
+    token = request.headers.get('x-access-token')
+    if not token:
+        return None, _json(request, {'erro': 'Token de autenticação está faltando!'}, 401)
+
+    current_user = verificar_token(token, request.app.state.flask_app.config['SECRET_KEY'])
+    if current_user is None:
+        return None, _json(request, {'erro': 'Token é inválido ou expirou!'}, 401)
+    return current_user, None
+
+
+# --- ROTA 1: Listar todos os espaços ---
+@_rota('api_bp.listar_espacos_route')
+async def listar_espacos(request):
+    """Mesma resposta de listar_espacos_route, com ETag e Last-Modified."""
+    espacos = await models_async.get_all_espacos()
+    corpo = _corpo_json(request, _lista(request, espacos))
+
+    etag = generate_etag(corpo.encode())
+    last_modified = catalogo_cache.last_modified('espacos')
+    cabecalhos = {
+        **_CORS,
+        'ETag': f'"{etag}"',
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': 'no-cache',
+    }
+
+    ambiente = {
+        'REQUEST_METHOD': request.method,
+        'HTTP_IF_NONE_MATCH': request.headers.get('if-none-match', ''),
+        'HTTP_IF_MODIFIED_SINCE': request.headers.get('if-modified-since', ''),
+    }
+    if not is_resource_modified(ambiente, etag=etag, last_modified=last_modified):
+        return Response(status_code=304, headers=cabecalhos)
+    return Response(corpo, media_type='application/json', headers=cabecalhos)
+
+
+# --- ROTA 8: Listar reservas com filtros ---
+@_rota('api_bp.listar_reservas_route')
+async def listar_reservas(request):
+    """Mesmos parâmetros de listar_reservas_route: filtros, limite/cursor, stream e since."""
+    current_user, erro = _usuario_do_token(request)
+    if erro:
+        return erro
+
+    filtros = dict(request.query_params)
+
+    if 'since' in filtros:
+        try:
+            reservas, removidas, sync_token = await models_async.get_reservas_alteradas(filtros, filtros['since'])
+        except ValueError:
+            return _json(request, {"erro": "Token de sincronização ou filtros inválidos"}, 400)
+        except TokenSincronizacaoExpiradoError:
+            return _json(request, {"erro": "Token de sincronização expirado. Busque a lista completa com ?since="}, 410)
+        return _json(request, {"reservas": _lista(request, reservas), "removidas": removidas, "sync_token": sync_token})
+
+    modo_stream = filtros.get('stream')
+    if modo_stream:
+        if modo_stream not in ('ndjson', 'json'):
+            return _json(request, {"erro": "Valor de 'stream' inválido. Use 'ndjson' ou 'json'."}, 400)
+        try:
+            reservas = models_async.iter_reservas(filtros)
+        except ValueError:
+            return _json(request, {"erro": "Filtros inválidos"}, 400)
+        return _stream_reservas(request, reservas, modo_stream)
+
+    try:
+        if 'limite' in filtros:
+            try:
+                reservas, proximo_cursor = await models_async.get_reservas_pagina(
+                    filtros, int(filtros['limite']), filtros.get('cursor')
+                )
+            except ValueError:
+                return _json(request, {"erro": "Parâmetros de paginação ou filtros inválidos"}, 400)
+            return _json(request, {"reservas": _lista(request, reservas), "proximo_cursor": proximo_cursor})
+
+        reservas = await models_async.get_all_reservas(filtros)
+    except ValueError:
+        return _json(request, {"erro": "Filtros inválidos"}, 400)
+    return _json(request, _lista(request, reservas))
+
+
+def _stream_reservas(request, reservas, modo):
+    dumps = request.app.state.flask_app.json.dumps
+
+    async def gerar_ndjson():
+        async for reserva in reservas:
+            yield dumps(reserva) + "\n"
+
+    async def gerar_array():
+        separador = "["
+        async for reserva in reservas:
+            yield separador + dumps(reserva)
+            separador = ","
+        yield "[]" if separador == "[" else "]"
+
+    if modo == 'ndjson':
+        return StreamingResponse(gerar_ndjson(), media_type='application/x-ndjson', headers=_CORS)
+    return StreamingResponse(gerar_array(), media_type='application/json', headers=_CORS)
+
+
+# --- ROTA 16: Buscar espaços disponíveis ---
+@_rota('api_bp.buscar_espacos_disponiveis_route')
+async def buscar_espacos_disponiveis(request):
+    """Mesma resposta de buscar_espacos_disponiveis_route."""
+    espacos = await models_async.get_available_espacos(dict(request.query_params))
+    return _json(request, _lista(request, espacos))
+
+
+# --- ROTA Adicional: Buscar dados do usuário logado ---
+@_rota('api_bp.get_current_user_data')
+async def get_current_user_data(request):
+    current_user, erro = _usuario_do_token(request)
+    if erro:
+        return erro
+
+    usuario = await models_async.get_usuario_by_id(int(current_user['sub']))
+    if usuario is None:
+        return _json(request, {"erro": "Usuário do token não encontrado"}, 404)
+    return _json(request, usuario)
+
+
+def create_asgi_app(flask_app=None):
+    """
+    Cria a aplicação ASGI: as rotas de leitura acima rodam no event loop
+    (asyncpg), e qualquer outra requisição vai para a aplicação Flask, que
+    roda em um pool de ASGI_WSGI_THREADS threads.
+    """
+    if flask_app is None:
+        flask_app = create_app()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        ouvinte_reservas.iniciar()
+        yield
+        await models_async.fechar_pool()
+
+    rotas = [
+        Route('/api/espacos', listar_espacos, methods=['GET']),
+        Route('/api/espacos/disponiveis', buscar_espacos_disponiveis, methods=['GET']),
+        Route('/api/reservas', listar_reservas, methods=['GET']),
+        Route('/api/me', get_current_user_data, methods=['GET']),
+        # Métodos/rotas não atendidos acima caem aqui (o Starlette só usa a
+        # rota parcial, ex: POST /api/espacos, se nenhuma outra servir por inteiro)
+        Mount('/', app=WSGIMiddleware(flask_app, workers=int(os.getenv('ASGI_WSGI_THREADS', '10')))),
+    ]
+
+    # Comprime as respostas das rotas acima; as do Flask já chegam comprimidas
+    # (com Content-Encoding) e passam direto
+    middleware = [Middleware(GZipMiddleware, minimum_size=COMPRESSAO_MINIMO)]
+
+    app = Starlette(routes=rotas, lifespan=lifespan, middleware=middleware)
+    app.state.flask_app = flask_app
+    return app
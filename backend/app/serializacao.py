@@ -0,0 +1,108 @@
+# backend/app/serializacao.py
+
+import gzip
+import os
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+# Dependências opcionais: sem elas, o JSON sai pelo json da biblioteca padrão
+# e a compressão usa só gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_RAPIDO_ATIVO = orjson is not None and os.getenv('JSON_RAPIDO', '1') != '0'
+
+# Respostas menores que isso não compensam a compressão
+COMPRESSAO_MINIMO = int(os.getenv('COMPRESSAO_MINIMO', '1024'))
+TIPOS_COMPRIMIVEIS = {'application/json', 'text/csv', 'text/plain', 'text/html'}
+
+
+class JSONProviderRapido(DefaultJSONProvider):
+    """
+    Provider de JSON do Flask que serializa com o orjson. A saída é a mesma
+    do provider padrão (chaves ordenadas, datas no formato HTTP, Decimal como
+    texto), exceto pelos acentos, que saem em UTF-8 em vez de \\uXXXX.
+    Tipos que o orjson não aceita caem no provider padrão.
+    """
+
+    def _orjson(self, obj, indentar=False):
+        # As datas passam pelo self.default do Flask, para manter o formato HTTP
+        opcoes = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            opcoes |= orjson.OPT_SORT_KEYS
+        if indentar:
+            opcoes |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=self.default, option=opcoes)
+        except TypeError:
+            return super().dumps(obj, indent=2 if indentar else None, separators=(",", ":")).encode()
+
+    def dumps(self, obj, **kwargs):
+        # Só indent/separators são tratados aqui; outros argumentos vão para o json padrão
+        if kwargs.keys() - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        return self._orjson(obj, bool(kwargs.get('indent'))).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._orjson(obj, indentar) + b"\n", mimetype=self.mimetype)
+
+
+def para_colunas(itens):
+    """
+    Formato colunar de uma lista de dicts com as mesmas chaves: os nomes das
+    colunas uma vez só e depois os valores de cada linha, na mesma ordem.
+    """
+    if not itens:
+        return {"colunas": [], "linhas": []}
+    colunas = list(itens[0])
+    return {"colunas": colunas, "linhas": [list(item.values()) for item in itens]}
+
+
+def _comprimir(resposta):
+    if (resposta.direct_passthrough or resposta.is_streamed
+            or resposta.status_code < 200 or resposta.status_code in (204, 304)
+            or 'Content-Encoding' in resposta.headers
+            or resposta.mimetype not in TIPOS_COMPRIMIVEIS):
+        return resposta
+
+    corpo = resposta.get_data()
+    if len(corpo) < COMPRESSAO_MINIMO:
+        return resposta
+
+    # O conteúdo depende do Accept-Encoding, comprimindo ou não
+    resposta.vary.add('Accept-Encoding')
+    codificacao = request.accept_encodings.best_match(['br', 'gzip'] if brotli is not None else ['gzip'])
+    if codificacao is None:
+        return resposta
+
+    if codificacao == 'br':
+        # Qualidade baixa: para respostas geradas a cada requisição, a velocidade conta mais
+        resposta.set_data(brotli.compress(corpo, quality=4))
+    else:
+        resposta.set_data(gzip.compress(corpo, compresslevel=6))
+    resposta.headers['Content-Encoding'] = codificacao
+
+    # A versão comprimida não é idêntica byte a byte: o ETag vira fraco
+    etag, fraco = resposta.get_etag()
+    if etag and not fraco:
+        resposta.set_etag(etag, weak=True)
+    return resposta
+
+
+def configurar_serializacao(app):
+    """Liga o JSON rápido (se o orjson estiver instalado) e a compressão das respostas."""
+    if JSON_RAPIDO_ATIVO:
+        app.json = JSONProviderRapido(app)
+    # O Flask 3 não lê mais JSON_AS_ASCII da configuração: aplica no provider
+    app.json.ensure_ascii = app.config.get('JSON_AS_ASCII', True)
+    app.after_request(_comprimir)
@@ -0,0 +1,449 @@
+# backend/app/transferencia.py
+
+import csv
+import io
+import json
+import queue
+import threading
+
+import psycopg2.errors
+import psycopg2.extras
+from .cache import catalogo_cache
+from .db import ao_confirmar, db_connection
+from .disponibilidade import indice_disponibilidade
+
+# Quantos erros de linha, no máximo, voltam no relatório de uma importação
+MAX_ERROS_RELATORIO = 1000
+
+# --- IMPORTAÇÃO (COPY FROM STDIN) ---
+# Para cada entidade: colunas aceitas no arquivo, colunas obrigatórias,
+# as checagens de cada linha (feitas em SQL sobre a tabela de staging, todas
+# de uma vez) e o comando que grava as linhas válidas.
+#
+# As checagens recebem a tabela "stg" com todas as colunas como texto mais a
+# coluna "linha" (número da linha de dados, começando em 1).
+
+_FUNCOES_CONVERSAO = """
+    CREATE OR REPLACE FUNCTION pg_temp.para_timestamptz(valor text) RETURNS timestamptz AS $$
+    BEGIN
+        RETURN valor::timestamptz;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION pg_temp.para_int(valor text) RETURNS int AS $$
+    BEGIN
+        RETURN valor::int;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+"""
+
+IMPORTACOES = {
+    'usuarios': {
+        'colunas': ['nome', 'email', 'senha', 'tipo', 'departamento_id'],
+        'obrigatorias': ['nome', 'email', 'senha', 'tipo'],
+        'checagens': [
+            ("tipo NOT IN ('aluno', 'professor', 'gestor')", "tipo inválido"),
+            ("departamento_id IS NOT NULL AND pg_temp.para_int(departamento_id) IS NULL", "departamento_id não é um número"),
+            ("pg_temp.para_int(departamento_id) IS NOT NULL AND NOT EXISTS ("
+             "SELECT 1 FROM Departamentos d WHERE d.departamento_id = pg_temp.para_int(stg.departamento_id))",
+             "departamento não encontrado"),
+            ("EXISTS (SELECT 1 FROM stg outra WHERE lower(outra.email) = lower(stg.email) AND outra.linha > stg.linha)",
+             "e-mail repetido no arquivo (vale a última ocorrência)"),
+        ],
+        # Usuários são identificados pelo e-mail: se já existir, é atualizado
+        'gravacao': """
+            INSERT INTO Usuarios (nome, email, senha, tipo, departamento_id)
+            SELECT nome, email, senha, tipo, departamento_id::int
+            FROM stg
+            WHERE linha NOT IN (SELECT linha FROM erros)
+            ON CONFLICT (email) DO UPDATE
+            SET nome = EXCLUDED.nome, senha = EXCLUDED.senha,
+                tipo = EXCLUDED.tipo, departamento_id = EXCLUDED.departamento_id
+            RETURNING (xmax = 0) AS inserida
+        """,
+        'invalida': ('espacos',),
+    },
+    'espacos': {
+        'colunas': ['espaco_id', 'nome', 'tipo', 'capacidade', 'gestor_responsavel_id'],
+        'obrigatorias': ['nome', 'tipo'],
+        'checagens': [
+            ("tipo NOT IN ('sala_de_aula', 'laboratorio', 'auditorio')", "tipo inválido"),
+            ("espaco_id IS NOT NULL AND pg_temp.para_int(espaco_id) IS NULL", "espaco_id não é um número"),
+            ("pg_temp.para_int(espaco_id) IS NOT NULL AND NOT EXISTS ("
+             "SELECT 1 FROM Espacos e WHERE e.espaco_id = pg_temp.para_int(stg.espaco_id))",
+             "espaço não encontrado para atualização"),
+            ("capacidade IS NOT NULL AND COALESCE(pg_temp.para_int(capacidade), 0) <= 0",
+             "capacidade deve ser um inteiro positivo"),
+            ("gestor_responsavel_id IS NOT NULL AND pg_temp.para_int(gestor_responsavel_id) IS NULL",
+             "gestor_responsavel_id não é um número"),
+            ("pg_temp.para_int(gestor_responsavel_id) IS NOT NULL AND NOT EXISTS ("
+             "SELECT 1 FROM Usuarios u WHERE u.usuario_id = pg_temp.para_int(stg.gestor_responsavel_id))",
+             "gestor responsável não encontrado"),
+        ],
+        # Linhas com espaco_id atualizam o espaço existente; as demais criam um novo
+        'gravacao': """
+            WITH validas AS (
+                SELECT * FROM stg WHERE linha NOT IN (SELECT linha FROM erros)
+            ),
+            atualizadas AS (
+                UPDATE Espacos e
+                SET nome = v.nome, tipo = v.tipo, capacidade = v.capacidade::int,
+                    gestor_responsavel_id = v.gestor_responsavel_id::int
+                FROM validas v
+                WHERE v.espaco_id IS NOT NULL AND e.espaco_id = v.espaco_id::int
+                RETURNING false AS inserida
+            ),
+            inseridas AS (
+                INSERT INTO Espacos (nome, tipo, capacidade, gestor_responsavel_id)
+                SELECT nome, tipo, capacidade::int, gestor_responsavel_id::int
+                FROM validas
+                WHERE espaco_id IS NULL
+                RETURNING true AS inserida
+            )
+            SELECT inserida FROM atualizadas
+            UNION ALL
+            SELECT inserida FROM inseridas
+        """,
+        'invalida': ('espacos',),
+    },
+    'reservas': {
+        'colunas': ['espaco_id', 'solicitante_id', 'data_hora_inicio', 'data_hora_fim', 'finalidade',
+                    'num_participantes', 'status', 'aprovador_id'],
+        'obrigatorias': ['espaco_id', 'solicitante_id', 'data_hora_inicio', 'data_hora_fim'],
+        'checagens': [
+            ("NOT EXISTS (SELECT 1 FROM Espacos e WHERE e.espaco_id = pg_temp.para_int(stg.espaco_id))",
+             "espaço não encontrado"),
+            ("NOT EXISTS (SELECT 1 FROM Usuarios u WHERE u.usuario_id = pg_temp.para_int(stg.solicitante_id))",
+             "solicitante não encontrado"),
+            ("aprovador_id IS NOT NULL AND NOT EXISTS ("
+             "SELECT 1 FROM Usuarios u WHERE u.usuario_id = pg_temp.para_int(stg.aprovador_id))",
+             "aprovador não encontrado"),
+            ("pg_temp.para_timestamptz(data_hora_inicio) IS NULL OR pg_temp.para_timestamptz(data_hora_fim) IS NULL",
+             "data inválida"),
+            ("pg_temp.para_timestamptz(data_hora_fim) <= pg_temp.para_timestamptz(data_hora_inicio) "
+             "OR pg_temp.para_timestamptz(data_hora_fim) > pg_temp.para_timestamptz(data_hora_inicio) + INTERVAL '4 hours'",
+             "período deve ser positivo e ter no máximo 4 horas"),
+            ("num_participantes IS NOT NULL AND COALESCE(pg_temp.para_int(num_participantes), 0) <= 0",
+             "num_participantes deve ser um inteiro positivo"),
+            ("status IS NOT NULL AND status NOT IN ('pendente', 'confirmada', 'cancelada', 'recusada')",
+             "status inválido"),
+            # Mesmo limite da trigger do contador de reservas ativas, contando as linhas anteriores do arquivo
+            ("COALESCE(status, 'pendente') IN ('pendente', 'confirmada') AND EXISTS ("
+             "SELECT 1 FROM Usuarios u WHERE u.usuario_id = pg_temp.para_int(stg.solicitante_id) AND u.tipo = 'aluno' "
+             "AND u.reservas_ativas + (SELECT COUNT(*) FROM stg anterior "
+             "WHERE anterior.solicitante_id = stg.solicitante_id AND anterior.linha < stg.linha "
+             "AND COALESCE(anterior.status, 'pendente') IN ('pendente', 'confirmada')) >= 2)",
+             "o aluno já tem 2 reservas ativas"),
+        ],
+        # Reservas só são inseridas (não há chave natural para atualizar). As que
+        # esbarram na constraint de conflito de horários são puladas e reportadas.
+        # O ON CONFLICT só enxerga a partição (mês) da linha: as ativas que
+        # conflitam com reservas de outro mês são puladas antes pelo NOT EXISTS
+        # (senão a trigger reservas_conflito_virada abortaria a importação).
+        'gravacao': """
+            WITH validas AS (
+                SELECT * FROM stg WHERE linha NOT IN (SELECT linha FROM erros)
+            ),
+            inseridas AS (
+                INSERT INTO Reservas (espaco_id, solicitante_id, data_hora_inicio, data_hora_fim,
+                                      finalidade, num_participantes, status, aprovador_id)
+                SELECT espaco_id::int, solicitante_id::int, data_hora_inicio::timestamptz, data_hora_fim::timestamptz,
+                       finalidade, num_participantes::int, COALESCE(status, 'pendente'), aprovador_id::int
+                FROM validas v
+                WHERE COALESCE(v.status, 'pendente') NOT IN ('confirmada', 'pendente')
+                   OR NOT EXISTS (
+                       SELECT 1 FROM Reservas r
+                       WHERE r.espaco_id = v.espaco_id::int
+                         AND r.status IN ('confirmada', 'pendente')
+                         AND r.data_hora_inicio > v.data_hora_inicio::timestamptz - INTERVAL '4 hours'
+                         AND r.data_hora_inicio < v.data_hora_fim::timestamptz
+                         AND r.data_hora_fim > v.data_hora_inicio::timestamptz
+                   )
+                ORDER BY linha
+                ON CONFLICT DO NOTHING
+                RETURNING espaco_id, data_hora_inicio, data_hora_fim
+            ),
+            conflitos AS (
+                INSERT INTO erros (linha, mensagem)
+                SELECT v.linha, 'conflito de horário com outra reserva ativa'
+                FROM validas v
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM inseridas i
+                    WHERE i.espaco_id = v.espaco_id::int
+                      AND i.data_hora_inicio = v.data_hora_inicio::timestamptz
+                      AND i.data_hora_fim = v.data_hora_fim::timestamptz
+                )
+            )
+            SELECT true AS inserida FROM inseridas
+        """,
+        'invalida': (),
+    },
+}
+
+
+class _LeitorNdjson(io.RawIOBase):
+    """
+    Converte, sob demanda, um fluxo NDJSON (um objeto por linha) em CSV,
+    para ser lido pelo COPY sem carregar o arquivo inteiro na memória.
+    """
+
+    def __init__(self, fluxo, colunas):
+        self._linhas = self._gerar_csv(fluxo, colunas)
+        self._pendente = b''
+
+    @staticmethod
+    def _gerar_csv(fluxo, colunas):
+        saida = io.StringIO()
+        escritor = csv.writer(saida)
+        for numero, linha in enumerate(fluxo, start=1):
+            if isinstance(linha, bytes):
+                linha = linha.decode('utf-8')
+            if not linha.strip():
+                continue
+            try:
+                objeto = json.loads(linha)
+            except ValueError as e:
+                raise ValueError(f"Linha {numero} do NDJSON não é um JSON válido: {e}") from e
+            if not isinstance(objeto, dict):
+                raise ValueError(f"Linha {numero} do NDJSON não é um objeto")
+            # Campos ausentes ou nulos viram NULL no COPY (campo vazio sem aspas)
+            escritor.writerow(['' if objeto.get(c) is None else objeto[c] for c in colunas])
+            yield saida.getvalue().encode('utf-8')
+            saida.seek(0)
+            saida.truncate()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pendente:
+            try:
+                self._pendente = next(self._linhas)
+            except StopIteration:
+                return 0
+        tamanho = min(len(buffer), len(self._pendente))
+        buffer[:tamanho] = self._pendente[:tamanho]
+        self._pendente = self._pendente[tamanho:]
+        return tamanho
+
+
+def _ler_cabecalho_csv(fluxo):
+    """Lê a primeira linha do CSV (cabeçalho) byte a byte, sem consumir o resto do fluxo."""
+    bruto = bytearray()
+    while True:
+        caractere = fluxo.read(1)
+        if not caractere or caractere == b'\n':
+            break
+        bruto += caractere
+    texto = bruto.decode('utf-8-sig').rstrip('\r')
+    return [c.strip() for c in next(csv.reader([texto]), [])]
+
+
+def importar(entidade, fluxo, formato='csv', simular=False):
+    """
+    Importa um arquivo CSV (com cabeçalho) ou NDJSON para a entidade informada.
+
+    O conteúdo vai por COPY FROM STDIN para uma tabela temporária (staging),
+    as linhas são validadas de uma vez em SQL e as válidas são gravadas com um
+    único INSERT/UPDATE. Linhas inválidas são puladas e reportadas.
+    Com simular=True tudo é desfeito no final (serve para conferir o arquivo).
+
+    `fluxo` é um arquivo binário (ou, para NDJSON, qualquer iterável de linhas).
+    Retorna um relatório com os totais e os erros por linha, ou {"erro": ...}.
+    """
+    especificacao = IMPORTACOES.get(entidade)
+    if especificacao is None:
+        return {"erro": f"Entidade '{entidade}' não pode ser importada."}
+
+    if formato == 'csv':
+        colunas = _ler_cabecalho_csv(fluxo)
+        desconhecidas = [c for c in colunas if c not in especificacao['colunas']]
+        if not colunas or desconhecidas:
+            return {"erro": f"Colunas inválidas no cabeçalho: {desconhecidas or colunas}. "
+                            f"Aceitas: {especificacao['colunas']}"}
+        faltando = [c for c in especificacao['obrigatorias'] if c not in colunas]
+        if faltando:
+            return {"erro": f"Colunas obrigatórias ausentes no cabeçalho: {faltando}"}
+        entrada = fluxo
+    elif formato == 'ndjson':
+        colunas = especificacao['colunas']
+        entrada = _LeitorNdjson(fluxo, colunas)
+    else:
+        return {"erro": "Formato inválido. Use 'csv' ou 'ndjson'."}
+
+    colunas_staging = ', '.join(f'{c} text' for c in especificacao['colunas'])
+    checagens = [(f'{c} IS NULL', f'{c} é obrigatório') for c in especificacao['obrigatorias']]
+    checagens += especificacao['checagens']
+    sql_erros = " UNION ALL ".join(f"SELECT linha, %s FROM stg WHERE {condicao}" for condicao, _ in checagens)
+    mensagens_erros = tuple(mensagem for _, mensagem in checagens)
+
+    with db_connection() as conn:
+        if conn is None:
+            return {"erro": "Falha na conexão com o banco de dados"}
+
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+            try:
+                cursor.execute(_FUNCOES_CONVERSAO)
+                cursor.execute(f"CREATE TEMP TABLE stg (linha serial, {colunas_staging}) ON COMMIT DROP")
+                cursor.execute("CREATE TEMP TABLE erros (linha int, mensagem text) ON COMMIT DROP")
+
+                cursor.copy_expert(
+                    f"COPY stg ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)", entrada
+                )
+                cursor.execute("SELECT COUNT(*) FROM stg")
+                total = cursor.fetchone()[0]
+
+                # Campos vazios entre aspas ("") também contam como ausentes
+                cursor.execute("UPDATE stg SET " + ', '.join(
+                    f"{c} = NULLIF({c}, '')" for c in especificacao['colunas']
+                ))
+                cursor.execute(f"INSERT INTO erros (linha, mensagem) {sql_erros}", mensagens_erros)
+
+                cursor.execute(especificacao['gravacao'])
+                gravadas = [linha['inserida'] for linha in cursor.fetchall()]
+
+                cursor.execute("SELECT COUNT(DISTINCT linha) FROM erros")
+                linhas_com_erro = cursor.fetchone()[0]
+                cursor.execute("SELECT linha, mensagem FROM erros ORDER BY linha, mensagem LIMIT %s",
+                               (MAX_ERROS_RELATORIO,))
+                erros = [dict(linha) for linha in cursor.fetchall()]
+
+                if simular:
+                    conn.rollback()
+                else:
+                    conn.commit()
+            except (ValueError, psycopg2.DataError) as e:
+                conn.rollback()
+                return {"erro": f"Arquivo inválido: {e}"}
+            except psycopg2.errors.ExclusionViolation as e:
+                # Conflito entre linhas do próprio arquivo de meses diferentes, ou
+                # com uma reserva gravada por outro pedido depois do NOT EXISTS
+                conn.rollback()
+                return {"erro": f"Conflito de horário entre reservas de meses diferentes: {e.diag.message_primary}"}
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao importar {entidade}: {e}")
+                return {"erro": f"Ocorreu um erro interno ao importar {entidade}."}
+
+    if not simular and gravadas:
+        if especificacao['invalida']:
+            ao_confirmar(lambda: catalogo_cache.invalidate(*especificacao['invalida']))
+        if entidade == 'reservas':
+            ao_confirmar(indice_disponibilidade.invalidar)
+
+    return {
+        "entidade": entidade,
+        "simulacao": simular,
+        "linhas": total,
+        "inseridas": sum(1 for inserida in gravadas if inserida),
+        "atualizadas": sum(1 for inserida in gravadas if not inserida),
+        "linhas_com_erro": linhas_com_erro,
+        "erros": erros,
+    }
+
+
+# --- EXPORTAÇÃO (COPY TO STDOUT) ---
+
+EXPORTACOES = {
+    # Nunca exporta a coluna de senha
+    'usuarios': """
+        SELECT u.usuario_id, u.nome, u.email, u.tipo, u.departamento_id, d.nome AS departamento_nome
+        FROM Usuarios u
+        LEFT JOIN Departamentos d ON u.departamento_id = d.departamento_id
+        ORDER BY u.usuario_id
+    """,
+    'espacos': "SELECT * FROM Espacos ORDER BY espaco_id",
+    'reservas': """
+        SELECT r.*, e.nome AS espaco_nome, u.nome AS solicitante_nome
+        FROM Reservas r
+        JOIN Espacos e ON r.espaco_id = e.espaco_id
+        JOIN Usuarios u ON r.solicitante_id = u.usuario_id
+        {where}
+        ORDER BY r.data_hora_inicio, r.reserva_id
+    """,
+}
+
+
+def _sql_exportacao(cursor, entidade, filtros):
+    sql = EXPORTACOES[entidade]
+    if entidade == 'reservas':
+        # Importado aqui para evitar import circular com o models.py
+        from .models import _filtros_reservas
+        where_clauses, params = _filtros_reservas(filtros or {})
+        where = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+        # COPY não aceita parâmetros: os valores são escapados pelo próprio psycopg2
+        sql = cursor.mogrify(sql.format(where=where), tuple(params)).decode()
+    return f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+
+
+def exportar_para_arquivo(entidade, arquivo, filtros=None):
+    """Exporta a entidade em CSV direto para um arquivo aberto (usado pela CLI)."""
+    with db_connection() as conn:
+        if conn is None:
+            raise RuntimeError("Falha na conexão com o banco de dados")
+        with conn.cursor() as cursor:
+            cursor.copy_expert(_sql_exportacao(cursor, entidade, filtros), arquivo)
+
+
+class _EscritorFila:
+    """Arquivo "de mentira" que o COPY usa para escrever: cada pedaço vai para uma fila."""
+
+    def __init__(self, fila, cancelado):
+        self._fila = fila
+        self._cancelado = cancelado
+
+    def write(self, dados):
+        while True:
+            if self._cancelado.is_set():
+                raise IOError("Exportação cancelada pelo cliente")
+            try:
+                self._fila.put(dados, timeout=1)
+                return len(dados)
+            except queue.Full:
+                continue
+
+
+def exportar_stream(entidade, filtros=None):
+    """
+    Gerador que produz o CSV da entidade em pedaços, conforme o COPY TO STDOUT
+    vai enviando. O COPY roda em uma thread própria que escreve em uma fila
+    limitada; assim nada é montado em memória e um cliente lento segura o banco
+    em vez de acumular dados no servidor.
+    """
+    fila = queue.Queue(maxsize=64)
+    cancelado = threading.Event()
+    fim = object()
+
+    def copiar():
+        try:
+            with db_connection() as conn:
+                if conn is None:
+                    raise RuntimeError("Falha na conexão com o banco de dados")
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.copy_expert(_sql_exportacao(cursor, entidade, filtros), _EscritorFila(fila, cancelado))
+                except IOError:
+                    # O COPY foi interrompido no meio: a conexão não volta para o pool
+                    conn.close()
+                    raise
+            fila.put(fim)
+        except Exception as e:
+            if not cancelado.is_set():
+                fila.put(e)
+
+    thread = threading.Thread(target=copiar, name=f'exportar-{entidade}', daemon=True)
+    thread.start()
+    try:
+        while True:
+            pedaco = fila.get()
+            if pedaco is fim:
+                return
+            if isinstance(pedaco, Exception):
+                raise pedaco
+            yield pedaco
+    finally:
+        cancelado.set()
@@ -0,0 +1,8 @@
+# backend/asgi.py
+
+# Ponto de entrada ASGI: rotas de leitura assíncronas (asyncpg) e o resto da
+# API pelo Flask. Uso (dentro da pasta backend):
+#     uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+from app.routes_async import create_asgi_app
+
+app = create_asgi_app()
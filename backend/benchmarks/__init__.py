@@ -0,0 +1,11 @@
+# backend/benchmarks/__init__.py
+"""
+Benchmarks da camada de modelos (models.py) e das rotas HTTP (routes.py).
+
+Rodam contra o PostgreSQL configurado no .env, com uma massa de dados
+sintética criada (e removida) pelo próprio benchmark. Uso, a partir da pasta
+backend:
+
+    python -m benchmarks --escala 2 --concorrencia 1,8 --salvar base.json
+    python -m benchmarks --escala 2 --concorrencia 1,8 --comparar base.json
+"""
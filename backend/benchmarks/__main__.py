@@ -0,0 +1,73 @@
+# backend/benchmarks/__main__.py
+
+import argparse
+import sys
+
+from .cenarios import CENARIOS, Contexto
+from .fixture import criar_fixture, remover_fixture
+from .medicao import chave_resultado, comparar_com_baseline, medir, salvar_baseline
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmarks da camada de modelos e das rotas HTTP.')
+    parser.add_argument('--escala', type=int, default=1,
+                        help='Multiplicador da massa de dados (escala 1 = 100 usuários, 20 espaços, 10 mil reservas).')
+    parser.add_argument('--repeticoes', type=int, default=200, help='Chamadas medidas por cenário.')
+    parser.add_argument('--concorrencia', default='1,8',
+                        help='Níveis de concorrência separados por vírgula (ex: 1,4,16).')
+    parser.add_argument('--cenario', action='append', default=[],
+                        help='Roda só os cenários cujo nome contém este texto (pode repetir).')
+    parser.add_argument('--salvar', metavar='ARQUIVO', help='Salva os resultados como baseline em JSON.')
+    parser.add_argument('--comparar', metavar='ARQUIVO', help='Compara com um baseline salvo antes.')
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help='Piora aceita em relação ao baseline antes de acusar regressão (0.2 = 20%%).')
+    parser.add_argument('--manter-dados', action='store_true', help='Não apaga a massa de dados no final.')
+    return parser.parse_args()
+
+
+def main():
+    args = _argumentos()
+    niveis = [int(nivel) for nivel in args.concorrencia.split(',')]
+    cenarios = [(nome, f) for nome, f in CENARIOS if not args.cenario or any(filtro in nome for filtro in args.cenario)]
+
+    print(f"Criando massa de dados (escala {args.escala})...")
+    fixture = criar_fixture(args.escala)
+    print(f"{fixture['total_reservas']} reservas criadas.\n")
+
+    resultados = {}
+    try:
+        contexto = Contexto(fixture)
+        print(f"{'cenário':<58} {'conc':>4} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>6}")
+        for nome, funcao in cenarios:
+            for concorrencia in niveis:
+                r = medir(lambda: funcao(contexto), args.repeticoes, concorrencia)
+                resultados[chave_resultado(nome, concorrencia)] = r
+                print(f"{nome:<58} {concorrencia:>4} {r['vazao']:>9} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['erros']:>6}")
+    finally:
+        if not args.manter_dados:
+            remover_fixture()
+
+    if args.salvar:
+        salvar_baseline(args.salvar, resultados, {
+            'escala': args.escala, 'repeticoes': args.repeticoes, 'concorrencia': niveis,
+        })
+        print(f"\nBaseline salvo em {args.salvar}")
+
+    if args.comparar:
+        comparacao = comparar_com_baseline(args.comparar, resultados, args.tolerancia)
+        regressoes = [linha for linha in comparacao if linha[-1]]
+        print(f"\nComparação com {args.comparar} (tolerância {args.tolerancia:.0%}):")
+        for chave, p95_antes, p95_agora, vazao_antes, vazao_agora, erros_antes, erros_agora, regrediu in comparacao:
+            marca = 'REGRESSÃO' if regrediu else 'ok'
+            print(f"  {chave:<64} p95 {p95_antes:>8} -> {p95_agora:<8} req/s {vazao_antes:>9} -> {vazao_agora:<9} "
+                  f"erros {erros_antes:>4} -> {erros_agora:<4} {marca}")
+        if regressoes:
+            print(f"\n{len(regressoes)} cenário(s) com regressão.")
+            sys.exit(1)
+
+    if any(r['erros'] for r in resultados.values()):
+        print("\nAtenção: houve chamadas com erro; confira o banco e a massa de dados.")
+
+
+if __name__ == '__main__':
+    main()
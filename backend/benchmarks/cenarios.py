@@ -0,0 +1,238 @@
+# backend/benchmarks/cenarios.py
+
+import itertools
+import os
+import random
+import threading
+from datetime import timedelta
+
+# Os cenários medem o custo das rotas, não os limites do controle de admissão
+# (app/admissao.py), que recusariam as repetições de login e de reservas
+os.environ.setdefault('ADMISSAO_ATIVA', '0')
+
+from app import create_app
+from app.db import db_connection
+from app.models import authenticate_usuario, create_reserva, get_all_reservas, get_available_espacos
+from .fixture import PREFIXO_ESPACO
+
+# Lista de (nome, função). Cada função recebe o Contexto e retorna True se deu certo.
+CENARIOS = []
+
+
+def cenario(nome):
+    def decorator(f):
+        CENARIOS.append((nome, f))
+        return f
+    return decorator
+
+
+class Contexto:
+    """Dados compartilhados pelos cenários: massa de dados, app Flask e tokens."""
+
+    def __init__(self, fixture):
+        self.fixture = fixture
+        self.app = create_app()
+        self._local = threading.local()
+        self._horarios = itertools.count()
+        self._inicio_novas = self._proximo_horario_livre()
+
+        # Um token por perfil, obtido pela própria rota de login
+        self.tokens = {}
+        for tipo in ('gestor', 'professor', 'aluno'):
+            usuario_id = fixture['usuarios'][tipo][0]
+            resposta = self.client.post('/api/login', json={'email': fixture['emails'][usuario_id], 'senha': fixture['senha']})
+            self.tokens[tipo] = resposta.get_json()['token']
+
+    @property
+    def client(self):
+        # O test client guarda estado (cookies), então cada thread usa o seu
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client
+
+    def cabecalho(self, tipo):
+        return {'x-access-token': self.tokens[tipo]}
+
+    def usuario(self, tipo):
+        return random.choice(self.fixture['usuarios'][tipo])
+
+    def espaco(self, tipo=None):
+        if tipo is None:
+            tipo = random.choice(list(self.fixture['espacos']))
+        return random.choice(self.fixture['espacos'][tipo])
+
+    def janela(self, horas=2):
+        """Uma janela aleatória dentro do período da massa de dados."""
+        inicio, fim = self.fixture['periodo']
+        total_horas = int((fim - inicio).total_seconds() // 3600) - horas
+        comeco = inicio + timedelta(hours=random.randrange(max(total_horas, 1)))
+        return comeco.isoformat(), (comeco + timedelta(hours=horas)).isoformat()
+
+    def _proximo_horario_livre(self):
+        # Reservas criadas pelos cenários ficam depois de tudo que já existe
+        # nos espaços do benchmark, inclusive de execuções anteriores
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT MAX(r.data_hora_fim) FROM Reservas r
+                    JOIN Espacos e ON e.espaco_id = r.espaco_id
+                    WHERE e.nome LIKE %s
+                """, (PREFIXO_ESPACO + '%',))
+                ultimo = cursor.fetchone()[0]
+        return (ultimo or self.fixture['periodo'][1]) + timedelta(days=1)
+
+    def nova_reserva(self):
+        """Dados de uma reserva em um horário ainda livre (sala de aula, 1 hora)."""
+        salas = self.fixture['espacos']['sala_de_aula']
+        n = next(self._horarios)
+        inicio = self._inicio_novas + timedelta(hours=2 * (n // len(salas)))
+        return {
+            'espaco_id': salas[n % len(salas)],
+            'data_hora_inicio': inicio.isoformat(),
+            'data_hora_fim': (inicio + timedelta(hours=1)).isoformat(),
+            'finalidade': 'Reserva de benchmark',
+            'num_participantes': 10,
+        }
+
+
+# --- CAMADA DE MODELOS ---
+
+@cenario('modelos.authenticate_usuario')
+def _(ctx):
+    usuario_id = ctx.usuario('professor')
+    return authenticate_usuario(ctx.fixture['emails'][usuario_id], ctx.fixture['senha']) is not None
+
+
+@cenario('modelos.get_all_reservas')
+def _(ctx):
+    return bool(get_all_reservas({}))
+
+
+@cenario('modelos.get_all_reservas[espaco_id]')
+def _(ctx):
+    return bool(get_all_reservas({'espaco_id': ctx.espaco()}))
+
+
+@cenario('modelos.get_all_reservas[solicitante_id]')
+def _(ctx):
+    get_all_reservas({'solicitante_id': ctx.usuario('professor')})
+    return True
+
+
+@cenario('modelos.get_all_reservas[status]')
+def _(ctx):
+    return bool(get_all_reservas({'status': random.choice(['pendente', 'confirmada', 'pendente,confirmada'])}))
+
+
+@cenario('modelos.get_all_reservas[inicio,fim]')
+def _(ctx):
+    inicio, fim = ctx.janela(horas=24 * 7)
+    return bool(get_all_reservas({'inicio': inicio, 'fim': fim}))
+
+
+@cenario('modelos.get_all_reservas[espaco_id,status,inicio,fim]')
+def _(ctx):
+    inicio, fim = ctx.janela(horas=24 * 30)
+    get_all_reservas({'espaco_id': ctx.espaco(), 'status': 'pendente,confirmada', 'inicio': inicio, 'fim': fim})
+    return True
+
+
+@cenario('modelos.get_available_espacos')
+def _(ctx):
+    inicio, fim = ctx.janela()
+    get_available_espacos({'inicio': inicio, 'fim': fim})
+    return True
+
+
+@cenario('modelos.get_available_espacos[tipo]')
+def _(ctx):
+    inicio, fim = ctx.janela()
+    get_available_espacos({'inicio': inicio, 'fim': fim, 'tipo': 'sala_de_aula'})
+    return True
+
+
+@cenario('modelos.create_reserva')
+def _(ctx):
+    dados = ctx.nova_reserva()
+    dados['solicitante_id'] = ctx.usuario('professor')
+    return 'erro' not in create_reserva(dados)
+
+
+# --- ROTAS HTTP (test client do Flask) ---
+
+@cenario('rotas.POST /api/login')
+def _(ctx):
+    usuario_id = ctx.usuario('professor')
+    resposta = ctx.client.post('/api/login', json={'email': ctx.fixture['emails'][usuario_id], 'senha': ctx.fixture['senha']})
+    return resposta.status_code == 200
+
+
+@cenario('rotas.GET /api/me')
+def _(ctx):
+    return ctx.client.get('/api/me', headers=ctx.cabecalho('aluno')).status_code == 200
+
+
+@cenario('rotas.GET /api/espacos')
+def _(ctx):
+    return ctx.client.get('/api/espacos').status_code == 200
+
+
+@cenario('rotas.GET /api/espacos/<id>')
+def _(ctx):
+    return ctx.client.get(f'/api/espacos/{ctx.espaco()}').status_code == 200
+
+
+@cenario('rotas.GET /api/departamentos')
+def _(ctx):
+    return ctx.client.get('/api/departamentos').status_code == 200
+
+
+@cenario('rotas.GET /api/espacos/disponiveis')
+def _(ctx):
+    inicio, fim = ctx.janela()
+    resposta = ctx.client.get('/api/espacos/disponiveis', query_string={'inicio': inicio, 'fim': fim})
+    return resposta.status_code == 200
+
+
+@cenario('rotas.POST /api/espacos/disponibilidade')
+def _(ctx):
+    janelas = [dict(zip(('inicio', 'fim'), ctx.janela())) for _ in range(10)]
+    resposta = ctx.client.post('/api/espacos/disponibilidade', json={'janelas': janelas})
+    return resposta.status_code == 200
+
+
+@cenario('rotas.GET /api/reservas')
+def _(ctx):
+    return ctx.client.get('/api/reservas', headers=ctx.cabecalho('gestor')).status_code == 200
+
+
+@cenario('rotas.GET /api/reservas?espaco_id')
+def _(ctx):
+    resposta = ctx.client.get('/api/reservas', query_string={'espaco_id': ctx.espaco()}, headers=ctx.cabecalho('gestor'))
+    return resposta.status_code == 200
+
+
+@cenario('rotas.GET /api/reservas?status')
+def _(ctx):
+    resposta = ctx.client.get('/api/reservas', query_string={'status': 'pendente'}, headers=ctx.cabecalho('gestor'))
+    return resposta.status_code == 200
+
+
+@cenario('rotas.GET /api/reservas?inicio,fim')
+def _(ctx):
+    inicio, fim = ctx.janela(horas=24 * 7)
+    resposta = ctx.client.get('/api/reservas', query_string={'inicio': inicio, 'fim': fim}, headers=ctx.cabecalho('gestor'))
+    return resposta.status_code == 200
+
+
+@cenario('rotas.GET /api/reservas?limite=50')
+def _(ctx):
+    resposta = ctx.client.get('/api/reservas', query_string={'limite': 50}, headers=ctx.cabecalho('gestor'))
+    return resposta.status_code == 200
+
+
+@cenario('rotas.POST /api/reservas')
+def _(ctx):
+    resposta = ctx.client.post('/api/reservas', json=ctx.nova_reserva(), headers=ctx.cabecalho('professor'))
+    return resposta.status_code == 201
@@ -0,0 +1,140 @@
+# backend/benchmarks/fixture.py
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import psycopg2.extras
+from app.cache import catalogo_cache
+from app.db import db_connection
+from app.disponibilidade import indice_disponibilidade
+
+# Tudo que o benchmark cria é marcado assim, para poder ser removido depois
+DOMINIO_EMAIL = '@benchmark.local'
+PREFIXO_ESPACO = 'Benchmark '
+SENHA = 'senhaBenchmark'
+
+# Quantidades para escala 1 (multiplicadas pela escala escolhida)
+USUARIOS_POR_TIPO = {'gestor': 5, 'professor': 40, 'aluno': 55}
+ESPACOS_POR_TIPO = {'sala_de_aula': 12, 'laboratorio': 5, 'auditorio': 3}
+RESERVAS_POR_ESPACO = 500
+
+# As reservas da massa de dados começam aqui e seguem em horários sem sobreposição
+INICIO_FIXTURE = datetime(2031, 1, 6, 8, 0, tzinfo=timezone.utc)
+
+
+def criar_fixture(escala=1, semente=42):
+    """
+    Popula o banco com usuários, espaços e reservas sintéticos, na mesma
+    estrutura de createTables.sql / moreDataforTests.sql, só que em volume.
+    Retorna um dicionário com os ids criados, usado pelos cenários.
+    """
+    aleatorio = random.Random(semente)
+    remover_fixture()
+
+    with db_connection() as conn:
+        if conn is None:
+            raise RuntimeError("Sem conexão com o banco para criar a massa de dados.")
+
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+            cursor.execute("SELECT departamento_id FROM Departamentos")
+            departamentos = [linha[0] for linha in cursor.fetchall()] or [None]
+
+            # --- USUÁRIOS ---
+            usuarios = []
+            for tipo, quantidade in USUARIOS_POR_TIPO.items():
+                for i in range(quantidade * escala):
+                    departamento = None if tipo == 'aluno' else aleatorio.choice(departamentos)
+                    usuarios.append((f'{tipo.title()} {i}', f'{tipo}.{i}{DOMINIO_EMAIL}', SENHA, tipo, departamento))
+            linhas = psycopg2.extras.execute_values(cursor, """
+                INSERT INTO Usuarios (nome, email, senha, tipo, departamento_id) VALUES %s
+                RETURNING usuario_id, tipo, email
+            """, usuarios, page_size=1000, fetch=True)
+
+            usuarios_por_tipo = {tipo: [] for tipo in USUARIOS_POR_TIPO}
+            emails = {}
+            for usuario_id, tipo, email in linhas:
+                usuarios_por_tipo[tipo].append(usuario_id)
+                emails[usuario_id] = email
+
+            # --- ESPAÇOS ---
+            espacos = []
+            for tipo, quantidade in ESPACOS_POR_TIPO.items():
+                for i in range(quantidade * escala):
+                    capacidade = {'sala_de_aula': 50, 'laboratorio': 30, 'auditorio': 300}[tipo]
+                    espacos.append((f'{PREFIXO_ESPACO}{tipo} {i}', tipo, capacidade, aleatorio.choice(usuarios_por_tipo['gestor'])))
+            linhas = psycopg2.extras.execute_values(cursor, """
+                INSERT INTO Espacos (nome, tipo, capacidade, gestor_responsavel_id) VALUES %s
+                RETURNING espaco_id, tipo
+            """, espacos, page_size=1000, fetch=True)
+
+            espacos_por_tipo = {tipo: [] for tipo in ESPACOS_POR_TIPO}
+            for espaco_id, tipo in linhas:
+                espacos_por_tipo[tipo].append(espaco_id)
+
+            # --- RESERVAS ---
+            # Horários sequenciais por espaço (1 a 3 horas, com intervalo de 1 hora),
+            # para respeitar a constraint de conflito. Reservas de alunos ficam
+            # inativas, para não estourar o limite de 2 reservas ativas.
+            solicitantes = usuarios_por_tipo['professor'] + usuarios_por_tipo['gestor'] + usuarios_por_tipo['aluno']
+            reservas = []
+            fim_fixture = INICIO_FIXTURE
+            for espaco_id, tipo in linhas:
+                horario = INICIO_FIXTURE
+                for _ in range(RESERVAS_POR_ESPACO):
+                    duracao = timedelta(hours=aleatorio.randint(1, 3))
+                    solicitante = aleatorio.choice(solicitantes)
+                    if tipo == 'laboratorio' and solicitante in usuarios_por_tipo['aluno']:
+                        solicitante = aleatorio.choice(usuarios_por_tipo['professor'])
+
+                    if solicitante in usuarios_por_tipo['aluno']:
+                        status = aleatorio.choice(['cancelada', 'recusada'])
+                    else:
+                        status = aleatorio.choices(['confirmada', 'pendente', 'cancelada', 'recusada'], [6, 2, 1, 1])[0]
+
+                    reservas.append((espaco_id, solicitante, horario, horario + duracao,
+                                     'Reserva de benchmark', aleatorio.randint(1, 30), status))
+                    horario += duracao + timedelta(hours=1)
+                fim_fixture = max(fim_fixture, horario)
+
+            psycopg2.extras.execute_values(cursor, """
+                INSERT INTO Reservas (espaco_id, solicitante_id, data_hora_inicio, data_hora_fim,
+                                      finalidade, num_participantes, status)
+                VALUES %s
+            """, reservas, page_size=1000)
+
+            conn.commit()
+            cursor.execute("ANALYZE Usuarios; ANALYZE Espacos; ANALYZE Reservas;")
+            conn.commit()
+
+    _invalidar_caches()
+    return {
+        'usuarios': usuarios_por_tipo,
+        'emails': emails,
+        'senha': SENHA,
+        'espacos': espacos_por_tipo,
+        'periodo': (INICIO_FIXTURE, fim_fixture),
+        'total_reservas': len(reservas),
+    }
+
+
+def remover_fixture():
+    """Apaga tudo que foi criado pelo benchmark (inclusive reservas feitas durante a medição)."""
+    with db_connection() as conn:
+        if conn is None:
+            return
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                DELETE FROM Reservas
+                WHERE espaco_id IN (SELECT espaco_id FROM Espacos WHERE nome LIKE %(espaco)s)
+                   OR solicitante_id IN (SELECT usuario_id FROM Usuarios WHERE email LIKE %(email)s)
+                   OR aprovador_id IN (SELECT usuario_id FROM Usuarios WHERE email LIKE %(email)s)
+            """, {'espaco': PREFIXO_ESPACO + '%', 'email': '%' + DOMINIO_EMAIL})
+            cursor.execute("DELETE FROM Espacos WHERE nome LIKE %s", (PREFIXO_ESPACO + '%',))
+            cursor.execute("DELETE FROM Usuarios WHERE email LIKE %s", ('%' + DOMINIO_EMAIL,))
+            conn.commit()
+    _invalidar_caches()
+
+
+def _invalidar_caches():
+    catalogo_cache.invalidate('espacos', 'departamentos')
+    indice_disponibilidade.invalidar()
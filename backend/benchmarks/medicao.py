@@ -0,0 +1,92 @@
+# backend/benchmarks/medicao.py
+
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentil(valores_ordenados, p):
+    """Percentil pelo método do posto mais próximo (valores já ordenados)."""
+    if not valores_ordenados:
+        return 0.0
+    posicao = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[posicao]
+
+
+def medir(funcao, repeticoes, concorrencia, aquecimento=5):
+    """
+    Executa `funcao` `repeticoes` vezes, com `concorrencia` threads em paralelo,
+    e retorna vazão (chamadas/s) e latências em milissegundos.
+
+    A função deve retornar True quando a chamada deu certo; retornos falsos e
+    exceções entram na contagem de erros (e as latências delas também contam).
+    """
+    for _ in range(aquecimento):
+        funcao()
+
+    def chamada(_):
+        inicio = time.perf_counter()
+        try:
+            ok = bool(funcao())
+        except Exception:
+            ok = False
+        return time.perf_counter() - inicio, ok
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        resultados = list(executor.map(chamada, range(repeticoes)))
+    duracao = time.perf_counter() - inicio
+
+    latencias = sorted(latencia * 1000 for latencia, _ in resultados)
+    return {
+        'repeticoes': repeticoes,
+        'concorrencia': concorrencia,
+        'erros': sum(1 for _, ok in resultados if not ok),
+        'vazao': round(repeticoes / duracao, 2) if duracao else 0.0,
+        'media_ms': round(sum(latencias) / len(latencias), 3),
+        'p50_ms': round(percentil(latencias, 50), 3),
+        'p95_ms': round(percentil(latencias, 95), 3),
+        'p99_ms': round(percentil(latencias, 99), 3),
+    }
+
+
+def chave_resultado(nome, concorrencia):
+    return f'{nome} @{concorrencia}'
+
+
+def salvar_baseline(caminho, resultados, parametros):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'parametros': parametros,
+            'resultados': resultados,
+        }, arquivo, ensure_ascii=False, indent=2)
+
+
+def comparar_com_baseline(caminho, resultados, tolerancia):
+    """
+    Compara os resultados com um baseline salvo. Um cenário regrediu quando o
+    p95 ficou mais de `tolerancia` (ex: 0.2 = 20%) acima do baseline, a
+    vazão ficou mais de `tolerancia` abaixo dele, ou houve mais erros (chamadas
+    que falham rápido baixariam o p95 e pareceriam uma melhora).
+    Retorna a lista de linhas da comparação:
+    (chave, p95 antes, p95 agora, vazão antes, vazão agora, erros antes, erros agora, regrediu).
+    """
+    with open(caminho, encoding='utf-8') as arquivo:
+        baseline = json.load(arquivo)['resultados']
+
+    comparacao = []
+    for chave, atual in resultados.items():
+        anterior = baseline.get(chave)
+        if anterior is None:
+            continue
+        erros_antes = anterior.get('erros', 0)
+        regrediu = (
+            atual['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia)
+            or atual['vazao'] < anterior['vazao'] * (1 - tolerancia)
+            or atual['erros'] > erros_antes
+        )
+        comparacao.append((chave, anterior['p95_ms'], atual['p95_ms'], anterior['vazao'], atual['vazao'],
+                           erros_antes, atual['erros'], regrediu))
+    return comparacao
@@ -0,0 +1,233 @@
+# backend/benchmarks/planos.py
+"""
+Verificador de planos de execução das consultas do models.py.
+
+Cria a massa de dados do benchmark, chama as funções do models.py capturando
+cada SQL que elas executam e roda EXPLAIN em cada uma. Falha (código de saída 1)
+se alguma consulta ler sequencialmente uma tabela grande, o que costuma
+indicar um índice faltando (ver scripts/add_indices.sql). Uso, a partir da
+pasta backend:
+
+    python -m benchmarks.planos --escala 2
+
+A mesma verificação roda no pytest (tests/test_planos.py).
+"""
+
+import argparse
+import json
+import sys
+from datetime import timedelta
+
+from app import busca, models, preparadas
+from app.db import db_connection
+from app import metricas
+from app.metricas import METRICAS_SQL_ATIVAS
+from .fixture import PREFIXO_ESPACO, criar_fixture, remover_fixture
+
+COMANDOS_COM_PLANO = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+
+def _checagens(fixture, reserva_id):
+    """
+    Lista de (descrição, chamada, permite_varredura). permite_varredura marca
+    as consultas que leem a tabela toda por definição (listagens sem filtro).
+    """
+    professor = fixture['usuarios']['professor'][0]
+    gestor = {'sub': str(fixture['usuarios']['gestor'][0]), 'tipo': 'gestor'}
+    espaco = fixture['espacos']['sala_de_aula'][0]
+    inicio, fim = fixture['periodo']
+    semana = ((inicio + timedelta(days=30)).isoformat(), (inicio + timedelta(days=37)).isoformat())
+    janela = ((inicio + timedelta(days=30, hours=2)).isoformat(), (inicio + timedelta(days=30, hours=4)).isoformat())
+    email = fixture['emails'][professor]
+
+    # As funções que escrevem usam horários depois de toda a massa de dados
+    novo_inicio = fim + timedelta(days=7)
+    nova_reserva = {
+        'espaco_id': espaco, 'solicitante_id': professor, 'finalidade': 'Verificação de planos',
+        'num_participantes': 5, 'data_hora_inicio': novo_inicio.isoformat(),
+        'data_hora_fim': (novo_inicio + timedelta(hours=1)).isoformat(),
+    }
+    ocorrencias = [
+        {'data_hora_inicio': (novo_inicio + timedelta(days=d)).isoformat(),
+         'data_hora_fim': (novo_inicio + timedelta(days=d, hours=1)).isoformat()}
+        for d in (7, 14)
+    ]
+    criada = {}
+
+    def criar():
+        criada.update(models.create_reserva(nova_reserva))
+
+    def pagina_seguinte():
+        _, cursor = models.get_reservas_pagina({}, 50)
+        models.get_reservas_pagina({}, 50, cursor)
+
+    return [
+        ('get_all_espacos', models.get_all_espacos.sem_cache, True),
+        ('get_espaco_by_id', lambda: models.get_espaco_by_id.sem_cache(espaco), False),
+        ('get_reserva_by_id', lambda: models.get_reserva_by_id(reserva_id), False),
+        ('get_all_reservas (sem filtros)', lambda: models.get_all_reservas({}), True),
+        ('get_all_reservas[espaco_id]', lambda: models.get_all_reservas({'espaco_id': espaco}), False),
+        ('get_all_reservas[solicitante_id]', lambda: models.get_all_reservas({'solicitante_id': professor}), False),
+        ('get_all_reservas[inicio,fim]', lambda: models.get_all_reservas({'inicio': semana[0], 'fim': semana[1]}), False),
+        ('get_all_reservas[espaco_id,status,inicio,fim]', lambda: models.get_all_reservas(
+            {'espaco_id': espaco, 'status': 'pendente,confirmada', 'inicio': semana[0], 'fim': semana[1]}), False),
+        ('get_reservas_pagina[status=pendente]', lambda: models.get_reservas_pagina({'status': 'pendente'}, 50), False),
+        ('get_reservas_pagina (segunda página)', pagina_seguinte, False),
+        ('iter_reservas[espaco_id]', lambda: list(models.iter_reservas({'espaco_id': espaco})), False),
+        ('get_available_espacos', lambda: models.get_available_espacos({'inicio': janela[0], 'fim': janela[1]}), False),
+        ('authenticate_usuario', lambda: models.authenticate_usuario(email, fixture['senha']), False),
+        ('get_usuario_by_id', lambda: models.get_usuario_by_id(professor), False),
+        ('get_all_usuarios', models.get_all_usuarios, True),
+        ('buscar[gestor]', lambda: busca.buscar('profesor 1', busca.ENTIDADES_BUSCA, gestor), False),
+        ('buscar[reservas do professor]', lambda: busca.buscar(
+            'verificacao', ('reservas',), {'sub': str(professor), 'tipo': 'professor'}), False),
+        ('create_reserva', criar, False),
+        ('update_reserva_status', lambda: models.update_reserva_status(criada['reserva_id'], 'cancelada', professor), False),
+        ('delete_reserva', lambda: models.delete_reserva(criada['reserva_id'], {'sub': str(professor), 'tipo': 'professor'}), False),
+        ('create_reservas_lote', lambda: models.create_reservas_lote(dict(nova_reserva), ocorrencias), False),
+    ]
+
+
+def _tabelas_grandes(linhas_minimas):
+    """
+    Tabelas com pelo menos `linhas_minimas` linhas. Uma tabela particionada
+    conta pelo total das partições, e cada partição dela também entra na
+    lista: um Seq Scan em várias partições médias (ex: os meses de Reservas)
+    ainda é uma leitura da tabela inteira.
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                WITH tabelas AS (
+                    SELECT c.oid, lower(c.relname) AS nome, c.relkind, GREATEST(c.reltuples, 0) AS linhas,
+                           COALESCE(pg_partition_root(c.oid), c.oid) AS raiz
+                    FROM pg_class c
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE c.relkind IN ('r', 'p')
+                      AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+                )
+                SELECT t.nome FROM tabelas t
+                JOIN (SELECT raiz, SUM(linhas) AS total FROM tabelas GROUP BY raiz) r ON r.raiz = t.raiz
+                WHERE r.total >= %s
+            """, (linhas_minimas,))
+            return {linha[0] for linha in cursor.fetchall()}
+
+
+def _capturar(chamada):
+    """
+    Executa a chamada e devolve as SQLs (já com os parâmetros) que ela mandou
+    ao banco. O execute dos cursores instrumentados é trocado só durante a
+    chamada, para que a captura não pese nos cursores em produção.
+    """
+    capturadas = []
+    execute_original = metricas._CursorInstrumentado.execute
+
+    def execute(cursor, query, vars=None):
+        sql = cursor.mogrify(query, vars) if vars is not None else query
+        sql = sql.decode() if isinstance(sql, bytes) else str(sql)
+        if sql.lstrip().upper().startswith(COMANDOS_COM_PLANO):
+            capturadas.append((metricas.funcao_atual(), sql))
+        return execute_original(cursor, query, vars)
+
+    metricas._CursorInstrumentado.execute = execute
+    try:
+        chamada()
+    finally:
+        metricas._CursorInstrumentado.execute = execute_original
+    return capturadas
+
+
+def _varreduras(plano, tabelas_grandes):
+    """Nós 'Seq Scan' em tabelas grandes, percorrendo o plano inteiro (inclusive subplanos)."""
+    encontradas = []
+    if plano.get('Node Type') == 'Seq Scan' and plano.get('Relation Name', '').lower() in tabelas_grandes:
+        encontradas.append(plano['Relation Name'])
+    for filho in plano.get('Plans', []):
+        encontradas.extend(_varreduras(filho, tabelas_grandes))
+    return encontradas
+
+
+def _explicar(sql):
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            # Só EXPLAIN, sem ANALYZE: INSERT/UPDATE/DELETE não são executados
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql.strip().rstrip(';'))
+            plano = cursor.fetchone()[0]
+        conn.rollback()
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return plano[0]['Plan']
+
+
+def verificar_planos(fixture, linhas_minimas):
+    """
+    Roda EXPLAIN em cada SQL executada pelas checagens. Retorna a lista de
+    (descrição, função, sql, tabelas lidas por Seq Scan, varredura permitida).
+    Precisa da massa de dados já criada (criar_fixture).
+    """
+    if not METRICAS_SQL_ATIVAS:
+        raise RuntimeError("O verificador precisa dos cursores instrumentados: rode sem METRICAS_SQL=0.")
+
+    # Com prepared statements a SQL capturada seria só 'EXECUTE prep_...';
+    # aqui queremos o plano da consulta com os valores reais
+    preparar_antes = preparadas.PREPARAR_ATIVO
+    preparadas.PREPARAR_ATIVO = False
+    try:
+        tabelas_grandes = _tabelas_grandes(linhas_minimas)
+
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT r.reserva_id FROM Reservas r JOIN Espacos e ON e.espaco_id = r.espaco_id
+                    WHERE e.nome LIKE %s LIMIT 1
+                """, (PREFIXO_ESPACO + '%',))
+                reserva_id = cursor.fetchone()[0]
+
+        resultados = []
+        for descricao, chamada, permite_varredura in _checagens(fixture, reserva_id):
+            for funcao, sql in _capturar(chamada):
+                varreduras = _varreduras(_explicar(sql), tabelas_grandes)
+                resultados.append((descricao, funcao, sql, varreduras, permite_varredura))
+        return resultados
+    finally:
+        preparadas.PREPARAR_ATIVO = preparar_antes
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.planos',
+                                     description='Verifica os planos de execução das consultas do models.py.')
+    parser.add_argument('--escala', type=int, default=2, help='Multiplicador da massa de dados.')
+    parser.add_argument('--linhas-minimas', type=int, default=5000,
+                        help='Tabelas com pelo menos este número de linhas contam como grandes.')
+    parser.add_argument('--mostrar-sql', action='store_true', help='Mostra a SQL das consultas com problema.')
+    parser.add_argument('--manter-dados', action='store_true', help='Não apaga a massa de dados no final.')
+    args = parser.parse_args()
+
+    if not METRICAS_SQL_ATIVAS:
+        sys.exit("O verificador precisa dos cursores instrumentados: rode sem METRICAS_SQL=0.")
+
+    print(f"Criando massa de dados (escala {args.escala})...")
+    fixture = criar_fixture(args.escala)
+    falhas = 0
+    try:
+        for descricao, funcao, sql, varreduras, permite_varredura in verificar_planos(fixture, args.linhas_minimas):
+            if varreduras and not permite_varredura:
+                falhas += 1
+                print(f"FALHA {descricao} ({funcao}): Seq Scan em {', '.join(varreduras)}")
+                if args.mostrar_sql:
+                    print(f"      {' '.join(sql.split())}")
+            else:
+                observacao = ' (varredura permitida)' if varreduras else ''
+                print(f"ok    {descricao} ({funcao}){observacao}")
+    finally:
+        if not args.manter_dados:
+            remover_fixture()
+
+    if falhas:
+        print(f"\n{falhas} consulta(s) lendo tabelas grandes inteiras.")
+        sys.exit(1)
+    print("\nNenhuma consulta lendo tabelas grandes inteiras.")
+
+
+if __name__ == '__main__':
+    main()
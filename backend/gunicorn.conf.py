@@ -0,0 +1,70 @@
+# backend/gunicorn.conf.py
+#
+# Configuração do gunicorn para produção. Uso (dentro da pasta backend):
+#
+#     gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Sinais para o processo principal (master):
+#   HUP         recarrega a configuração e troca os workers aos poucos
+#   TERM        desligamento gracioso (espera as requisições em andamento)
+#   USR2 + QUIT sobe um novo master com o código atualizado e encerra o antigo
+#               (como a aplicação é pré-carregada, o HUP não relê o código)
+
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+# Lê o .env antes dos padrões abaixo: sem isso o DB_POOL_MAX (e o
+# GUNICORN_THREADS) do .env perderiam para o valor calculado aqui, já que
+# app/db.py só carrega o .env depois, e o load_dotenv não sobrescreve
+load_dotenv(encoding='utf-8')
+
+# --- PROCESSOS E THREADS ---
+# Um processo por núcleo por padrão. Cada worker atende várias requisições
+# ao mesmo tempo com threads (gthread): enquanto uma espera o banco, outra roda.
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+
+# Cada worker tem o seu pool de conexões: por padrão, uma conexão por thread.
+# Lembre que o total (workers x DB_POOL_MAX) não pode passar do max_connections do PostgreSQL.
+os.environ.setdefault('DB_POOL_MAX', str(threads))
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Carrega create_app() uma vez no master; os workers nascem por fork já com
+# a aplicação importada (sobe mais rápido e compartilha memória)
+preload_app = True
+
+# --- TEMPOS ---
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+# Recicla os workers de tempos em tempos (com variação, para não reciclar todos juntos)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+
+# --- HOOKS ---
+
+def post_fork(server, worker):
+    """Cada worker abre os seus próprios recursos de banco depois do fork."""
+    from app.cache import catalogo_cache
+    from app.db import descartar_pool_herdado
+    from app.disponibilidade import indice_disponibilidade
+
+    descartar_pool_herdado()
+    catalogo_cache.clear()
+    indice_disponibilidade.invalidar()
+    server.log.info("Worker %s pronto (pid %s)", worker.age, worker.pid)
+
+
+def worker_exit(server, worker):
+    """Fecha as conexões do worker ao sair (desligamento, reload ou reciclagem)."""
+    from app.db import fechar_pool
+    fechar_pool()
@@ -0,0 +1,22 @@
+# backend/tests/conftest.py
+
+import os
+
+import pytest
+
+from app.db import get_db_connection
+
+# Os testes que usam o banco rodam contra o PostgreSQL configurado no .env
+# (DB_HOST, DB_DATABASE...), com todos os scripts de scripts/ aplicados.
+# Use um banco de testes: a massa de dados é criada e apagada pelos testes.
+
+
+@pytest.fixture(scope='session')
+def banco():
+    """Pula o teste se não houver banco de testes configurado e acessível."""
+    if not os.getenv('DB_DATABASE'):
+        pytest.skip('Banco de testes não configurado (DB_DATABASE).')
+    conn = get_db_connection()
+    if conn is None:
+        pytest.skip('Banco de testes inacessível.')
+    conn.close()
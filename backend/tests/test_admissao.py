@@ -0,0 +1,143 @@
+# backend/tests/test_admissao.py
+
+import pytest
+from flask import Flask, request
+
+from app import admissao
+from app.admissao import BaldeFichas, ClasseAdmissao, controle_admissao, registrar_admissao
+
+# Testes sem banco: o relógio (time.monotonic) é trocado por um relógio
+# controlado pelo teste e as rotas são de uma aplicação Flask mínima.
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """Relógio falso; avance com relogio['agora'] += segundos."""
+    estado = {'agora': 1000.0}
+    monkeypatch.setattr(admissao.time, 'monotonic', lambda: estado['agora'])
+    return estado
+
+
+# --- BaldeFichas ---
+
+def test_balde_comeca_cheio_e_informa_a_espera(relogio):
+    balde = BaldeFichas(2, 0.5)
+
+    assert balde.retirar('a') == 0
+    assert balde.retirar('a') == 0
+    assert balde.retirar('a') == pytest.approx(2.0)
+
+    relogio['agora'] += 1.5
+    assert balde.retirar('a') == pytest.approx(0.5)
+    assert balde.retirar('b') == 0
+
+
+def test_balde_reabastece_ate_a_capacidade(relogio):
+    balde = BaldeFichas(2, 0.5)
+    balde.retirar('a')
+    balde.retirar('a')
+
+    relogio['agora'] += 2
+    assert balde.retirar('a') == 0
+    assert balde.retirar('a') == pytest.approx(2.0)
+
+    relogio['agora'] += 3600
+    assert [balde.retirar('a') for _ in range(3)] == [0, 0, pytest.approx(2.0)]
+
+
+def test_devolver_nao_passa_da_capacidade(relogio):
+    balde = BaldeFichas(1, 0.1)
+    balde.devolver('a')
+    assert balde.retirar('a') == 0
+    assert balde.retirar('a') > 0
+
+    balde.devolver('a')
+    assert balde.retirar('a') == 0
+
+
+def test_balde_descarta_a_chave_usada_ha_mais_tempo(relogio):
+    balde = BaldeFichas(1, 0.1, max_chaves=2)
+    balde.retirar('a')
+    balde.retirar('b')
+    balde.retirar('c')
+
+    assert balde.total_chaves() == 2
+    assert balde.retirar('a') == 0  # voltou cheia
+    assert balde.retirar('c') > 0
+
+
+# --- ClasseAdmissao ---
+
+def test_classe_limita_as_simultaneas():
+    classe = ClasseAdmissao('teste', 2, (1, 1), (1, 1))
+
+    assert classe.ocupar() and classe.ocupar()
+    assert not classe.ocupar()
+    classe.liberar()
+    assert classe.ocupar()
+    assert classe.em_andamento == 2
+
+
+# --- controle_admissao ---
+
+@pytest.fixture
+def login(monkeypatch, relogio):
+    """login(status, endereco): chama uma rota de login com controle de admissão que responde `status`."""
+    classe = ClasseAdmissao('teste', 1, (100, 1), (2, 0.01))
+    monkeypatch.setitem(admissao.CLASSES_ADMISSAO, 'teste', classe)
+    monkeypatch.setattr(admissao, 'ADMISSAO_ATIVA', True)
+    app = Flask(__name__)
+    registrar_admissao(app)
+    respostas = []
+
+    @app.route('/login', methods=['POST'])
+    @controle_admissao('teste', usuario=lambda: request.get_json()['email'], so_falhas=True)
+    def rota():
+        return '', respostas.pop(0)
+
+    cliente = app.test_client()
+
+    def entrar(status, endereco='10.0.0.1'):
+        respostas[:] = [status]  # recusada pela admissão, a rota nem consome o status
+        return cliente.post('/login', json={'email': 'a@x.com'},
+                            environ_base={'REMOTE_ADDR': endereco})
+
+    entrar.classe = classe
+    return entrar
+
+
+def test_so_as_falhas_gastam_ficha(login):
+    # De outro endereço, para não cair na isenção dos clientes conhecidos
+    assert [login(200).status_code for _ in range(5)] == [200] * 5
+    assert [login(401, '10.0.0.2').status_code for _ in range(2)] == [401, 401]
+
+    resposta = login(401, '10.0.0.2')
+    assert resposta.status_code == 429
+    assert resposta.get_json()['motivo'] == 'limite_usuario'
+    assert resposta.headers['Retry-After'] == '100'
+
+
+def test_ficha_e_retirada_antes_da_rota(login):
+    # Enquanto a rota roda, a ficha já saiu do balde: pedidos simultâneos não passam pela mesma
+    balde = login.classe.por_usuario
+    assert login(401).status_code == 401
+    fichas_antes = balde._baldes['a@x.com'][0]
+
+    login.classe.em_andamento = 1  # classe lotada: a ficha retirada é devolvida
+    assert login(401).status_code == 503
+    assert balde._baldes['a@x.com'][0] == fichas_antes
+    assert login.classe.em_andamento == 1
+
+
+def test_cliente_conhecido_nao_e_bloqueado_por_falhas_de_outros(login):
+    assert login(200, '10.0.0.1').status_code == 200
+    assert [login(401, '10.0.0.2').status_code for _ in range(3)] == [401, 401, 429]
+
+    assert login(200, '10.0.0.1').status_code == 200
+    assert login(200, '10.0.0.3').status_code == 429
+
+
+def test_vaga_e_devolvida_no_fim_da_requisicao(login):
+    login(200)
+    login(401)
+    assert login.classe.em_andamento == 0
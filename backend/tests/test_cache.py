@@ -0,0 +1,113 @@
+# backend/tests/test_cache.py
+
+import pytest
+
+from app import cache as modulo_cache
+from app.cache import TTLCache, cached
+
+# Testes sem banco: o relógio do cache (time.monotonic) é trocado por um
+# relógio controlado pelo teste.
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """Relógio falso; avance com relogio['agora'] += segundos."""
+    estado = {'agora': 1000.0}
+    monkeypatch.setattr(modulo_cache.time, 'monotonic', lambda: estado['agora'])
+    return estado
+
+
+def test_entrada_expira_depois_do_ttl(relogio):
+    cache = TTLCache(ttl=10)
+    cache.set(('espacos', 1), 'sala')
+
+    relogio['agora'] += 9.9
+    assert cache.get(('espacos', 1)) == (True, 'sala')
+
+    relogio['agora'] += 0.1
+    assert cache.get(('espacos', 1)) == (False, None)
+    assert cache.metricas() == {'entradas': 0, 'acertos': 1, 'falhas': 1}
+
+
+def test_descarta_a_entrada_usada_ha_mais_tempo(relogio):
+    cache = TTLCache(tamanho_maximo=2)
+    cache.set(('espacos', 1), 'a')
+    cache.set(('espacos', 2), 'b')
+    cache.get(('espacos', 1))
+    cache.set(('espacos', 3), 'c')
+
+    assert cache.get(('espacos', 2)) == (False, None)
+    assert cache.get(('espacos', 1)) == (True, 'a')
+
+
+def test_set_com_geracao_antiga_nao_grava(relogio):
+    cache = TTLCache()
+    geracao = cache.geracao('espacos')
+    cache.invalidate('espacos')
+
+    cache.set(('espacos', 1), 'lido antes da mudança', geracao)
+    assert cache.get(('espacos', 1)) == (False, None)
+
+    cache.set(('espacos', 1), 'lido depois', cache.geracao('espacos'))
+    assert cache.get(('espacos', 1)) == (True, 'lido depois')
+
+
+def test_invalidate_so_afeta_o_namespace_informado(relogio):
+    cache = TTLCache()
+    cache.set(('espacos', 1), 'sala')
+    cache.set(('departamentos', 1), 'dep')
+    geracao_departamentos = cache.geracao('departamentos')
+
+    cache.invalidate('espacos')
+
+    assert cache.get(('espacos', 1)) == (False, None)
+    assert cache.get(('departamentos', 1)) == (True, 'dep')
+    assert cache.geracao('departamentos') == geracao_departamentos
+    assert cache.last_modified('espacos') >= cache.last_modified('departamentos')
+
+
+def test_cached_guarda_e_reusa_o_resultado(relogio):
+    cache = TTLCache(ttl=10)
+    chamadas = []
+
+    @cached('espacos', cache=cache)
+    def buscar(espaco_id):
+        chamadas.append(espaco_id)
+        return {'id': espaco_id}
+
+    assert buscar(1) == {'id': 1}
+    assert buscar(1) == {'id': 1}
+    assert chamadas == [1]
+
+    relogio['agora'] += 10
+    buscar(1)
+    assert chamadas == [1, 1]
+    assert buscar.sem_cache(1) == {'id': 1}
+
+
+def test_cached_nao_guarda_resultado_vazio(relogio):
+    cache = TTLCache()
+    chamadas = []
+
+    @cached('espacos', cache=cache)
+    def listar():
+        chamadas.append(1)
+        return []
+
+    listar()
+    listar()
+    assert len(chamadas) == 2
+
+
+def test_cached_descarta_leitura_que_cruzou_uma_invalidacao(relogio):
+    # A invalidação chega enquanto a função ainda lê do banco: o valor lido
+    # pode ser anterior à mudança e não pode ficar no cache
+    cache = TTLCache()
+
+    @cached('espacos', cache=cache)
+    def listar():
+        cache.invalidate('espacos')
+        return ['valor antigo']
+
+    assert listar() == ['valor antigo']
+    assert cache.get(('espacos',)) == (False, None)
@@ -0,0 +1,145 @@
+# backend/tests/test_disponibilidade.py
+
+from datetime import datetime, timedelta, timezone
+
+from app.disponibilidade import IndiceDisponibilidade, _IntervalosEspaco
+
+# Testes sem banco: a leitura do índice (_ler) é trocada por uma função que
+# devolve um retrato fixo e, quando preciso, simula escritas chegando durante
+# a carga.
+BASE = datetime(2030, 3, 4, tzinfo=timezone.utc)
+
+
+def h(horas):
+    return BASE + timedelta(hours=horas)
+
+
+def _reserva(reserva_id, espaco_id, inicio, fim, status='confirmada'):
+    return {'reserva_id': reserva_id, 'espaco_id': espaco_id, 'status': status,
+            'data_hora_inicio': h(inicio), 'data_hora_fim': h(fim)}
+
+
+def _intervalos(*reservas):
+    intervalos = _IntervalosEspaco()
+    for reserva_id, inicio, fim in reservas:
+        intervalos.adicionar(h(inicio), h(fim), reserva_id)
+    return intervalos
+
+
+def _indice(linhas, durante_a_leitura=None):
+    """Índice cuja carga devolve `linhas` e roda `durante_a_leitura(indice)` no meio dela."""
+    indice = IndiceDisponibilidade()
+    leituras = []
+
+    def ler():
+        leituras.append(1)
+        if durante_a_leitura is not None and len(leituras) == 1:
+            durante_a_leitura(indice)
+        return BASE, [dict(linha) for linha in linhas]
+
+    indice._ler = ler
+    indice.leituras = leituras
+    return indice
+
+
+# --- _IntervalosEspaco ---
+
+def test_ocupado_considera_intervalos_semiabertos():
+    intervalos = _intervalos((1, 8, 10))
+
+    assert intervalos.ocupado(h(9), h(11))
+    assert intervalos.ocupado(h(7), h(9))
+    assert not intervalos.ocupado(h(10), h(12))
+    assert not intervalos.ocupado(h(6), h(8))
+
+
+def test_ocupado_enxerga_reserva_longa_escondida_atras_de_curtas():
+    # A reserva 1 começa primeiro e termina por último: só o máximo acumulado dos fins a encontra
+    intervalos = _intervalos((2, 9, 10), (1, 8, 18), (3, 11, 12))
+
+    assert intervalos.fim_maximo == [h(18), h(18), h(18)]
+    assert intervalos.ocupado(h(14), h(15))
+    assert not intervalos.ocupado(h(18), h(19))
+
+
+def test_ocupado_com_sobreposicoes_no_mesmo_inicio():
+    intervalos = _intervalos((1, 8, 9), (2, 8, 12))
+
+    assert [reserva_id for _, reserva_id in intervalos.chaves] == [1, 2]
+    assert intervalos.ocupado(h(11), h(13))
+
+
+def test_remover_recalcula_o_fim_maximo():
+    intervalos = _intervalos((1, 8, 18), (2, 9, 10), (3, 11, 12))
+
+    intervalos.remover(h(8), 1)
+
+    assert intervalos.fim_maximo == [h(10), h(12)]
+    assert not intervalos.ocupado(h(14), h(15))
+    assert intervalos.ocupado(h(11), h(13))
+
+
+def test_remover_reserva_ausente_nao_muda_nada():
+    intervalos = _intervalos((1, 8, 10))
+
+    intervalos.remover(h(8), 99)
+    intervalos.remover(h(9), 1)
+
+    assert intervalos.chaves == [(h(8), 1)]
+    assert intervalos.fim_maximo == [h(10)]
+
+
+# --- IndiceDisponibilidade ---
+
+def test_carga_responde_pelo_retrato_lido():
+    indice = _indice([_reserva(1, 10, 8, 10), _reserva(2, 20, 9, 11)])
+
+    assert indice.espacos_livres([10, 20, 30], [(h(9), h(10)), (h(10), h(11))]) == [[30], [10, 30]]
+
+
+def test_escritas_durante_a_carga_sao_reaplicadas_sobre_o_retrato():
+    def escritas(indice):
+        indice.adicionar(_reserva(3, 30, 8, 10))  # criada depois da leitura: fora do retrato
+        indice.remover(1)                         # cancelada depois da leitura
+        indice.adicionar(_reserva(2, 20, 9, 11))  # já está no retrato
+
+    indice = _indice([_reserva(1, 10, 8, 10), _reserva(2, 20, 9, 11)], escritas)
+
+    assert indice.espacos_livres([10, 20, 30], [(h(9), h(10))]) == [[10]]
+    assert indice._pendentes is None
+    assert sorted(indice._reservas) == [2, 3]
+
+
+def test_escritas_antes_da_carga_sao_ignoradas():
+    indice = _indice([_reserva(1, 10, 8, 10)])
+
+    indice.adicionar(_reserva(2, 20, 8, 10))
+
+    assert indice.espacos_livres([10, 20], [(h(9), h(10))]) == [[20]]
+
+
+def test_invalidacao_durante_a_carga_le_de_novo():
+    indice = _indice([_reserva(1, 10, 8, 10)], lambda indice: indice.invalidar())
+
+    assert indice.espacos_livres([10], [(h(9), h(10))]) == [[]]
+    assert len(indice.leituras) == 2
+
+
+def test_atualizar_status_adiciona_e_remove():
+    indice = _indice([_reserva(1, 10, 8, 10)])
+    indice.espacos_livres([10], [(h(9), h(10))])
+
+    indice.atualizar_status(_reserva(1, 10, 8, 10, status='cancelada'))
+    assert indice.espacos_livres([10], [(h(9), h(10))]) == [[10]]
+
+    indice.atualizar_status(_reserva(1, 10, 8, 10, status='pendente'))
+    assert indice.espacos_livres([10], [(h(9), h(10))]) == [[]]
+
+
+def test_falha_na_leitura_nao_deixa_escritas_pendentes():
+    indice = IndiceDisponibilidade()
+    indice._ler = lambda: None
+
+    assert indice.espacos_livres([10], [(h(9), h(10))]) is None
+    assert indice._pendentes is None
+    assert not indice._carregado
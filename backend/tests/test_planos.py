@@ -0,0 +1,30 @@
+# backend/tests/test_planos.py
+
+import pytest
+
+from benchmarks.fixture import criar_fixture, remover_fixture
+from benchmarks.planos import verificar_planos
+
+# Mesmo critério do python -m benchmarks.planos: consultas do models.py que
+# leem uma tabela grande inteira (Seq Scan) indicam um índice faltando.
+ESCALA = 2
+LINHAS_MINIMAS = 5000
+
+
+@pytest.fixture(scope='module')
+def massa_de_dados(banco):
+    fixture = criar_fixture(ESCALA)
+    yield fixture
+    remover_fixture()
+
+
+def test_consultas_nao_leem_tabelas_grandes_inteiras(massa_de_dados):
+    resultados = verificar_planos(massa_de_dados, LINHAS_MINIMAS)
+    assert resultados, 'Nenhuma SQL capturada: os cursores instrumentados estão ativos?'
+
+    falhas = [
+        f"{descricao} ({funcao}): Seq Scan em {', '.join(varreduras)}\n    {' '.join(sql.split())}"
+        for descricao, funcao, sql, varreduras, permite_varredura in resultados
+        if varreduras and not permite_varredura
+    ]
+    assert not falhas, 'Consultas lendo tabelas grandes inteiras:\n' + '\n'.join(falhas)
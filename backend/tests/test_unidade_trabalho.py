@@ -0,0 +1,157 @@
+# backend/tests/test_unidade_trabalho.py
+
+import psycopg2
+import pytest
+
+from app import create_app
+from app.db import db_connection, get_db_connection
+
+# Blocos db_connection() dentro de uma requisição dividem uma transação,
+# confirmada no after_request (ver UnidadeTrabalho em app/db.py). Cada teste
+# simula uma requisição com vários blocos e confere, por outra conexão, o que
+# de fato foi gravado.
+TABELA = 'teste_unidade_trabalho'
+
+
+def _executar_fora(sql):
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+            resultado = cursor.fetchall() if cursor.description else None
+        conn.commit()
+        return resultado
+    finally:
+        conn.close()
+
+
+def _gravados():
+    return [linha[0] for linha in _executar_fora(f"SELECT id FROM {TABELA} ORDER BY id;")]
+
+
+@pytest.fixture(scope='module')
+def app(banco):
+    _executar_fora(f"CREATE TABLE IF NOT EXISTS {TABELA} (id INT PRIMARY KEY);")
+    yield create_app()
+    _executar_fora(f"DROP TABLE IF EXISTS {TABELA};")
+
+
+@pytest.fixture
+def requisicao(app):
+    """Contexto de uma requisição; chame o valor devolvido com o status da resposta para encerrá-la."""
+    _executar_fora(f"TRUNCATE {TABELA};")
+    contexto = app.test_request_context()
+    contexto.push()
+
+    def responder(status=200):
+        return app.process_response(app.response_class(status=status))
+
+    yield responder
+    contexto.pop()
+
+
+def _inserir(conn, valor):
+    with conn.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABELA} (id) VALUES (%s);", (valor,))
+
+
+def test_commit_dos_blocos_so_vale_no_fim_da_requisicao(requisicao):
+    with db_connection() as conn:
+        _inserir(conn, 1)
+        conn.commit()
+    with db_connection() as conn:
+        _inserir(conn, 2)
+        conn.commit()
+    assert _gravados() == []
+
+    assert requisicao().status_code == 200
+    assert _gravados() == [1, 2]
+
+
+def test_rollback_desfaz_so_o_bloco_atual(requisicao):
+    with db_connection() as conn:
+        _inserir(conn, 1)
+        conn.commit()
+    with db_connection() as conn:
+        _inserir(conn, 2)
+        conn.rollback()
+    with db_connection() as conn:
+        _inserir(conn, 3)
+        conn.commit()
+
+    requisicao()
+    assert _gravados() == [1, 3]
+
+
+def test_bloco_sem_commit_nem_rollback_e_desfeito(requisicao):
+    # Sem nada confirmado antes: o bloco não tem savepoint
+    with db_connection() as conn:
+        _inserir(conn, 1)
+    with db_connection() as conn:
+        _inserir(conn, 2)
+        conn.commit()
+    # Depois de escritas confirmadas: volta ao savepoint do bloco
+    with db_connection() as conn:
+        _inserir(conn, 3)
+    with db_connection() as conn:
+        _inserir(conn, 4)
+        conn.commit()
+
+    requisicao()
+    assert _gravados() == [2, 4]
+
+
+def test_comando_com_erro_sem_rollback_nao_estraga_a_requisicao(requisicao):
+    with db_connection() as conn:
+        _inserir(conn, 1)
+        conn.commit()
+    with db_connection() as conn:
+        try:
+            _inserir(conn, 1)  # chave duplicada
+        except psycopg2.IntegrityError:
+            pass
+    with db_connection() as conn:
+        _inserir(conn, 2)
+        conn.commit()
+
+    requisicao()
+    assert _gravados() == [1, 2]
+
+
+def test_savepoint_e_liberado_no_commit_do_bloco(requisicao):
+    with db_connection() as conn:
+        _inserir(conn, 1)
+        conn.commit()
+    with db_connection() as conn:
+        _inserir(conn, 2)
+        conn.commit()
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SAVEPOINT verificacao;")
+            with pytest.raises(psycopg2.errors.InvalidSavepointSpecification):
+                cursor.execute("RELEASE SAVEPOINT unidade_1;")
+            cursor.execute("ROLLBACK TO SAVEPOINT verificacao;")
+        conn.commit()
+
+    requisicao()
+    assert _gravados() == [1, 2]
+
+
+def test_resposta_5xx_desfaz_a_requisicao_inteira(requisicao):
+    with db_connection() as conn:
+        _inserir(conn, 1)
+        conn.commit()
+
+    requisicao(500)
+    assert _gravados() == []
+
+
+def test_rollback_depois_do_commit_do_proprio_bloco_falha_a_requisicao(requisicao):
+    with db_connection() as conn:
+        _inserir(conn, 1)
+        conn.commit()
+        _inserir(conn, 2)
+        conn.rollback()
+
+    assert requisicao().status_code == 500
+    assert _gravados() == []
@@ -0,0 +1,7 @@
+# backend/wsgi.py
+
+# Ponto de entrada para servidores WSGI de produção (gunicorn).
+# Uso (dentro da pasta backend): gunicorn -c gunicorn.conf.py wsgi:app
+from app import create_app
+
+app = create_app()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useContext } from "react";
+import React, { useState, useEffect, useContext, useRef } from "react";
 import { AuthContext } from "../context/AuthContext";
 import {
   Typography,
@@ -54,9 +54,11 @@ function ReservasPage() {
 
   const [horariosOcupados, setHorariosOcupados] = useState([]);
 
-  const fetchReservas = () => {
-    setLoading(true);
-    setError(null);
+  // true enquanto o stream de mudanças está conectado; sem ele, a lista é
+  // buscada de novo depois de cada ação
+  const streamAtivo = useRef(false);
+
+  const montarParams = () => {
     const params = new URLSearchParams();
     if (filtros.solicitante_id)
       params.append("solicitante_id", filtros.solicitante_id);
@@ -66,6 +68,13 @@ function ReservasPage() {
     if (user && user.tipo !== "gestor") {
       params.set("solicitante_id", user.usuario_id);
     }
+    return params;
+  };
+
+  const fetchReservas = () => {
+    setLoading(true);
+    setError(null);
+    const params = montarParams();
 
     fetch(`http://localhost:5000/api/reservas?${params.toString()}`, {
       headers: { "x-access-token": token },
@@ -109,6 +118,82 @@ function ReservasPage() {
     }
   }, [token, user, filtros]);
 
+  // Recebe as mudanças nas reservas (de qualquer usuário) e aplica na lista
+  useEffect(() => {
+    if (!token || !user) return;
+
+    let fonte = null;
+    let espera = null;
+    let encerrado = false;
+    let conexoes = 0;
+
+    const porInicio = (a, b) =>
+      new Date(b.data_hora_inicio) - new Date(a.data_hora_inicio);
+    const aplicar = (e) => {
+      const reserva = JSON.parse(e.data);
+      setReservas((atuais) =>
+        [
+          reserva,
+          ...atuais.filter((r) => r.reserva_id !== reserva.reserva_id),
+        ].sort(porInicio)
+      );
+    };
+
+    // O token não vai na URL: cada conexão usa um ticket de curta duração,
+    // então a reconexão também é feita aqui (o ticket antigo já expirou)
+    const conectar = async () => {
+      try {
+        const resposta = await fetch(
+          "http://localhost:5000/api/reservas/stream/ticket",
+          { method: "POST", headers: { "x-access-token": token } }
+        );
+        if (!resposta.ok) throw new Error("ticket");
+        const { ticket } = await resposta.json();
+        if (encerrado) return;
+
+        const params = montarParams();
+        params.set("ticket", ticket);
+        fonte = new EventSource(
+          `http://localhost:5000/api/reservas/stream?${params.toString()}`
+        );
+      } catch (err) {
+        reconectar();
+        return;
+      }
+
+      fonte.onopen = () => {
+        streamAtivo.current = true;
+        // Numa reconexão, mudanças podem ter se perdido: busca a lista uma vez
+        if (conexoes++ > 0) fetchReservas();
+      };
+      fonte.onerror = () => {
+        streamAtivo.current = false;
+        fonte.close();
+        reconectar();
+      };
+      fonte.addEventListener("insert", aplicar);
+      fonte.addEventListener("update", aplicar);
+      fonte.addEventListener("delete", (e) => {
+        const { reserva_id } = JSON.parse(e.data);
+        setReservas((atuais) =>
+          atuais.filter((r) => r.reserva_id !== reserva_id)
+        );
+      });
+    };
+    const reconectar = () => {
+      if (!encerrado) espera = setTimeout(conectar, 3000);
+    };
+
+    conectar();
+
+    return () => {
+      encerrado = true;
+      streamAtivo.current = false;
+      clearTimeout(espera);
+      if (fonte) fonte.close();
+    };
+  }, [token, user, filtros]);
+
   const handleOpenCreateModal = () => {
     setFormData({
       espaco_id: null,
@@ -165,7 +250,7 @@ function ReservasPage() {
       )
       .then(() => {
         handleCloseCreateModal();
-        fetchReservas();
+        if (!streamAtivo.current) fetchReservas();
       })
       .catch((err) => {
         setError(err.message);
@@ -181,7 +266,7 @@ function ReservasPage() {
     })
       .then((res) => {
         if (!res.ok) throw new Error("Falha ao atualizar status da reserva.");
-        fetchReservas();
+        if (!streamAtivo.current) fetchReservas();
       })
       .catch((err) => setError(err.message));
   };
@@ -199,7 +284,8 @@ function ReservasPage() {
           res.json().then((data) => {
             if (!res.ok)
               throw new Error(data.erro || "Falha ao cancelar reserva.");
-            fetchReservas(); // Atualiza a lista após o cancelamento
+            // Atualiza a lista após o cancelamento (com o stream, ela já chega por ele)
+            if (!streamAtivo.current) fetchReservas();
           })
         )
         .catch((err) => {
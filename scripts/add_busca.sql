@@ -0,0 +1,54 @@
+-- ====================================================================
+-- BUSCA POR TEXTO (GET /api/busca)
+-- ====================================================================
+-- Índices de trigramas (pg_trgm) para a busca por nome de espaços,
+-- departamentos e usuários (nome e e-mail) e pela finalidade das reservas.
+-- O GIN com gin_trgm_ops atende tanto o LIKE '%texto%' (prefixo ou trecho)
+-- quanto a busca aproximada por palavra (operador <%), sem ler a tabela toda.
+--
+-- A busca ignora maiúsculas e acentos: a coluna e o termo passam pela mesma
+-- função busca_normalizar. O unaccent da extensão não é IMMUTABLE (depende
+-- do dicionário configurado), por isso a função fixa o dicionário e pode
+-- ser usada em índice.
+--
+-- Como em add_indices.sql, os CONCURRENTLY não podem rodar dentro de uma
+-- transação: execute com o psql (psql -f scripts/add_busca.sql). Se um
+-- CONCURRENTLY falhar no meio, apague o índice INVALID com DROP INDEX e
+-- rode de novo.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+CREATE OR REPLACE FUNCTION busca_normalizar(texto text) RETURNS text AS $$
+    SELECT lower(public.unaccent('public.unaccent'::regdictionary, texto));
+$$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE;
+
+-- --- CATÁLOGO ---
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_espacos_nome_trgm
+    ON Espacos USING gin (busca_normalizar(nome) gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_departamentos_nome_trgm
+    ON Departamentos USING gin (busca_normalizar(nome) gin_trgm_ops);
+
+-- --- USUÁRIOS ---
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_usuarios_nome_trgm
+    ON Usuarios USING gin (busca_normalizar(nome) gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_usuarios_email_trgm
+    ON Usuarios USING gin (lower(email) gin_trgm_ops);
+
+-- --- RESERVAS ---
+
+-- Sem CONCURRENTLY: depois de particionar_reservas.sql a tabela é
+-- particionada, e o PostgreSQL não aceita CONCURRENTLY nela. O índice é
+-- criado em cada partição (e nas criadas depois), bloqueando as escritas
+-- em Reservas enquanto isso; rode fora do horário de uso.
+CREATE INDEX IF NOT EXISTS idx_reservas_finalidade_trgm
+    ON Reservas USING gin (busca_normalizar(finalidade) gin_trgm_ops);
+
+ANALYZE Espacos;
+ANALYZE Departamentos;
+ANALYZE Usuarios;
+ANALYZE Reservas;
@@ -0,0 +1,70 @@
+-- ====================================================================
+-- ÍNDICES PARA AS CONSULTAS DO BACKEND (models.py)
+-- ====================================================================
+-- createTables.sql só cria as chaves primárias e o UNIQUE do e-mail: todos
+-- os filtros de reservas viravam leitura sequencial da tabela inteira.
+--
+-- CREATE INDEX CONCURRENTLY não bloqueia as escritas enquanto o índice é
+-- criado, mas não pode rodar dentro de uma transação: execute este arquivo
+-- com o psql (psql -f scripts/add_indices.sql), não em um bloco BEGIN/COMMIT.
+-- Se um CONCURRENTLY falhar no meio, o índice fica INVALID: apague-o com
+-- DROP INDEX e rode de novo.
+--
+-- O conflito de horários (sobreposição por espaço) já tem o índice GiST da
+-- constraint reservas_sem_conflito_horario (add_reservas_exclusion.sql).
+--
+-- Para conferir se os planos usam estes índices:
+--   cd backend && python -m benchmarks.planos
+
+-- --- RESERVAS ---
+
+-- Listagem geral e paginação por chave: ORDER BY data_hora_inicio DESC, reserva_id DESC,
+-- e o filtro 'fim' (data_hora_inicio < fim)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservas_inicio
+    ON Reservas (data_hora_inicio DESC, reserva_id DESC);
+
+-- Filtro 'inicio' (data_hora_fim > inicio)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservas_fim
+    ON Reservas (data_hora_fim);
+
+-- Reservas de um espaço (?espaco_id=), já na ordem da listagem
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservas_espaco_inicio
+    ON Reservas (espaco_id, data_hora_inicio DESC, reserva_id DESC);
+
+-- "Minhas reservas" (?solicitante_id=), já na ordem da listagem
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservas_solicitante_inicio
+    ON Reservas (solicitante_id, data_hora_inicio DESC, reserva_id DESC);
+
+-- Limite de 2 reservas ativas por aluno (create_reserva e create_reservas_lote):
+-- só as reservas ativas entram no índice
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservas_solicitante_ativas
+    ON Reservas (solicitante_id)
+    WHERE status IN ('confirmada', 'pendente');
+
+-- Fila de aprovação do gestor (?status=pendente): poucas linhas, índice pequeno
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservas_pendentes
+    ON Reservas (data_hora_inicio DESC, reserva_id DESC)
+    WHERE status = 'pendente';
+
+-- Demais combinações de status (?status=confirmada,cancelada...)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservas_status_inicio
+    ON Reservas (status, data_hora_inicio DESC, reserva_id DESC);
+
+-- Chave estrangeira sem índice: o ON DELETE SET NULL de aprovador_id
+-- (delete_usuario) lia a tabela inteira
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservas_aprovador
+    ON Reservas (aprovador_id)
+    WHERE aprovador_id IS NOT NULL;
+
+-- --- DEMAIS CHAVES ESTRANGEIRAS ---
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_espacos_gestor
+    ON Espacos (gestor_responsavel_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_usuarios_departamento
+    ON Usuarios (departamento_id);
+
+-- Atualiza as estatísticas para o planejador considerar os índices novos
+ANALYZE Reservas;
+ANALYZE Espacos;
+ANALYZE Usuarios;
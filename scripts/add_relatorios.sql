@@ -0,0 +1,126 @@
+-- ====================================================================
+-- RELATÓRIOS DE USO SEMANAL (AGREGADOS ATUALIZADOS POR PARTES)
+-- ====================================================================
+-- Pré-requisito: changeDateDB.sql (datas como timestamp WITH time zone).
+--
+-- Os relatórios da API (/api/relatorios/uso) leem só a tabela
+-- relatorio_uso_semanal, com uma linha por semana, espaço e departamento do
+-- solicitante. Ela não é calculada na hora da consulta: cada mudança em
+-- Reservas registra a semana/espaço afetado em relatorio_alteracoes, e o
+-- comando "flask atualizar-relatorios" recalcula só essas semanas.
+
+-- Fuso em que as semanas são contadas (segunda a domingo, horário local)
+CREATE OR REPLACE FUNCTION relatorio_semana(momento timestamptz) RETURNS date AS $$
+    SELECT date_trunc('week', momento AT TIME ZONE 'America/Sao_Paulo')::date
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION relatorio_inicio_semana(semana date) RETURNS timestamptz AS $$
+    SELECT semana::timestamp AT TIME ZONE 'America/Sao_Paulo'
+$$ LANGUAGE sql STABLE;
+
+-- Quando a reserva foi aprovada ou recusada (para a latência de aprovação)
+ALTER TABLE Reservas ADD COLUMN IF NOT EXISTS data_aprovacao TIMESTAMP WITH TIME ZONE;
+-- Bancos em que uma versão anterior deste script criou a coluna sem fuso
+-- (os valores antigos são lidos no fuso da sessão, que é o que a gravou)
+ALTER TABLE Reservas ALTER COLUMN data_aprovacao TYPE TIMESTAMP WITH TIME ZONE;
+
+CREATE OR REPLACE FUNCTION registrar_data_aprovacao() RETURNS trigger AS $$
+BEGIN
+    IF OLD.status = 'pendente' AND NEW.status IN ('confirmada', 'recusada') AND NEW.data_aprovacao IS NULL THEN
+        NEW.data_aprovacao := CURRENT_TIMESTAMP;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reservas_data_aprovacao ON Reservas;
+CREATE TRIGGER reservas_data_aprovacao
+BEFORE UPDATE OF status ON Reservas
+FOR EACH ROW EXECUTE FUNCTION registrar_data_aprovacao();
+
+-- Agregados. departamento_id é o do solicitante no momento do recálculo
+-- (NULL para quem não tem departamento, como os alunos).
+CREATE TABLE IF NOT EXISTS relatorio_uso_semanal (
+    semana DATE NOT NULL,
+    espaco_id INT NOT NULL,
+    departamento_id INT,
+    total_reservas INT NOT NULL,
+    confirmadas INT NOT NULL,
+    pendentes INT NOT NULL,
+    canceladas INT NOT NULL,
+    recusadas INT NOT NULL,
+    horas_confirmadas NUMERIC NOT NULL,
+    horas_pendentes NUMERIC NOT NULL,
+    decisoes INT NOT NULL,                       -- reservas com data_aprovacao
+    segundos_ate_decisao NUMERIC NOT NULL        -- soma de data_aprovacao - data_solicitacao
+);
+
+CREATE INDEX IF NOT EXISTS idx_relatorio_uso_semana ON relatorio_uso_semanal (semana, espaco_id);
+
+-- Registro das semanas/espaços com reservas alteradas desde o último
+-- recálculo. Só recebe INSERTs (nunca UPDATE ou ON CONFLICT): duas escritas
+-- na mesma semana e espaço não disputam a mesma linha, e a trigger não
+-- segura lock nenhum até o fim da transação da requisição. Cada linha tem o
+-- seu id; o recálculo apaga só as linhas que leu, então uma mudança que
+-- chegar durante o recálculo fica para a próxima vez em vez de se perder.
+CREATE TABLE IF NOT EXISTS relatorio_alteracoes (
+    alteracao_id BIGSERIAL PRIMARY KEY,
+    semana DATE NOT NULL,
+    espaco_id INT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_relatorio_alteracoes_semana ON relatorio_alteracoes (semana, espaco_id);
+
+-- Versões anteriores deste script marcavam as semanas em
+-- relatorio_semanas_pendentes (uma linha por semana/espaço, atualizada a
+-- cada escrita): as marcações que ainda existirem passam para o registro.
+DO $$
+BEGIN
+    IF to_regclass('relatorio_semanas_pendentes') IS NOT NULL THEN
+        INSERT INTO relatorio_alteracoes (semana, espaco_id)
+        SELECT semana, espaco_id FROM relatorio_semanas_pendentes;
+        DROP TABLE relatorio_semanas_pendentes;
+        DROP SEQUENCE IF EXISTS relatorio_versao_seq;
+    END IF;
+END;
+$$;
+
+-- Triggers por comando (não por linha), com as tabelas de transição: um COPY
+-- ou UPDATE de milhares de reservas registra cada semana/espaço uma vez só.
+CREATE OR REPLACE FUNCTION marcar_semanas_relatorio() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        INSERT INTO relatorio_alteracoes (semana, espaco_id)
+        SELECT relatorio_semana(data_hora_inicio), espaco_id FROM antigas
+        UNION
+        SELECT relatorio_semana(data_hora_inicio), espaco_id FROM novas;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO relatorio_alteracoes (semana, espaco_id)
+        SELECT DISTINCT relatorio_semana(data_hora_inicio), espaco_id FROM antigas;
+    ELSE
+        INSERT INTO relatorio_alteracoes (semana, espaco_id)
+        SELECT DISTINCT relatorio_semana(data_hora_inicio), espaco_id FROM novas;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reservas_relatorio_insert ON Reservas;
+CREATE TRIGGER reservas_relatorio_insert
+AFTER INSERT ON Reservas REFERENCING NEW TABLE AS novas
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_semanas_relatorio();
+
+DROP TRIGGER IF EXISTS reservas_relatorio_update ON Reservas;
+CREATE TRIGGER reservas_relatorio_update
+AFTER UPDATE ON Reservas REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_semanas_relatorio();
+
+DROP TRIGGER IF EXISTS reservas_relatorio_delete ON Reservas;
+CREATE TRIGGER reservas_relatorio_delete
+AFTER DELETE ON Reservas REFERENCING OLD TABLE AS antigas
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_semanas_relatorio();
+
+-- Todas as semanas existentes começam pendentes: o primeiro
+-- "flask atualizar-relatorios" calcula o histórico inteiro.
+INSERT INTO relatorio_alteracoes (semana, espaco_id)
+SELECT DISTINCT relatorio_semana(data_hora_inicio), espaco_id FROM Reservas;
@@ -0,0 +1,84 @@
+-- ====================================================================
+-- CONTADOR DE RESERVAS ATIVAS POR USUÁRIO
+-- ====================================================================
+-- O limite de 2 reservas ativas (pendentes ou confirmadas) por aluno era
+-- checado com um COUNT(*) em Reservas a cada pedido. Agora cada usuário tem
+-- o total em Usuarios.reservas_ativas, mantido por trigger a cada INSERT,
+-- DELETE ou mudança de status/solicitante em Reservas.
+--
+-- Consistência com escritas concorrentes: a trigger atualiza a linha do
+-- usuário, e o UPDATE trava essa linha até o fim da transação. Dois pedidos
+-- do mesmo aluno ao mesmo tempo ficam em fila, e o segundo já vê o total
+-- atualizado pelo primeiro. Se um aluno passar de 2, a trigger lança um
+-- check_violation (constraint usuarios_limite_reservas_ativas) e o comando é
+-- desfeito. Diminuir o total nunca falha, mesmo para quem já estava acima do
+-- limite antes desta migração.
+
+BEGIN;
+
+-- Impede escritas em Reservas durante a migração, para a contagem inicial bater
+LOCK TABLE Reservas IN SHARE ROW EXCLUSIVE MODE;
+
+ALTER TABLE Usuarios
+ADD COLUMN IF NOT EXISTS reservas_ativas integer NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION atualizar_reservas_ativas() RETURNS trigger AS $$
+DECLARE
+    saiu integer;    -- usuário que perdeu uma reserva ativa
+    entrou integer;  -- usuário que ganhou uma reserva ativa
+    tipo_usuario varchar;
+    total integer;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        IF OLD.status IN ('confirmada', 'pendente') THEN
+            saiu := OLD.solicitante_id;
+        END IF;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        IF NEW.status IN ('confirmada', 'pendente') THEN
+            entrou := NEW.solicitante_id;
+        END IF;
+    END IF;
+
+    -- Ex: pendente -> confirmada do mesmo solicitante não muda nada
+    IF saiu IS NOT DISTINCT FROM entrou THEN
+        RETURN NULL;
+    END IF;
+
+    IF saiu IS NOT NULL THEN
+        UPDATE Usuarios SET reservas_ativas = reservas_ativas - 1 WHERE usuario_id = saiu;
+    END IF;
+
+    IF entrou IS NOT NULL THEN
+        UPDATE Usuarios SET reservas_ativas = reservas_ativas + 1 WHERE usuario_id = entrou
+        RETURNING tipo, reservas_ativas INTO tipo_usuario, total;
+
+        IF tipo_usuario = 'aluno' AND total > 2 THEN
+            RAISE EXCEPTION 'O aluno % já atingiu o limite de 2 reservas ativas.', entrou
+                USING ERRCODE = 'check_violation', CONSTRAINT = 'usuarios_limite_reservas_ativas';
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reservas_contador_ativas ON Reservas;
+CREATE TRIGGER reservas_contador_ativas
+AFTER INSERT OR DELETE OR UPDATE OF status, solicitante_id ON Reservas
+FOR EACH ROW EXECUTE FUNCTION atualizar_reservas_ativas();
+
+-- Contagem inicial
+UPDATE Usuarios u
+SET reservas_ativas = (
+    SELECT COUNT(*) FROM Reservas r
+    WHERE r.solicitante_id = u.usuario_id AND r.status IN ('confirmada', 'pendente')
+);
+
+COMMIT;
+
+-- Para conferir, a qualquer momento, se o contador bate com as reservas:
+-- SELECT u.usuario_id, u.reservas_ativas, COUNT(r.reserva_id) AS real
+-- FROM Usuarios u
+-- LEFT JOIN Reservas r ON r.solicitante_id = u.usuario_id AND r.status IN ('confirmada', 'pendente')
+-- GROUP BY u.usuario_id HAVING u.reservas_ativas <> COUNT(r.reserva_id);
@@ -0,0 +1,31 @@
+-- ====================================================================
+-- CONFLITO DE HORÁRIOS GARANTIDO PELO BANCO (EXCLUSION CONSTRAINT)
+-- ====================================================================
+-- Pré-requisito: changeDateDB.sql (datas como timestamp WITH time zone).
+--
+-- Antes de rodar, confira se já existem reservas ativas sobrepostas;
+-- a constraint não é criada enquanto houver alguma:
+--
+-- SELECT a.reserva_id, b.reserva_id
+-- FROM Reservas a
+-- JOIN Reservas b ON a.espaco_id = b.espaco_id AND a.reserva_id < b.reserva_id
+-- WHERE a.status IN ('confirmada', 'pendente') AND b.status IN ('confirmada', 'pendente')
+--   AND a.data_hora_inicio < b.data_hora_fim AND a.data_hora_fim > b.data_hora_inicio;
+
+-- Permite usar igualdade de inteiros (espaco_id) dentro de um índice GiST
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- O período da reserva é o intervalo semiaberto [início, fim), o mesmo
+-- critério da antiga checagem (inicio < fim_outra AND fim > inicio_outra).
+-- Ele é uma expressão e não uma coluna, para não aparecer no SELECT r.*
+-- das consultas da API.
+--
+-- Duas reservas ativas do mesmo espaço não podem ter períodos sobrepostos.
+-- A constraint cria o índice GiST (espaco_id, período) usado na verificação.
+ALTER TABLE Reservas
+ADD CONSTRAINT reservas_sem_conflito_horario
+EXCLUDE USING gist (
+    espaco_id WITH =,
+    tstzrange(data_hora_inicio, data_hora_fim, '[)') WITH &&
+)
+WHERE (status IN ('confirmada', 'pendente'));
@@ -0,0 +1,120 @@
+-- ====================================================================
+-- AVISO DE MUDANÇAS EM RESERVAS (LISTEN/NOTIFY)
+-- ====================================================================
+-- Cada INSERT, UPDATE ou DELETE em Reservas manda avisos no canal
+-- 'reservas_alteracoes', entregues aos processos da API quando a transação é
+-- confirmada. Eles repassam as mudanças aos clientes de /api/reservas/stream
+-- e atualizam o índice de disponibilidade em memória.
+--
+-- As triggers são por comando (com as tabelas de transição), e não por
+-- linha: as linhas alteradas por um comando vão juntas, em NOTIFYs de até
+-- ~7000 bytes (o limite do NOTIFY é 8000). O conteúdo é um JSON compacto:
+--   {"avisos": [
+--     {"op": "insert" | "update" | "delete",
+--      "reserva": {... a linha, com espaco_nome e solicitante_nome ...},
+--      "anterior": {espaco_id, solicitante_id, status, data_hora_inicio, data_hora_fim}},  (só no update)
+--     ...]}
+-- Um comando que altera mais de 100 reservas (ex: DELETE em cascata ao
+-- apagar um espaço, ou uma importação) manda um único {"op": "reset"}: a API
+-- recarrega o índice e os clientes buscam a lista de novo, em vez de a fila
+-- do NOTIFY receber milhares de avisos de uma vez.
+
+-- Trigger por linha das versões anteriores deste script
+DROP TRIGGER IF EXISTS reservas_notificar ON Reservas;
+
+CREATE OR REPLACE FUNCTION notificar_reservas() RETURNS trigger AS $$
+DECLARE
+    max_linhas CONSTANT INT := 100;
+    max_bytes CONSTANT INT := 7000;
+    total INT;
+    avisos text[];
+    aviso text;
+    lote text := '';
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        SELECT count(*) INTO total FROM antigas;
+    ELSE
+        SELECT count(*) INTO total FROM novas;
+    END IF;
+
+    IF total = 0 THEN
+        RETURN NULL;
+    END IF;
+    IF total > max_linhas THEN
+        PERFORM pg_notify('reservas_alteracoes', '{"op": "reset"}');
+        RETURN NULL;
+    END IF;
+
+    -- Mesmos campos de um item de GET /api/reservas
+    IF TG_OP = 'UPDATE' THEN
+        -- UPDATEs que não mudam nada (ex: mesmo status) não geram aviso
+        SELECT array_agg(jsonb_build_object(
+                   'op', 'update',
+                   'reserva', to_jsonb(n) || jsonb_build_object('espaco_nome', e.nome, 'solicitante_nome', u.nome),
+                   'anterior', jsonb_build_object(
+                       'espaco_id', a.espaco_id,
+                       'solicitante_id', a.solicitante_id,
+                       'status', a.status,
+                       'data_hora_inicio', a.data_hora_inicio,
+                       'data_hora_fim', a.data_hora_fim
+                   )
+               )::text ORDER BY n.reserva_id)
+        INTO avisos
+        FROM novas n
+        JOIN antigas a ON a.reserva_id = n.reserva_id
+        LEFT JOIN Espacos e ON e.espaco_id = n.espaco_id
+        LEFT JOIN Usuarios u ON u.usuario_id = n.solicitante_id
+        WHERE a IS DISTINCT FROM n;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(jsonb_build_object(
+                   'op', 'delete',
+                   'reserva', to_jsonb(r) || jsonb_build_object('espaco_nome', e.nome, 'solicitante_nome', u.nome)
+               )::text ORDER BY r.reserva_id)
+        INTO avisos
+        FROM antigas r
+        LEFT JOIN Espacos e ON e.espaco_id = r.espaco_id
+        LEFT JOIN Usuarios u ON u.usuario_id = r.solicitante_id;
+    ELSE
+        SELECT array_agg(jsonb_build_object(
+                   'op', 'insert',
+                   'reserva', to_jsonb(r) || jsonb_build_object('espaco_nome', e.nome, 'solicitante_nome', u.nome)
+               )::text ORDER BY r.reserva_id)
+        INTO avisos
+        FROM novas r
+        LEFT JOIN Espacos e ON e.espaco_id = r.espaco_id
+        LEFT JOIN Usuarios u ON u.usuario_id = r.solicitante_id;
+    END IF;
+
+    -- Junta os avisos em NOTIFYs que caibam no limite
+    FOREACH aviso IN ARRAY coalesce(avisos, '{}') LOOP
+        IF lote <> '' AND octet_length(lote) + octet_length(aviso) + 16 > max_bytes THEN
+            PERFORM pg_notify('reservas_alteracoes', '{"avisos": [' || lote || ']}');
+            lote := '';
+        END IF;
+        IF lote = '' THEN
+            lote := aviso;
+        ELSE
+            lote := lote || ', ' || aviso;
+        END IF;
+    END LOOP;
+    IF lote <> '' THEN
+        PERFORM pg_notify('reservas_alteracoes', '{"avisos": [' || lote || ']}');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reservas_notificar_insert ON Reservas;
+CREATE TRIGGER reservas_notificar_insert
+AFTER INSERT ON Reservas REFERENCING NEW TABLE AS novas
+FOR EACH STATEMENT EXECUTE FUNCTION notificar_reservas();
+
+DROP TRIGGER IF EXISTS reservas_notificar_update ON Reservas;
+CREATE TRIGGER reservas_notificar_update
+AFTER UPDATE ON Reservas REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+FOR EACH STATEMENT EXECUTE FUNCTION notificar_reservas();
+
+DROP TRIGGER IF EXISTS reservas_notificar_delete ON Reservas;
+CREATE TRIGGER reservas_notificar_delete
+AFTER DELETE ON Reservas REFERENCING OLD TABLE AS antigas
+FOR EACH STATEMENT EXECUTE FUNCTION notificar_reservas();
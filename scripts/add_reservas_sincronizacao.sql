@@ -0,0 +1,75 @@
+-- ====================================================================
+-- SINCRONIZAÇÃO INCREMENTAL DE RESERVAS (GET /api/reservas?since=...)
+-- ====================================================================
+-- Cada reserva guarda quando e em qual transação foi alterada pela última
+-- vez, e cada reserva apagada (pela API ou em cascata, ao apagar um espaço)
+-- deixa um registro em reservas_removidas. Com isso a API devolve só o que
+-- mudou desde o token de sincronização que o cliente mandou.
+--
+-- O token é o xmin do snapshot da consulta anterior: toda transação com txid
+-- menor já tinha terminado, e o que ela mudou já foi entregue. Transações com
+-- txid maior ou igual ainda podiam estar em andamento, então as linhas delas
+-- são devolvidas de novo na consulta seguinte (o cliente só substitui a
+-- linha). Comparar pela transação, e não por updated_at, evita perder uma
+-- escrita que começou antes e terminou depois da consulta.
+
+ALTER TABLE Reservas
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+ADD COLUMN IF NOT EXISTS txid_alteracao BIGINT NOT NULL DEFAULT 0;
+
+-- UPDATEs que não mudam nada (ex: aprovar de novo uma reserva já confirmada)
+-- mantêm a marca anterior: a reserva não volta em ?since= e a trigger de
+-- aviso (add_reservas_notificacoes.sql) continua vendo a linha como igual.
+CREATE OR REPLACE FUNCTION marcar_alteracao_reserva() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW IS NOT DISTINCT FROM OLD THEN
+        RETURN NEW;
+    END IF;
+    NEW.updated_at := now();
+    NEW.txid_alteracao := txid_current();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reservas_marcar_alteracao ON Reservas;
+CREATE TRIGGER reservas_marcar_alteracao
+BEFORE INSERT OR UPDATE ON Reservas
+FOR EACH ROW EXECUTE FUNCTION marcar_alteracao_reserva();
+
+CREATE INDEX IF NOT EXISTS idx_reservas_txid_alteracao ON Reservas (txid_alteracao);
+
+-- Reservas apagadas
+CREATE TABLE IF NOT EXISTS reservas_removidas (
+    reserva_id INT NOT NULL,
+    espaco_id INT,
+    solicitante_id INT,
+    removida_em TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    txid BIGINT NOT NULL DEFAULT txid_current()
+);
+
+CREATE INDEX IF NOT EXISTS idx_reservas_removidas_txid ON reservas_removidas (txid);
+CREATE INDEX IF NOT EXISTS idx_reservas_removidas_em ON reservas_removidas (removida_em);
+
+-- Por comando: um DELETE em cascata de milhares de reservas é um único INSERT
+CREATE OR REPLACE FUNCTION registrar_reservas_removidas() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO reservas_removidas (reserva_id, espaco_id, solicitante_id)
+    SELECT reserva_id, espaco_id, solicitante_id FROM removidas;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reservas_registrar_removidas ON Reservas;
+CREATE TRIGGER reservas_registrar_removidas
+AFTER DELETE ON Reservas REFERENCING OLD TABLE AS removidas
+FOR EACH STATEMENT EXECUTE FUNCTION registrar_reservas_removidas();
+
+-- Os registros de remoção antigos são apagados por "flask limpar-remocoes".
+-- Tokens anteriores à última limpeza deixam de valer (a API responde 410 e o
+-- cliente busca a lista inteira de novo).
+CREATE TABLE IF NOT EXISTS reservas_sincronizacao (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    txid_minimo BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO reservas_sincronizacao (id) VALUES (TRUE) ON CONFLICT DO NOTHING;
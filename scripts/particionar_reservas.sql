@@ -0,0 +1,215 @@
+-- ====================================================================
+-- RESERVAS PARTICIONADA POR MÊS (data_hora_inicio)
+-- ====================================================================
+-- Pré-requisitos: PostgreSQL 13 ou mais novo e todos os outros scripts
+-- add_*.sql já aplicados (principalmente add_reservas_exclusion.sql,
+-- add_reservas_ativas_contador.sql e add_reservas_sincronizacao.sql).
+--
+-- Reservas só cresce, e as consultas da API quase sempre olham o mês atual
+-- e os próximos. Com uma partição por mês (em UTC), um filtro por período
+-- faz o PostgreSQL ler só uma ou duas partições em vez do histórico todo.
+-- Reservas fora dos meses criados caem na partição padrão (reservas_padrao).
+--
+-- O que muda na tabela:
+-- - A chave primária passa a ser (reserva_id, data_hora_inicio): toda chave
+--   única de uma tabela particionada precisa conter a chave de partição.
+--   reserva_id continua vindo da mesma sequência e nenhuma tabela aponta para ele.
+-- - A constraint de conflito de horários existe em cada partição
+--   (<partição>_sem_conflito), já que o PostgreSQL não aceita EXCLUDE com
+--   sobreposição na tabela particionada. Uma reserva dura no máximo 4 horas
+--   (chk_duracao_maxima), então só reservas a menos de 4 horas de uma virada
+--   de mês podem esbarrar em outra partição: para elas a trigger
+--   reservas_conflito_virada faz a checagem, em fila por espaço (advisory lock).
+-- - Chaves estrangeiras (ON DELETE CASCADE de espaco_id e solicitante_id,
+--   SET NULL de aprovador_id: fix_constraints.sql e alter_reservas_cascade.sql),
+--   índices e triggers são recriados iguais aos da tabela atual.
+--
+-- Manutenção (cria os meses seguintes e desanexa os antigos):
+--   flask --app run particoes-reservas
+-- Reinicie a API depois da migração.
+
+BEGIN;
+
+LOCK TABLE Reservas IN ACCESS EXCLUSIVE MODE;
+
+-- Definições atuais de chaves estrangeiras, índices (menos os das constraints)
+-- e triggers, para recriar na tabela nova. Elas se referem à tabela pelo nome
+-- "reservas", que depois do RENAME passa a ser a tabela particionada.
+CREATE TEMP TABLE particionamento_definicoes ON COMMIT DROP AS
+SELECT 1 AS ordem, format('ALTER TABLE reservas ADD CONSTRAINT %I %s', c.conname, pg_get_constraintdef(c.oid)) AS definicao
+FROM pg_constraint c
+WHERE c.conrelid = 'reservas'::regclass AND c.contype = 'f'
+UNION ALL
+SELECT 2, pg_get_indexdef(i.indexrelid)
+FROM pg_index i
+WHERE i.indrelid = 'reservas'::regclass
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+UNION ALL
+SELECT 3, pg_get_triggerdef(t.oid)
+FROM pg_trigger t
+WHERE t.tgrelid = 'reservas'::regclass AND NOT t.tgisinternal;
+
+-- A sequência de reserva_id sobrevive à tabela antiga
+ALTER SEQUENCE reservas_reserva_id_seq OWNED BY NONE;
+
+ALTER TABLE Reservas RENAME TO reservas_antiga;
+
+-- Libera os nomes dos índices (reservas_pkey, idx_reservas_...) para a tabela nova
+DO $$
+DECLARE
+    indice record;
+BEGIN
+    FOR indice IN
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = 'reservas_antiga'::regclass
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', indice.relname, left(indice.relname, 50) || '_antigo');
+    END LOOP;
+END;
+$$;
+
+-- Mesmas colunas, defaults e CHECKs
+CREATE TABLE Reservas (LIKE reservas_antiga INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+PARTITION BY RANGE (data_hora_inicio);
+
+ALTER TABLE Reservas ADD CONSTRAINT reservas_pkey PRIMARY KEY (reserva_id, data_hora_inicio);
+ALTER SEQUENCE reservas_reserva_id_seq OWNED BY Reservas.reserva_id;
+
+-- Conflito de horários dentro de uma partição
+CREATE OR REPLACE FUNCTION reservas_criar_exclusao(particao text) RETURNS void AS $$
+BEGIN
+    EXECUTE format(
+        'ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist ('
+        '    espaco_id WITH =,'
+        '    tstzrange(data_hora_inicio, data_hora_fim, ''[)'') WITH &&'
+        ') WHERE (status IN (''confirmada'', ''pendente''))',
+        particao, particao || '_sem_conflito'
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Cria a partição do mês de `mes` (em UTC), se ainda não existir, e devolve o
+-- nome dela (NULL se já existia). Reservas daquele mês que estavam na
+-- partição padrão são movidas para a nova, sem disparar as triggers (a
+-- reserva não mudou: contador, avisos e relatórios continuam valendo).
+CREATE OR REPLACE FUNCTION reservas_criar_particao(mes date) RETURNS text AS $$
+DECLARE
+    particao text := 'reservas_' || to_char(mes, 'YYYY_MM');
+    inicio timestamptz := date_trunc('month', mes)::timestamp AT TIME ZONE 'UTC';
+    fim timestamptz := (date_trunc('month', mes) + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+BEGIN
+    IF to_regclass(particao) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM reservas_padrao WHERE data_hora_inicio >= inicio AND data_hora_inicio < fim) THEN
+        EXECUTE format('CREATE TABLE %I (LIKE Reservas INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', particao);
+        ALTER TABLE reservas_padrao DISABLE TRIGGER USER;
+        EXECUTE format(
+            'WITH movidas AS ('
+            '    DELETE FROM reservas_padrao WHERE data_hora_inicio >= $1 AND data_hora_inicio < $2 RETURNING *'
+            ') INSERT INTO %I SELECT * FROM movidas',
+            particao
+        ) USING inicio, fim;
+        ALTER TABLE reservas_padrao ENABLE TRIGGER USER;
+        EXECUTE format('ALTER TABLE Reservas ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', particao, inicio, fim);
+    ELSE
+        EXECUTE format('CREATE TABLE %I PARTITION OF Reservas FOR VALUES FROM (%L) TO (%L)', particao, inicio, fim);
+    END IF;
+
+    PERFORM reservas_criar_exclusao(particao);
+    RETURN particao;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tira uma partição antiga da tabela. Ela continua no banco como tabela
+-- comum (arquivo); apague com DROP TABLE quando não precisar mais.
+-- As reservas ativas dela deixam de contar no limite dos alunos, e os tokens
+-- de sincronização expiram (os clientes buscam a lista de novo, sem elas).
+CREATE OR REPLACE FUNCTION reservas_desanexar_particao(particao text) RETURNS void AS $$
+BEGIN
+    EXECUTE format(
+        'UPDATE Usuarios u SET reservas_ativas = u.reservas_ativas - a.total '
+        'FROM (SELECT solicitante_id, COUNT(*) AS total FROM %I '
+        '      WHERE status IN (''confirmada'', ''pendente'') GROUP BY solicitante_id) a '
+        'WHERE u.usuario_id = a.solicitante_id',
+        particao
+    );
+    EXECUTE format('ALTER TABLE Reservas DETACH PARTITION %I', particao);
+    UPDATE reservas_sincronizacao SET txid_minimo = txid_current();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TABLE reservas_padrao PARTITION OF Reservas DEFAULT;
+SELECT reservas_criar_exclusao('reservas_padrao');
+
+-- Um mês por partição, do mês da reserva mais antiga até 12 meses à frente
+SELECT reservas_criar_particao(mes::date)
+FROM generate_series(
+    date_trunc('month', COALESCE((SELECT MIN(data_hora_inicio) FROM reservas_antiga), now()) AT TIME ZONE 'UTC'),
+    date_trunc('month', now() AT TIME ZONE 'UTC') + interval '12 months',
+    interval '1 month'
+) AS mes;
+
+-- Copia os dados antes de recriar as triggers: nada muda de verdade
+-- (contador, updated_at, avisos e relatórios ficam como estão)
+INSERT INTO Reservas SELECT * FROM reservas_antiga;
+
+DO $$
+DECLARE
+    item record;
+BEGIN
+    FOR item IN SELECT definicao FROM particionamento_definicoes ORDER BY ordem LOOP
+        EXECUTE item.definicao;
+    END LOOP;
+END;
+$$;
+
+-- Conflito de horários entre partições: reserva ativa a menos de 4 horas de
+-- uma virada de mês. As duas reservas de um conflito assim estão perto da
+-- mesma virada, então ambas passam por aqui e o lock por espaço as põe em
+-- fila; a segunda já enxerga a primeira confirmada. O erro é o mesmo da
+-- constraint (exclusion_violation), tratado pela API como conflito de horários.
+CREATE OR REPLACE FUNCTION reservas_verificar_conflito_virada() RETURNS trigger AS $$
+DECLARE
+    mes timestamp := date_trunc('month', NEW.data_hora_inicio AT TIME ZONE 'UTC');
+BEGIN
+    IF NEW.status NOT IN ('confirmada', 'pendente')
+       OR (NEW.data_hora_inicio >= (mes + interval '4 hours') AT TIME ZONE 'UTC'
+           AND NEW.data_hora_fim <= (mes + interval '1 month') AT TIME ZONE 'UTC') THEN
+        RETURN NEW;
+    END IF;
+
+    PERFORM pg_advisory_xact_lock(hashtext('reservas_conflito_virada'), NEW.espaco_id);
+
+    -- Só outros meses: dentro do mesmo mês quem decide é a constraint da
+    -- partição (e o ON CONFLICT DO NOTHING das inserções em lote)
+    IF EXISTS (
+        SELECT 1 FROM Reservas o
+        WHERE o.espaco_id = NEW.espaco_id
+          AND o.reserva_id <> NEW.reserva_id
+          AND o.status IN ('confirmada', 'pendente')
+          AND o.data_hora_inicio > NEW.data_hora_inicio - interval '4 hours'
+          AND o.data_hora_inicio < NEW.data_hora_fim
+          AND date_trunc('month', o.data_hora_inicio AT TIME ZONE 'UTC') <> mes
+          AND tstzrange(o.data_hora_inicio, o.data_hora_fim, '[)') && tstzrange(NEW.data_hora_inicio, NEW.data_hora_fim, '[)')
+    ) THEN
+        RAISE EXCEPTION 'Conflito de horários com a reserva de outro mês no espaço %.', NEW.espaco_id
+            USING ERRCODE = 'exclusion_violation', CONSTRAINT = 'reservas_sem_conflito_horario';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER reservas_conflito_virada
+BEFORE INSERT OR UPDATE OF status, espaco_id, data_hora_inicio, data_hora_fim ON Reservas
+FOR EACH ROW EXECUTE FUNCTION reservas_verificar_conflito_virada();
+
+DROP TABLE reservas_antiga;
+
+COMMIT;
+
+ANALYZE Reservas;
+
+-- Para conferir as partições e quantas reservas cada uma tem:
+-- SELECT tableoid::regclass AS particao, COUNT(*) FROM Reservas GROUP BY 1 ORDER BY 1;